@@ -1,8 +1,26 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.exceptions import RequestEntityTooLarge
 from extensions import db
+import config
 from config import SQLALCHEMY_DATABASE_URI
+from services.inference_engine import inference_engine
+from services.frame_filter import frame_filter
+from services.face_tracker import face_tracker
+from services.capture_rate import capture_rate
+from services.emotion_log_buffer import emotion_log_buffer
+from services.live_state import live_state
+from services.event_bus import event_bus
+from services.live_lectures import live_lectures
+from services.resource_versions import resource_versions
+from services.access import access_cache
+from services.passwords import password_hasher
+from services.face_index import face_index
+from services.metrics import metrics
+from services.profiler import profiler
+from services.db_pool import engine_options
+from services.uploads import FrameTooLarge
 from datetime import timedelta
 
 # --- IMPORT YOUR MODULAR BLUEPRINTS ---
@@ -11,30 +29,66 @@ from routes.faculty.group_route import faculty_group_bp
 from routes.student.group_route import student_group_bp 
 from routes.faculty.lecture_route import faculty_lecture_bp
 from routes.student.lecture_route import student_lecture_bp
+from routes.student.face_route import student_face_bp
+from routes.health_route import health_bp
+from routes.metrics_route import metrics_bp
+from cli import register_commands
 # In backend/app.py, add these lines near the top:
 from models.lecture import Lecture
 from models.lecture_attendance import LectureAttendance
 from models.emotion_log import EmotionLog 
+from models.emotion_rollup import EmotionRollup
+from models.face_embedding import FaceEmbedding
 
-def create_app():
+def create_app(config_overrides=None):
     app = Flask(__name__)
     
     # --- CONFIGURATION ---
+    app.config.from_object(config)
     app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["JWT_SECRET_KEY"] = "$vinay5453" # Keep this safe!
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=30)
+    # Headers only: query strings end up in access logs. The SSE streams
+    # (EventSource can't send headers) opt in to ?jwt= with STREAM_TOKEN_LOCATIONS
+    app.config["JWT_TOKEN_LOCATION"] = ["headers"]
+
+    # e.g. benchmarks pointing the app at a throwaway SQLite database
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    # Pool sizing / pre-ping / recycle from the DB_* settings (see config.py)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
 
     # --- INITIALIZE EXTENSIONS ---
     db.init_app(app)
     CORS(app)
     jwt = JWTManager(app)
+    inference_engine.init_app(app)
+    frame_filter.init_app(app)
+    face_tracker.init_app(app)
+    capture_rate.init_app(app)
+    emotion_log_buffer.init_app(app)
+    live_state.init_app(app)
+    event_bus.init_app(app)
+    live_lectures.init_app(app)
+    resource_versions.init_app(app)
+    access_cache.init_app(app)
+    password_hasher.init_app(app)
+    face_index.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
     
     # Automatically create tables if they don't exist yet
     with app.app_context():
         db.create_all()
         print("✅ Database tables checked/created!")
 
+    # Load the emotion + face detector models now (in the background) instead of
+    # on the first student frame. /api/health/ready reports 503 until done.
+    if app.config["PRELOAD_MODELS"] and app.config["INFERENCE_AUTOSTART"]:
+        inference_engine.start()
+
     # --- REGISTER BLUEPRINTS WITH CLEAN URLS ---
     # Auth endpoints (e.g., /api/auth/login)
     app.register_blueprint(auth_bp, url_prefix='/api/auth') 
@@ -50,9 +104,27 @@ def create_app():
     # ✅ NEW: Register the Student Lecture Route
     app.register_blueprint(student_lecture_bp, url_prefix='/api/student/lectures')
 
+    # Student face enrollment for room-camera lectures (e.g. /api/student/face/enroll)
+    app.register_blueprint(student_face_bp, url_prefix='/api/student/face')
+
+    # Health / readiness checks (e.g. /api/health/ready)
+    app.register_blueprint(health_bp, url_prefix='/api/health')
+
+    # Frame uploads past their limit (see services/uploads.py)
+    @app.errorhandler(FrameTooLarge)
+    @app.errorhandler(RequestEntityTooLarge)
+    def frame_too_large(e):
+        return jsonify({"error": "Frame too large"}), 413
+
+    # Prometheus scrape endpoint (GET /metrics)
+    app.register_blueprint(metrics_bp)
+
 
     # ... (your other blueprint registrations) ...
 
+    # Maintenance commands (e.g. `flask backfill-rollups`)
+    register_commands(app)
+
     # Add this debug line!
     print("--- THESE ARE THE URLS FLASK KNOWS ABOUT ---")
     print(app.url_map)
@@ -61,6 +133,8 @@ def create_app():
     return app
 
 
+# Development server (single process, reloader). In production run
+#   gunicorn -c gunicorn.conf.py wsgi:app
 if __name__ == '__main__':
     print("----------------------------------------------------------------")
     print("🚀 Server is starting with modular routes...")
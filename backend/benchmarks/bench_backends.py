@@ -0,0 +1,138 @@
+"""
+Inference backends side by side (INFERENCE_BACKEND, services/emotion_backends.py):
+model load time, memory, latency per frame and per micro-batch, and accuracy.
+
+Every backend runs in its own spawned process, like an inference worker, so
+its load time and peak RSS are not mixed up with the others. The frames go
+through emotion_model.analyze_batch (full-frame detection + emotion CNN),
+one at a time and in batches of --batch.
+
+With --images DIR/<label>/*.jpg (label = one of the raw labels, e.g. a
+FER-2013 / FER+ test split sorted into happy/, sad/, ...) it also reports
+accuracy on the raw label and on the classroom emotion (classify()), which
+is what the dashboards show. Without it, synthetic frames give latency only.
+
+The opencv backend reads its ONNX models from INFERENCE_MODEL_DIR (see
+config.py); "stub" measures the pipeline around the models.
+
+Usage (from backend/):
+    python benchmarks/bench_backends.py [--backends deepface opencv stub] [--images DIR] [--frames 200] [--batch 8]
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_frames(images_dir, count):
+    # -> [(BGR image, raw label or None)]
+    frames = []
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "*", "*"))):
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append((img, os.path.basename(os.path.dirname(path))))
+        rng = np.random.default_rng(0)
+        if len(frames) > count:
+            frames = [frames[i] for i in sorted(rng.choice(len(frames), size=count, replace=False))]
+        return frames
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        img = np.full((240, 320, 3), 110, dtype=np.uint8)
+        cv2.ellipse(img, (160 + int(rng.integers(-20, 20)), 120), (55, 75), 0, 0, 360, (180, 170, 160), -1)
+        frames.append((np.clip(img + rng.normal(0, 12, img.shape), 0, 255).astype(np.uint8), None))
+    return frames
+
+
+def run_backend(name, frames, batch_size, results):
+    # Runs in a fresh process
+    import config
+    from emotions import classify
+    from services import emotion_model
+    from services.emotion_backends import CONFIG_KEYS
+
+    options = {key: getattr(config, key) for key in CONFIG_KEYS if hasattr(config, key)}
+    try:
+        started = time.perf_counter()
+        emotion_model.configure(name, options)
+        emotion_model.load_models()
+        emotion_model.warm_up()
+        load_s = time.perf_counter() - started
+
+        images = [img for img, _ in frames]
+        single, predicted = [], []
+        for img in images:
+            started = time.perf_counter()
+            output = emotion_model.analyze_batch([img])[0]
+            single.append((time.perf_counter() - started) * 1000)
+            predicted.append(output["emotion"] if output else None)
+
+        batched = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            started = time.perf_counter()
+            emotion_model.analyze_batch(chunk)
+            batched.append((time.perf_counter() - started) * 1000 / len(chunk))
+    except Exception as e:
+        results.put((name, {"error": f"{type(e).__name__}: {str(e).strip()}"}))
+        return
+
+    labelled = [(p, truth) for p, (_, truth) in zip(predicted, frames) if truth]
+    results.put((name, {
+        "load_s": load_s,
+        # ru_maxrss is in KiB on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "p50": np.percentile(single, 50),
+        "p95": np.percentile(single, 95),
+        "batch_p50": np.percentile(batched, 50),
+        "raw_acc": np.mean([p == t for p, t in labelled]) if labelled else None,
+        "class_acc": np.mean([classify(p) == classify(t) for p, t in labelled]) if labelled else None,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["deepface", "opencv", "stub"])
+    parser.add_argument("--images", help="labelled frames, one sub-directory per raw label")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=8)
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.frames)
+    if not frames:
+        sys.exit("No readable frames")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    rows = {}
+    for name in args.backends:
+        p = ctx.Process(target=run_backend, args=(name, frames, args.batch, results))
+        p.start()
+        rows.update([results.get()])
+        p.join()
+
+    print(f"{len(frames)} frames of {frames[0][0].shape[1]}x{frames[0][0].shape[0]}"
+          f"{' (labelled)' if frames[0][1] else ' (synthetic, latency only)'}")
+    print(f"{'backend':>9}{'load s':>8}{'RSS MB':>8}{'p50 ms':>8}{'p95 ms':>8}"
+          f"{f'ms/f @{args.batch}':>10}{'raw acc':>9}{'class acc':>11}")
+    for name in args.backends:
+        row = rows[name]
+        if "error" in row:
+            print(f"{name:>9}  failed: {row['error']}")
+            continue
+        raw = f"{row['raw_acc']:.1%}" if row["raw_acc"] is not None else "-"
+        cls = f"{row['class_acc']:.1%}" if row["class_acc"] is not None else "-"
+        print(f"{name:>9}{row['load_s']:>8.2f}{row['rss_mb']:>8.0f}{row['p50']:>8.2f}{row['p95']:>8.2f}"
+              f"{row['batch_p50']:>10.2f}{raw:>9}{cls:>11}")
+
+
+if __name__ == "__main__":
+    main()
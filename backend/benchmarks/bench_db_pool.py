@@ -0,0 +1,108 @@
+"""
+Connection pool checkout wait and saturation under concurrent requests.
+
+--threads request threads each check out a connection, run one small query
+on the users table, keep the connection for --hold-ms (a request's
+work) and give it back. This is repeated for every pool size. Pool
+options come from the same engine_options() the app uses, so this also
+exercises DB_POOL_PRE_PING / DB_POOL_RECYCLE against a real server.
+
+Usage (from backend/):
+    python benchmarks/bench_db_pool.py [--database-url URL] [--threads 32] [--requests 2000]
+                                       [--pool-sizes 2 5 10 20] [--max-overflow 0] [--hold-ms 5]
+Without --database-url a throwaway SQLite file is used; the in-memory URL
+(sqlite://) shares one connection and has no pool to measure.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.user import User  # noqa: E402
+from services.db_pool import pool_stats  # noqa: E402
+
+
+def run(url, pool_size, max_overflow, threads, requests, hold_ms):
+    with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": url,
+            "PRELOAD_MODELS": False,
+            "DB_POOL_SIZE": pool_size,
+            "DB_MAX_OVERFLOW": max_overflow,
+        })
+    with app.app_context():
+        engine = db.engine
+
+    remaining = [requests]
+    lock = threading.Lock()
+    errors = []
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(User.user_id).limit(1)).all()
+                    time.sleep(hold_ms / 1000.0)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    stats = pool_stats(engine)
+    engine.dispose()
+    return requests / elapsed, stats, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", help="database to use (default: a new SQLite file)")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[2, 5, 10, 20])
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--hold-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if not url:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    try:
+        print(f"{args.threads} threads, {args.requests} requests holding a connection {args.hold_ms} ms")
+        print(f"{'pool':>5}{'req/s':>9}{'avg wait ms':>13}{'p95 wait ms':>13}"
+              f"{'max wait ms':>13}{'waited':>8}{'peak sat.':>11}{'timeouts':>10}")
+        for size in args.pool_sizes:
+            rate, stats, errors = run(url, size, args.max_overflow, args.threads, args.requests, args.hold_ms)
+            print(f"{size:>5}{rate:>9.0f}{stats['avg_wait_ms']:>13.2f}{stats['p95_wait_ms']:>13.2f}"
+                  f"{stats['max_wait_ms']:>13.2f}{stats['waited'] / stats['checkouts']:>8.0%}"
+                  f"{stats['peak_saturation']:>11.0%}{stats['timeouts'] + errors:>10}")
+    finally:
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
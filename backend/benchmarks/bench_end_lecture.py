@@ -0,0 +1,137 @@
+"""
+End-to-end timing of POST /api/faculty/lectures/<id>/end on synthetic data.
+
+For each class size a fresh SQLite database is seeded with one live lecture
+of --minutes minutes and one EmotionLog row per student every 5 seconds
+(plus the matching emotion_rollups rows), then the real endpoint is called
+through the Flask test client.
+--legacy also times the old per-student loop (one query + ORM load per
+student, O(k^2) dominant mood) on the same data for comparison.
+
+Usage (from backend/):
+    python benchmarks/bench_end_lecture.py [--students 50 200 1000] [--minutes 90] [--legacy]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.emotion_log import EmotionLog  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.user import User  # noqa: E402
+from services.rollups import rebuild_lecture_rollup  # noqa: E402
+
+EMOTIONS = ["Focused", "Confused", "Bored", "Distracted"]
+
+
+def seed(students, minutes, presence=0.8):
+    start = datetime.utcnow() - timedelta(minutes=minutes)
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@bench", "password": "x", "role": "faculty"}
+    ] + [
+        {"user_id": 1 + i, "name": f"Student {i}", "email": f"s{i}@bench", "password": "x",
+         "role": "student", "roll_no": str(i)}
+        for i in range(1, students + 1)
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Bench", "faculty_id": 1, "join_code": "BENCH1"}])
+    db.session.execute(GroupMember.__table__.insert(), [
+        {"group_id": 1, "student_id": 1 + i} for i in range(1, students + 1)
+    ])
+    db.session.execute(Lecture.__table__.insert(), [{
+        "id": 1, "group_id": 1, "topic": "Bench", "status": "live",
+        "scheduled_start": start, "scheduled_end": start, "actual_start": start
+    }])
+
+    rng = random.Random(42)
+    frames = minutes * 60 // 5
+    batch, total = [], 0
+    for i in range(1, students + 1):
+        for f in range(frames):
+            if rng.random() < presence:
+                batch.append({"lecture_id": 1, "student_id": 1 + i,
+                              "timestamp": start + timedelta(seconds=5 * f),
+                              "emotion": rng.choice(EMOTIONS)})
+        if len(batch) > 50000:
+            db.session.execute(EmotionLog.__table__.insert(), batch)
+            total, batch = total + len(batch), []
+    if batch:
+        db.session.execute(EmotionLog.__table__.insert(), batch)
+        total += len(batch)
+    db.session.commit()
+
+    # In production the rollup is maintained while frames arrive
+    with db.engine.begin() as conn:
+        rebuild_lecture_rollup(conn, 1)
+    return total
+
+
+def legacy_aggregate(lecture_id):
+    # The pre-rewrite loop, kept here only as a baseline
+    lecture = db.session.get(Lecture, lecture_id)
+    results = []
+    for member in GroupMember.query.filter_by(group_id=lecture.group_id).all():
+        logs = EmotionLog.query.filter_by(lecture_id=lecture.id, student_id=member.student_id).all()
+        moods = [log.emotion for log in logs]
+        results.append(max(set(moods), key=moods.count) if moods else "Absent")
+    return results
+
+
+def run(students, minutes, legacy):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "PRELOAD_MODELS": False,
+            })
+        with app.app_context():
+            rows = seed(students, minutes)
+            token = create_access_token(identity="1", additional_claims={"role": "faculty"})
+
+            legacy_s = None
+            if legacy:
+                started = time.perf_counter()
+                legacy_aggregate(1)
+                legacy_s = time.perf_counter() - started
+                db.session.remove()
+
+        client = app.test_client()
+        started = time.perf_counter()
+        res = client.post("/api/faculty/lectures/1/end", headers={"Authorization": f"Bearer {token}"})
+        elapsed = time.perf_counter() - started
+        assert res.status_code == 200, res.get_json()
+        return rows, elapsed, legacy_s
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--minutes", type=int, default=90)
+    parser.add_argument("--legacy", action="store_true", help="also time the old per-student loop")
+    args = parser.parse_args()
+
+    print(f"{'students':>9}{'log rows':>12}{'end_lecture s':>15}{'legacy loop s':>15}")
+    for n in args.students:
+        rows, elapsed, legacy_s = run(n, args.minutes, args.legacy)
+        legacy_col = f"{legacy_s:>15.3f}" if legacy_s is not None else f"{'-':>15}"
+        print(f"{n:>9}{rows:>12}{elapsed:>15.3f}{legacy_col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Timeline export throughput and memory as lectures get longer.
+
+For every size a fresh SQLite database is seeded with one lecture of
+--rows emotion_logs rows (--students students), then
+GET /api/faculty/lectures/1/export is read to the end through the Flask
+test client, once timed and once under tracemalloc. The streamed export
+should keep the same peak memory whatever the number of rows; loading the
+rows through the ORM (what an export would have done before) is measured
+on the same data for comparison.
+
+Usage (from backend/):
+    python benchmarks/bench_export.py [--rows 100000 1000000] [--students 200] [--format csv]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from emotions import CLASSROOM_MOODS  # noqa: E402
+from extensions import db  # noqa: E402
+from models.emotion_log import EmotionLog  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.user import User  # noqa: E402
+
+SEED_CHUNK = 50000
+
+
+def seed(rows, students):
+    start = datetime(2024, 1, 8, 9)
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@export", "password": "x", "role": "faculty"}
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Export", "faculty_id": 1, "join_code": "EXPORT"}])
+    db.session.execute(Lecture.__table__.insert(), [{
+        "id": 1, "group_id": 1, "topic": "Export", "status": "completed",
+        "scheduled_start": start, "scheduled_end": start, "actual_start": start, "actual_end": start,
+    }])
+    rng = np.random.default_rng(0)
+    codes = [int(m) for m in CLASSROOM_MOODS]
+    table = EmotionLog.__table__
+    for first in range(0, rows, SEED_CHUNK):
+        n = min(SEED_CHUNK, rows - first)
+        emotions = rng.choice(codes, n).tolist()
+        db.session.execute(table.insert(), [
+            {"lecture_id": 1, "student_id": 2 + (first + i) % students,
+             "timestamp": start + timedelta(milliseconds=(first + i) * 50), "emotion": emotions[i]}
+            for i in range(n)
+        ])
+    db.session.commit()
+
+
+def run(rows, students, fmt):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "PRELOAD_MODELS": False})
+        with app.app_context():
+            seed(rows, students)
+            token = create_access_token(identity="1", additional_claims={"role": "faculty"})
+        client = app.test_client()
+        url = f"/api/faculty/lectures/1/export?format={fmt}"
+        headers = {"Authorization": f"Bearer {token}"}
+
+        def export():
+            size = 0
+            res = client.get(url, headers=headers, buffered=False)
+            for piece in res.response:
+                size += len(piece)
+            res.close()
+            return size
+
+        started = time.perf_counter()
+        size = export()
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        export()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        with app.app_context():
+            tracemalloc.start()
+            EmotionLog.query.filter_by(lecture_id=1).all()
+            orm_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            db.engine.dispose()
+        return rows / elapsed, size, peak, orm_peak
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}{'rows/s':>10}{'output MB':>11}{'export peak MB':>16}{'ORM load peak MB':>18}")
+    for rows in args.rows:
+        rate, size, peak, orm_peak = run(rows, args.students, args.format)
+        print(f"{rows:>9}{rate:>10.0f}{size / 1e6:>11.1f}{peak / 1e6:>16.1f}{orm_peak / 1e6:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Room-camera face matching: building the per-lecture embedding index and
+matching the faces of one frame against it (services/face_index.py).
+
+For every (faces, students) pair a fresh SQLite database is seeded with one
+group of --students students, each with a random enrolled embedding. The
+index is built the way start_lecture does. Frames are made of noisy copies
+of enrolled embeddings (plus a few strangers) and matched with the batched
+cosine similarity. The baseline compares every face with every student
+one pair at a time in Python. Reports build time, match time per frame and
+how many faces were matched to the right student.
+
+Usage (from backend/):
+    python benchmarks/bench_face_match.py [--sizes 30x60 100x500 200x2000] [--dim 128] [--frames 50]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.face_embedding import FaceEmbedding  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.user import User  # noqa: E402
+from services.face_index import face_index  # noqa: E402
+
+STRANGERS = 0.1  # share of faces that belong to nobody enrolled
+
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def seed(students, dim, rng):
+    enrolled = normalize(rng.normal(size=(students, dim)))
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@faces", "password": "x", "role": "faculty"}
+    ] + [
+        {"user_id": 2 + i, "name": f"Student {i}", "email": f"s{i}@faces", "password": "x", "role": "student"}
+        for i in range(students)
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Faces", "faculty_id": 1, "join_code": "FACES"}])
+    db.session.execute(GroupMember.__table__.insert(), [{"group_id": 1, "student_id": 2 + i} for i in range(students)])
+    db.session.execute(FaceEmbedding.__table__.insert(), [
+        {"student_id": 2 + i, "model": face_index.model, "dim": dim, "vector": enrolled[i].tobytes()}
+        for i in range(students)
+    ])
+    db.session.commit()
+    return enrolled
+
+
+def naive_match(embeddings, student_ids, matrix, threshold):
+    # One pair at a time, first come first served
+    taken, matches = set(), []
+    for face in embeddings:
+        best, best_score = None, threshold
+        for sid, vector in zip(student_ids, matrix):
+            score = sum(float(a) * float(b) for a, b in zip(face, vector))
+            if score >= best_score and sid not in taken:
+                best, best_score = sid, score
+        if best is not None:
+            taken.add(best)
+        matches.append(best)
+    return matches
+
+
+def run(faces, students, dim, frames):
+    rng = np.random.default_rng(0)
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "PRELOAD_MODELS": False})
+        with app.app_context():
+            enrolled = seed(students, dim, rng)
+
+            started = time.perf_counter()
+            entry = face_index.build(1, 1)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            batches, truths = [], []
+            for _ in range(frames):
+                present = rng.choice(students, size=min(faces, students), replace=False)
+                truth = [2 + int(i) for i in present]
+                vectors = enrolled[present] + rng.normal(scale=0.02, size=(len(present), dim))
+                strangers = rng.random(len(present)) < STRANGERS
+                vectors[strangers] = rng.normal(size=(int(strangers.sum()), dim))
+                truth = [None if s else t for s, t in zip(strangers, truth)]
+                batches.append(normalize(vectors))
+                truths.append(truth)
+
+            correct = total = 0
+            started = time.perf_counter()
+            for embeddings, truth in zip(batches, truths):
+                matches = face_index.match(1, 1, embeddings)
+                correct += sum(sid == t for (sid, _), t in zip(matches, truth))
+                total += len(truth)
+            match_ms = (time.perf_counter() - started) * 1000 / frames
+
+            started = time.perf_counter()
+            naive_match(batches[0], entry["student_ids"].tolist(), entry["matrix"], face_index.min_similarity)
+            naive_ms = (time.perf_counter() - started) * 1000
+            db.engine.dispose()
+        return build_ms, match_ms, naive_ms, correct / total
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["30x60", "100x500", "200x2000"],
+                        help="faces per frame x enrolled students")
+    parser.add_argument("--dim", type=int, default=128, help="embedding size (Facenet: 128)")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'faces x students':>17}{'build ms':>10}{'match ms':>10}{'naive ms':>10}{'correct':>9}")
+    for size in args.sizes:
+        faces, students = (int(n) for n in size.split("x"))
+        build_ms, match_ms, naive_ms, accuracy = run(faces, students, args.dim, args.frames)
+        print(f"{size:>17}{build_ms:>10.1f}{match_ms:>10.3f}{naive_ms:>10.0f}{accuracy:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
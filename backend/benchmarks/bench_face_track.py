@@ -0,0 +1,100 @@
+"""
+Face detection time per frame, without and with face tracking.
+
+Replays a recorded webcam sequence of one student (a directory of frames in
+name order, or a video file) through the worker's detection step twice:
+  full     -> full-frame detection on every frame (previous behaviour)
+  tracked  -> services.face_tracker hints + emotion_model.locate_face, i.e.
+              the padded region around the last box first, the full frame
+              every --full-every frames or when the face is lost
+Only detection is timed; the emotion CNN costs the same in both runs.
+Uses the INFERENCE_BACKEND of the environment: deepface needs an OpenCV
+build with Haar cascades (opencv 4.x) for the tracked path, opencv runs
+YuNet on the region instead.
+
+Usage (from backend/):
+    [INFERENCE_BACKEND=opencv] python benchmarks/bench_face_track.py --images DIR | --video FILE [--frames 720] [--full-every 12]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import emotion_model  # noqa: E402
+from services.face_tracker import FaceTracker  # noqa: E402
+
+
+def load_sequence(images_dir, video, count):
+    frames = []
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "*")))[:count]:
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append(img)
+    else:
+        capture = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ok, img = capture.read()
+            if not ok:
+                break
+            frames.append(img)
+    return frames
+
+
+def run_full(frames):
+    times = []
+    for img in frames:
+        started = time.perf_counter()
+        emotion_model.locate_face(img, {})
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def run_tracked(frames, full_every):
+    tracker = FaceTracker()
+    tracker.full_every = full_every
+    times = []
+    for img in frames:
+        roi = tracker.hint(1, 1)
+        started = time.perf_counter()
+        _, box, mode = emotion_model.locate_face(img, {"roi": roi} if roi else {})
+        elapsed = (time.perf_counter() - started) * 1000
+        times.append(elapsed)
+        tracker.update(1, 1, {"box": box, "mode": mode, "detect_ms": elapsed}, hinted=roi is not None)
+    return times, tracker.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="directory of recorded frames of one student")
+    source.add_argument("--video", help="recorded webcam video of one student")
+    parser.add_argument("--frames", type=int, default=720)
+    parser.add_argument("--full-every", type=int, default=12)
+    args = parser.parse_args()
+
+    frames = load_sequence(args.images, args.video, args.frames)
+    if not frames:
+        sys.exit("No readable frames")
+
+    emotion_model.locate_face(frames[0], {})  # load the detector outside the timings
+    full = run_full(frames)
+    tracked, stats = run_tracked(frames, args.full_every)
+
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'mode':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, times in (("full", full), ("tracked", tracked)):
+        print(f"{name:>8}{np.mean(times):>10.2f}{np.percentile(times, 50):>10.2f}{np.percentile(times, 95):>10.2f}")
+    print(f"ROI hits {stats['roi_hits']}, misses {stats['roi_misses']}, "
+          f"full detections {stats['full_detections']} -> "
+          f"{1 - np.mean(tracked) / np.mean(full):.0%} less detection time")
+
+
+if __name__ == "__main__":
+    main()
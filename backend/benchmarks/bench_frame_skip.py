@@ -0,0 +1,81 @@
+"""
+How many frames does the change-detection pre-filter skip, and what does it cost?
+
+Feeds a sequence of webcam frames (a directory of recorded frames, in name
+order, or a synthetic student who mostly sits still and moves now and then)
+through services.frame_filter for several thresholds and reports the skip
+ratio and the signature cost per frame. Compare the cost with the inference
+CPU per frame (avg_cpu_ms_per_frame in /api/health/stats).
+
+Usage (from backend/):
+    python benchmarks/bench_frame_skip.py [--images DIR] [--frames 720] [--thresholds 2 4 8]
+"""
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frame_filter import FrameChangeFilter  # noqa: E402
+
+
+def recorded_frames(images_dir, count):
+    frames = []
+    for path in sorted(glob.glob(os.path.join(images_dir, "*")))[:count]:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def synthetic_frames(count, move_every=12):
+    # 640x480 webcam frames: sensor noise on every frame, the head shifts
+    # every move_every frames (once a minute at one frame per 5 s)
+    rng = np.random.default_rng(0)
+    frames, x, y = [], 320, 240
+    for i in range(count):
+        if i % move_every == 0:
+            x, y = 320 + int(rng.integers(-60, 60)), 240 + int(rng.integers(-30, 30))
+        img = np.full((480, 640, 3), 110, dtype=np.uint8)
+        cv2.ellipse(img, (x, y), (90, 120), 0, 0, 360, (180, 170, 160), -1)
+        noise = rng.normal(0, 4, img.shape)
+        ok, buf = cv2.imencode(".jpg", np.clip(img + noise, 0, 255).astype(np.uint8),
+                               [cv2.IMWRITE_JPEG_QUALITY, 70])
+        frames.append(buf.tobytes())
+    return frames
+
+
+def run(frames, threshold, max_reuse):
+    flt = FrameChangeFilter()
+    flt.threshold, flt.max_reuse = threshold, max_reuse
+    for jpeg in frames:
+        signature = flt.signature(jpeg)
+        skipped, _ = flt.lookup(1, 1, signature)
+        if not skipped:
+            flt.remember(1, 1, signature, "neutral")
+    checked = flt.counters["frames_checked"]
+    return flt.counters["frames_skipped"] / checked, flt._signature_ms_total / checked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="directory of recorded frames of one student")
+    parser.add_argument("--frames", type=int, default=720, help="720 frames = one hour at 5 s")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--max-reuse", type=int, default=6)
+    args = parser.parse_args()
+
+    frames = recorded_frames(args.images, args.frames) if args.images else synthetic_frames(args.frames)
+
+    print(f"{len(frames)} frames, max {args.max_reuse} reuses in a row")
+    print(f"{'threshold':>10}{'skip ratio':>12}{'signature ms':>14}")
+    for threshold in args.thresholds:
+        ratio, signature_ms = run(frames, threshold, args.max_reuse)
+        print(f"{threshold:>10.1f}{ratio:>12.2%}{signature_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
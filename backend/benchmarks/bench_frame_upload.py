@@ -0,0 +1,103 @@
+"""
+Compare the two frame ingestion paths of the student lecture routes:
+
+  json   -> /log_emotion        base64 data URL inside JSON
+  binary -> /log_emotion_frame  raw image/jpeg body
+  face   -> /log_emotion_frame?face_crop=1 with a client-side 96x96 face crop
+
+Reports bytes on the wire per frame and server-side CPU per frame for the
+parsing + JPEG decode steps (inference itself is identical for all paths).
+
+Usage (from backend/):
+    python benchmarks/bench_frame_upload.py [--images DIR] [--frames 500]
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+def load_frames(images_dir, count):
+    # Real webcam frames if a directory is given, otherwise synthetic 320x240 ones
+    frames = []
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "*")))[:count]:
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append(cv2.resize(img, (320, 240)))
+    rng = np.random.default_rng(0)
+    while len(frames) < count:
+        img = np.full((240, 320, 3), 110, dtype=np.uint8)
+        cv2.ellipse(img, (160 + int(rng.integers(-20, 20)), 120), (55, 75), 0, 0, 360, (180, 170, 160), -1)
+        noise = rng.normal(0, 12, img.shape)
+        frames.append(np.clip(img + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def encode(img, quality=70):
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+
+def json_path(body):
+    # What log_emotion does: get_json -> split -> b64decode -> frombuffer -> imdecode
+    data = json.loads(body)
+    encoded = data["image"].split(",")[1]
+    nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def binary_path(body):
+    # What log_emotion_frame does: the body buffer is decoded in place
+    return cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+
+
+def measure(fn, bodies, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        for body in bodies:
+            fn(body)
+    return (time.process_time() - start) / (repeat * len(bodies))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="directory of sample frames")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.frames)
+
+    json_bodies, binary_bodies, face_bodies = [], [], []
+    for img in frames:
+        jpeg = encode(img)
+        data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+        json_bodies.append(json.dumps({"image": data_url}).encode())
+        binary_bodies.append(jpeg)
+        face_bodies.append(encode(cv2.resize(img[45:195, 85:235], (96, 96))))
+
+    rows = [
+        ("json (base64)", json_bodies, json_path),
+        ("binary jpeg", binary_bodies, binary_path),
+        ("binary face crop", face_bodies, binary_path),
+    ]
+
+    baseline_bytes = baseline_cpu = None
+    print(f"{'path':<18}{'bytes/frame':>14}{'vs json':>10}{'decode us/frame':>18}{'vs json':>10}")
+    for name, bodies, fn in rows:
+        avg_bytes = sum(len(b) for b in bodies) / len(bodies)
+        cpu = measure(fn, bodies, args.repeat)
+        if baseline_bytes is None:
+            baseline_bytes, baseline_cpu = avg_bytes, cpu
+        print(f"{name:<18}{avg_bytes:>14.0f}{avg_bytes / baseline_bytes:>9.0%} "
+              f"{cpu * 1e6:>17.1f}{cpu / baseline_cpu:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
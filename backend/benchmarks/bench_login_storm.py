@@ -0,0 +1,129 @@
+"""
+Login storm: --users students logging in at the same moment.
+
+For every hash method a fresh SQLite database is seeded with --users
+students whose passwords were hashed with that method. Then --concurrency
+client threads post all logins to /api/auth/login through the Flask test
+client, as fast as the server answers. Reports logins/s, latency
+percentiles and how many were turned away with 503 (hashing queue full).
+--stored-method seeds the hashes with a different method, so every login
+also upgrades its hash (see services/passwords.py).
+
+Usage (from backend/):
+    python benchmarks/bench_login_storm.py [--users 2000] [--concurrency 64]
+        [--methods scrypt:32768:8:1 scrypt:16384:8:1 pbkdf2:sha256:100000] [--workers 4]
+        [--queue 256] [--stored-method pbkdf2:sha256:100000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.user import User  # noqa: E402
+from services.passwords import password_hasher  # noqa: E402
+
+PASSWORD = "storm-password"
+
+
+def run(method, stored_method, users, concurrency, workers, queue):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "PRELOAD_MODELS": False,
+                "PASSWORD_HASH_METHOD": method,
+                "PASSWORD_HASH_WORKERS": workers,
+                "PASSWORD_HASH_QUEUE": queue,
+            })
+        with app.app_context():
+            # Same hash for everyone: verifying costs the same, seeding stays fast
+            stored = generate_password_hash(PASSWORD, stored_method or method)
+            db.session.execute(User.__table__.insert(), [
+                {"user_id": i, "name": f"Student {i}", "email": f"s{i}@storm", "password": stored,
+                 "role": "student", "roll_no": str(i)}
+                for i in range(1, users + 1)
+            ])
+            db.session.commit()
+
+        remaining = list(range(1, users + 1))
+        lock = threading.Lock()
+        latencies, statuses = [], []
+
+        def client():
+            test_client = app.test_client()
+            while True:
+                with lock:
+                    if not remaining:
+                        return
+                    user = remaining.pop()
+                started = time.perf_counter()
+                res = test_client.post("/api/auth/login", json={"email": f"s{user}@storm", "password": PASSWORD})
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses.append(res.status_code)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        # Background re-hashes still running would touch the removed file
+        while password_hasher.stats()["pending"]:
+            time.sleep(0.05)
+        stats = password_hasher.stats()
+        with app.app_context():
+            db.engine.dispose()
+
+        statuses = np.array(statuses)
+        return {
+            "ok": int((statuses == 200).sum()),
+            "busy": int((statuses == 503).sum()),
+            "rate": int((statuses == 200).sum()) / elapsed,
+            "p50": np.percentile(latencies, 50),
+            "p95": np.percentile(latencies, 95),
+            "rehashed": stats["rehashed"],
+        }
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--methods", nargs="+",
+                        default=["scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:100000"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="hashing threads")
+    parser.add_argument("--queue", type=int, default=256, help="hashes allowed to wait")
+    parser.add_argument("--stored-method", help="method of the seeded hashes (default: the tested one)")
+    args = parser.parse_args()
+
+    print(f"{args.users} logins from {args.concurrency} threads, {args.workers} hashing threads, "
+          f"queue {args.queue} ({os.cpu_count()} cores)")
+    print(f"{'method':<24}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'ok':>7}{'503':>6}{'rehashed':>10}")
+    for method in args.methods:
+        r = run(method, args.stored_method, args.users, args.concurrency, args.workers, args.queue)
+        print(f"{method:<24}{r['rate']:>10.1f}{r['p50']:>9.0f}{r['p95']:>9.0f}"
+              f"{r['ok']:>7}{r['busy']:>6}{r['rehashed']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Cost of the metrics layer (services/metrics.py) and of the slow-request
+profiler (services/profiler.py) on the student frame path.
+
+A fresh SQLite database is seeded with one live lecture and one student per
+run; --requests distinct frames are posted to log_emotion_frame through the
+Flask test client with the stub inference backend and an in-process
+inference thread, so the timings are the web path itself. Three runs:
+  off       METRICS_ENABLED=0
+  metrics   METRICS_ENABLED=1
+  profiler  METRICS_ENABLED=1 + PROFILE_SLOW_REQUEST_MS above every request
+            (sampling cost only, nothing written)
+Prints the time per request of each run, the cost of one metrics.stage()
+block enabled / disabled, and the stage histogram counts /metrics reported
+for the instrumented run.
+
+Usage (from backend/):
+    python benchmarks/bench_metrics_overhead.py [--requests 2000] [--rounds 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+os.environ.setdefault("INFERENCE_BACKEND", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.user import User  # noqa: E402
+from services.emotion_log_buffer import emotion_log_buffer  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+
+RUNS = [
+    ("off", {"METRICS_ENABLED": False, "PROFILE_SLOW_REQUEST_MS": 0}),
+    ("metrics", {"METRICS_ENABLED": True, "PROFILE_SLOW_REQUEST_MS": 0}),
+    ("profiler", {"METRICS_ENABLED": True, "PROFILE_SLOW_REQUEST_MS": 60000}),
+]
+
+
+def make_frames(count):
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        # Different brightness every frame, so the frame filter lets it through
+        img = np.clip(rng.normal(40 + (i * 37) % 170, 10, (120, 160, 3)), 0, 255).astype(np.uint8)
+        frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return frames
+
+
+def seed():
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@metrics", "password": "x", "role": "faculty"},
+        {"user_id": 2, "name": "Student", "email": "student@metrics", "password": "x", "role": "student"},
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Metrics", "faculty_id": 1, "join_code": "METRIC"}])
+    db.session.execute(GroupMember.__table__.insert(), [{"group_id": 1, "student_id": 2}])
+    db.session.execute(Lecture.__table__.insert(), [
+        {"id": 1, "group_id": 1, "topic": "Metrics", "status": "live",
+         "scheduled_start": now, "scheduled_end": now, "actual_start": now}
+    ])
+    db.session.commit()
+
+
+def run(overrides, frames):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app(dict(overrides, SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", PRELOAD_MODELS=False,
+                                  INFERENCE_WORKERS=0, INFERENCE_BATCH_WAIT_MS=0, INFERENCE_BACKEND="stub"))
+        with app.app_context():
+            seed()
+            token = create_access_token(identity="2", additional_claims={"role": "student"})
+        metrics.clear()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "image/jpeg"}
+
+        with contextlib.redirect_stdout(io.StringIO()):  # save_emotion_log prints every frame
+            client.post("/api/student/lectures/1/log_emotion_frame", data=frames[-1], headers=headers)  # warm up
+            started = time.perf_counter()
+            for frame in frames:
+                res = client.post("/api/student/lectures/1/log_emotion_frame", data=frame, headers=headers)
+                assert res.status_code in (200, 201), res.get_json()
+            elapsed = time.perf_counter() - started
+        text = client.get("/metrics").get_data(as_text=True)
+        emotion_log_buffer.flush()  # before the next run points it at another database
+        with app.app_context():
+            db.engine.dispose()
+        return elapsed * 1e6 / len(frames), text
+    finally:
+        os.remove(path)
+
+
+def stage_cost(enabled, count=200000):
+    # ns per `with metrics.stage(...)` block
+    metrics.enabled = enabled
+    started = time.perf_counter()
+    for _ in range(count):
+        with metrics.stage("bench"):
+            pass
+    elapsed = time.perf_counter() - started
+    metrics.clear()
+    return elapsed * 1e9 / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3, help="best of N per run")
+    args = parser.parse_args()
+
+    frames = make_frames(args.requests)
+    best, exposition = {}, ""
+    for _ in range(args.rounds):
+        for name, overrides in RUNS:
+            us, text = run(overrides, frames)
+            best[name] = min(best.get(name, us), us)
+            if name == "metrics":
+                exposition = text
+
+    print(f"{args.requests} frames per run, best of {args.rounds}")
+    print(f"{'run':>9}{'us/req':>10}{'overhead':>10}")
+    for name, _ in RUNS:
+        print(f"{name:>9}{best[name]:>10.0f}{best[name] / best['off'] - 1:>10.1%}")
+
+    print(f"\nmetrics.stage() block: {stage_cost(True):.0f} ns enabled, {stage_cost(False):.0f} ns disabled")
+
+    print("\n/metrics stage counts (metrics run):")
+    for line in exposition.splitlines():
+        if line.startswith("smartclass_stage_seconds_count"):
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Bulk roster import (POST /api/faculty/groups/<id>/roster) vs. the one
+student at a time path it replaces.
+
+For every roster size a fresh SQLite database is seeded with a faculty, a
+group and --existing-share of the roster as already registered students
+(half of those already in the group). The roster is then uploaded as CSV
+through the Flask test client; the streamed report is read to the end.
+The baseline runs what signup + join_group do per student (without the
+password hash): look up the email, insert the user, commit, look up the
+membership, insert it, commit.
+Reports rows/s, time and SQL statements for both (the baseline only runs
+--baseline-rows of the roster).
+
+Usage (from backend/):
+    python benchmarks/bench_roster_import.py [--rows 1000 10000] [--existing-share 0.2]
+        [--chunk 1000] [--baseline-rows 1000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def roster_csv(rows):
+    lines = ["name,email,roll_no"] + [f"Student {i},s{i}@roster,R{i}" for i in range(rows)]
+    return "\n".join(lines) + "\n"
+
+
+def seed(rows, existing_share):
+    existing = int(rows * existing_share)
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@roster", "password": "x", "role": "faculty"}
+    ] + [
+        {"user_id": 2 + i, "name": f"Student {i}", "email": f"s{i}@roster", "password": "x", "role": "student"}
+        for i in range(existing)
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Roster", "faculty_id": 1, "join_code": "ROSTER"}])
+    if existing // 2:
+        db.session.execute(GroupMember.__table__.insert(), [
+            {"group_id": 1, "student_id": 2 + i} for i in range(existing // 2)
+        ])
+    db.session.commit()
+
+
+def one_at_a_time(indices):
+    for i in indices:
+        email = f"s{i}@roster"
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            user = User(name=f"Student {i}", email=email, password="x", role="student", roll_no=f"R{i}")
+            db.session.add(user)
+            db.session.commit()
+        if not GroupMember.query.filter_by(group_id=1, student_id=user.user_id).first():
+            db.session.add(GroupMember(group_id=1, student_id=user.user_id))
+            db.session.commit()
+
+
+def run(rows, existing_share, chunk, baseline_rows):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "PRELOAD_MODELS": False,
+                "ROSTER_IMPORT_CHUNK": chunk,
+                "ROSTER_IMPORT_MAX_ROWS": max(rows, 20000),
+            })
+        with app.app_context():
+            seed(rows, existing_share)
+            token = create_access_token(identity="1", additional_claims={"role": "faculty"})
+            engine = db.engine
+
+        statements = [0]
+
+        def count(*args):
+            statements[0] += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            body = roster_csv(rows)
+            started = time.perf_counter()
+            res = app.test_client().post("/api/faculty/groups/1/roster", data=body, headers={
+                "Authorization": f"Bearer {token}", "Content-Type": "text/csv"})
+            lines = res.get_data(as_text=True).splitlines()
+            bulk_time = time.perf_counter() - started
+            summary = json.loads(lines[-1])["summary"]
+            assert summary["error"] == 0 and summary["rows"] == rows, summary
+            bulk_statements = statements[0]
+
+            # Baseline on a fresh copy of the same starting point
+            with app.app_context():
+                db.session.execute(GroupMember.__table__.delete())
+                db.session.execute(User.__table__.delete())
+                db.session.execute(Group.__table__.delete())
+                db.session.commit()
+                seed(rows, existing_share)
+                statements[0] = 0
+                started = time.perf_counter()
+                # Every n-th row, so the mix of new / existing students is the same
+                sample = range(0, rows, max(1, rows // baseline_rows))[:baseline_rows]
+                one_at_a_time(sample)
+                base_time = time.perf_counter() - started
+                base_statements = statements[0]
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+            with app.app_context():
+                db.engine.dispose()
+        return {
+            "bulk": (rows / bulk_time, bulk_time, bulk_statements),
+            "base": (len(sample) / base_time, base_time, base_statements),
+            "summary": summary,
+        }
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--existing-share", type=float, default=0.2, help="roster share already registered")
+    parser.add_argument("--chunk", type=int, default=1000, help="ROSTER_IMPORT_CHUNK")
+    parser.add_argument("--baseline-rows", type=int, default=1000, help="rows run one at a time")
+    args = parser.parse_args()
+
+    print(f"{'rows':>7}  {'path':<14}{'rows/s':>10}{'seconds':>9}{'statements':>12}")
+    for rows in args.rows:
+        r = run(rows, args.existing_share, args.chunk, args.baseline_rows)
+        for name, key in (("bulk import", "bulk"), ("one by one*", "base")):
+            rate, seconds, statements = r[key]
+            print(f"{rows:>7}  {name:<14}{rate:>10.0f}{seconds:>9.2f}{statements:>12}")
+        s = r["summary"]
+        print(f"{'':>9}created {s['created']}, enrolled {s['enrolled']}, already members {s['already_member']}")
+    print(f"* {args.baseline_rows} rows of the roster, spread evenly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Checks that the dashboard endpoints run a fixed number of SQL statements,
+whatever the number of groups per student or students per group (no N+1).
+
+For each size a fresh SQLite database is seeded with --groups groups of
+--students students (one student enrolled in all of them, every other group
+with a live lecture), then each endpoint is called through the Flask test
+client while an SQLAlchemy before_cursor_execute listener counts statements.
+Each endpoint gets two budgets: "cold" right after the live-lecture and
+access caches were cleared, "warm" once they are filled (the third call in a
+row, as a dashboard poll would see it). Exits with status 1 if an endpoint
+exceeds a budget.
+
+Usage (from backend/):
+    python benchmarks/check_query_budget.py [--groups 1 20] [--students 5 200]
+tests/test_query_budget.py runs the default sizes.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.user import User  # noqa: E402
+from services.access import access_cache  # noqa: E402
+from services.live_lectures import live_lectures  # noqa: E402
+
+# (name, role, url, cold budget, warm budget); group 1 always has live lecture 1
+ENDPOINTS = [
+    ("student group list", "student", "/api/student/groups/", 2, 1),
+    ("faculty group list", "faculty", "/api/faculty/groups/", 1, 1),
+    ("group students", "faculty", "/api/faculty/groups/1/students", 3, 2),
+    ("current live lecture", "faculty", "/api/faculty/lectures/group/1/current", 2, 1),
+    ("live status", "faculty", "/api/faculty/lectures/1/live_status", 3, 1),
+]
+WARM_CALL = 3
+
+
+def seed(groups, students):
+    now = datetime.utcnow()
+    # user 1 = faculty, user 2 = the student enrolled everywhere
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@bench", "password": "x", "role": "faculty"}
+    ] + [
+        {"user_id": 1 + i, "name": f"Student {i}", "email": f"s{i}@bench", "password": "x",
+         "role": "student", "roll_no": str(i)}
+        for i in range(1, students + 1)
+    ])
+    db.session.execute(Group.__table__.insert(), [
+        {"id": g, "name": f"Group {g}", "faculty_id": 1, "join_code": f"BENCH{g}"}
+        for g in range(1, groups + 1)
+    ])
+    db.session.execute(GroupMember.__table__.insert(), [
+        {"group_id": g, "student_id": 1 + i}
+        for g in range(1, groups + 1) for i in range(1, students + 1)
+    ])
+    db.session.execute(Lecture.__table__.insert(), [
+        {"id": g, "group_id": g, "topic": f"Lecture {g}", "status": "live",
+         "scheduled_start": now, "scheduled_end": now, "actual_start": now}
+        for g in range(1, groups + 1, 2)
+    ])
+    db.session.commit()
+
+
+def run(groups, students):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "PRELOAD_MODELS": False,
+            })
+        with app.app_context():
+            seed(groups, students)
+            tokens = {
+                "faculty": create_access_token(identity="1", additional_claims={"role": "faculty"}),
+                "student": create_access_token(identity="2", additional_claims={"role": "student"}),
+            }
+            engine = db.engine
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        client = app.test_client()
+        counts = {}
+        try:
+            for name, role, url, _, _ in ENDPOINTS:
+                live_lectures.clear()
+                access_cache.clear()
+                calls = []
+                for _ in range(WARM_CALL):
+                    statements.clear()
+                    res = client.get(url, headers={"Authorization": f"Bearer {tokens[role]}"})
+                    assert res.status_code == 200, (url, res.get_json())
+                    calls.append(len(statements))
+                counts[name] = (calls[0], calls[-1])
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+            with app.app_context():
+                db.engine.dispose()
+        return counts
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 20], help="groups per student")
+    parser.add_argument("--students", type=int, nargs="+", default=[5, 200], help="students per group")
+    args = parser.parse_args()
+
+    sizes = [(g, s) for g in args.groups for s in args.students]
+    results = {size: run(*size) for size in sizes}
+
+    failures = 0
+    print("statements per request, cold / warm")
+    print(f"{'endpoint':<22}{'budget':>8}" + "".join(f"{f'{g}g x {s}s':>12}" for g, s in sizes))
+    for name, _, _, cold_budget, warm_budget in ENDPOINTS:
+        counts = [results[size][name] for size in sizes]
+        ok = all(cold <= cold_budget and warm <= warm_budget for cold, warm in counts)
+        failures += not ok
+        print(f"{name:<22}{f'{cold_budget} / {warm_budget}':>8}"
+              + "".join(f"{f'{cold} / {warm}':>12}" for cold, warm in counts) + ("" if ok else "  FAIL"))
+
+    print(f"{len(ENDPOINTS) - failures}/{len(ENDPOINTS)} endpoints within their statement budget")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
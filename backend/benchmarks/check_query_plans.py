@@ -0,0 +1,117 @@
+"""
+Checks that the hot queries are served by the indexes declared on the models.
+
+Each query below is compiled for the target database and run through
+EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (MySQL); the check fails when the plan
+does not mention the expected index, i.e. the query would scan the table.
+Exits with status 1 if any check fails.
+
+Usage (from backend/):
+    python benchmarks/check_query_plans.py                      # throwaway SQLite file
+    python benchmarks/check_query_plans.py --database-url mysql+pymysql://user:pw@host/db
+Run `flask create-indexes` first on an existing database.
+tests/test_query_plans.py runs the same checks against SQLite.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.emotion_log import EmotionLog  # noqa: E402
+from models.emotion_rollup import EmotionRollup  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.lecture_attendance import LectureAttendance  # noqa: E402
+
+# (description, statement, index names any of which may serve it)
+CHECKS = [
+    ("emotion_logs of one student in a lecture, by time",
+     select(EmotionLog.timestamp, EmotionLog.emotion)
+     .where(EmotionLog.lecture_id == 1, EmotionLog.student_id == 2)
+     .order_by(EmotionLog.timestamp),
+     {"ix_emotion_logs_lecture_student_ts"}),
+    ("emotion_logs of one lecture in (student, time) order (rollup rebuild, archive)",
+     select(EmotionLog.student_id, EmotionLog.emotion, EmotionLog.timestamp)
+     .where(EmotionLog.lecture_id == 1)
+     .order_by(EmotionLog.student_id, EmotionLog.timestamp),
+     {"ix_emotion_logs_lecture_student_ts"}),
+    ("emotion_rollups of one lecture",
+     select(EmotionRollup.student_id, EmotionRollup.emotion, EmotionRollup.log_count)
+     .where(EmotionRollup.lecture_id == 1),
+     # SQLite names the index backing a UNIQUE constraint itself
+     {"uq_emotion_rollup", "sqlite_autoindex_emotion_rollups"}),
+    ("roster of a group",
+     select(GroupMember.student_id).where(GroupMember.group_id == 1),
+     {"ix_group_members_group_student"}),
+    ("membership check",
+     select(GroupMember.id).where(GroupMember.group_id == 1, GroupMember.student_id == 2),
+     {"ix_group_members_group_student"}),
+    ("groups of a student",
+     select(GroupMember.group_id).where(GroupMember.student_id == 2),
+     {"ix_group_members_student"}),
+    ("live lecture of a group",
+     select(Lecture.id).where(Lecture.group_id == 1, Lecture.status == "live"),
+     {"ix_lectures_group_status"}),
+    ("attendance of a student in a lecture",
+     select(LectureAttendance.id)
+     .where(LectureAttendance.lecture_id == 1, LectureAttendance.student_id == 2),
+     {"ix_lecture_attendance_lecture_student"}),
+]
+
+
+def explain(conn, statement):
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        # rows: (id, parent, notused, detail)
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    # MySQL rows carry the chosen index in the "key" column
+    return [f"{row._mapping['table']}: key={row._mapping['key']}"
+            for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", help="database to check (default: a new SQLite file)")
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if not url:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+            app = create_app({"SQLALCHEMY_DATABASE_URI": url, "PRELOAD_MODELS": False})
+
+        failures = 0
+        with app.app_context(), db.engine.connect() as conn:
+            if conn.dialect.name == "sqlite":
+                conn.execute(text("ANALYZE"))
+            for description, statement, indexes in CHECKS:
+                plan = explain(conn, statement)
+                ok = any(name in line for line in plan for name in indexes)
+                failures += not ok
+                print(f"{'PASS' if ok else 'FAIL'}  {description}")
+                if not ok:
+                    for line in plan:
+                        print(f"        {line}")
+    finally:
+        if path:
+            os.remove(path)
+
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} queries use their index")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Requests/s of the production server (gunicorn.conf.py) as web workers are added.
+
+For every --workers value a gunicorn server is started on a throwaway
+database seeded with one group of --students students and a live lecture.
+Client processes (--clients, each with --concurrency keep-alive connections)
+then hit it for --duration seconds. Scenarios:
+  api     -> student group list + faculty live_status (IO bound, no models)
+  frames  -> binary log_emotion_frame uploads, one synthetic student frame each
+             (CPU bound: needs deepface; INFERENCE_PROCESSES follows --workers)
+Reports requests/s, latency percentiles and errors per worker count.
+--url load-tests a server that is already running instead (seed it with
+--seed-only against the same --database-url first).
+
+Usage (from backend/, needs `pip install gunicorn`):
+    python benchmarks/load_test.py [--scenario api|frames] [--workers 1 2 4] [--duration 20]
+    python benchmarks/load_test.py --url http://host:5000 --database-url URL [--scenario ...]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def seed(database_url, students, insert=True):
+    # Returns {"faculty": token, "students": [token, ...]}; insert=False only
+    # makes the tokens (the database was seeded by an earlier --seed-only run)
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+
+    with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+        app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "PRELOAD_MODELS": False})
+    with app.app_context():
+        if insert:
+            insert_rows(students)
+        return {
+            "faculty": create_access_token(identity="1", additional_claims={"role": "faculty"}),
+            "students": [create_access_token(identity=str(1 + i), additional_claims={"role": "student"})
+                         for i in range(1, students + 1)],
+        }
+
+
+def insert_rows(students):
+    from extensions import db
+    from models.group import Group
+    from models.group_member import GroupMember
+    from models.lecture import Lecture
+    from models.user import User
+
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": 1, "name": "Faculty", "email": "faculty@load", "password": "x", "role": "faculty"}
+    ] + [
+        {"user_id": 1 + i, "name": f"Student {i}", "email": f"s{i}@load", "password": "x",
+         "role": "student", "roll_no": str(i)}
+        for i in range(1, students + 1)
+    ])
+    db.session.execute(Group.__table__.insert(), [{"id": 1, "name": "Load", "faculty_id": 1, "join_code": "LOAD01"}])
+    db.session.execute(GroupMember.__table__.insert(), [
+        {"group_id": 1, "student_id": 1 + i} for i in range(1, students + 1)
+    ])
+    db.session.execute(Lecture.__table__.insert(), [{
+        "id": 1, "group_id": 1, "topic": "Load", "status": "live",
+        "scheduled_start": now, "scheduled_end": now, "actual_start": now
+    }])
+    db.session.commit()
+
+
+def student_frame(rng):
+    # 640x480 webcam-like JPEG with a face-sized oval at a random spot
+    img = np.full((480, 640, 3), 110, dtype=np.uint8)
+    center = (320 + int(rng.integers(-80, 80)), 240 + int(rng.integers(-40, 40)))
+    cv2.ellipse(img, center, (90, 120), 0, 0, 360, (180, 170, 160), -1)
+    noise = rng.normal(0, 4, img.shape)
+    ok, buf = cv2.imencode(".jpg", np.clip(img + noise, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return buf.tobytes()
+
+
+def requests_for(scenario, tokens, index):
+    # Endless (method, path, body, headers) generator for one connection
+    rng = np.random.default_rng(index)
+    student = tokens["students"][index % len(tokens["students"])]
+    if scenario == "api":
+        calls = [
+            ("GET", "/api/student/groups/", None, {"Authorization": f"Bearer {student}"}),
+            ("GET", "/api/faculty/lectures/1/live_status", None, {"Authorization": f"Bearer {tokens['faculty']}"}),
+        ]
+        while True:
+            yield from calls
+    else:
+        frames = [student_frame(rng) for _ in range(8)]
+        headers = {"Authorization": f"Bearer {student}", "Content-Type": "image/jpeg"}
+        while True:
+            for frame in frames:
+                yield "POST", "/api/student/lectures/1/log_emotion_frame", frame, headers
+
+
+def client_process(url, scenario, tokens, first_index, concurrency, duration, out):
+    # One process, `concurrency` threads with their own keep-alive connection
+    import threading
+
+    target = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + duration
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def run(index):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        local, failed = [], 0
+        for method, path, body, headers in requests_for(scenario, tokens, index):
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                res = conn.getresponse()
+                res.read()
+                if res.status >= 400 and res.status != 503:
+                    failed += 1
+                else:
+                    local.append((time.perf_counter() - started) * 1000)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=run, args=(first_index + i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out.put((latencies, errors[0]))
+
+
+def load(url, scenario, tokens, clients, concurrency, duration):
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client_process,
+                                     args=(url, scenario, tokens, c * concurrency, concurrency, duration, out))
+             for c in range(clients)]
+    for p in procs:
+        p.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        lat, err = out.get()
+        latencies.extend(lat)
+        errors += err
+    for p in procs:
+        p.join()
+    return np.array(latencies), errors
+
+
+def wait_ready(url, timeout):
+    target = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            conn.request("GET", "/api/health/ready")
+            res = conn.getresponse()
+            ready = res.status == 200 and json.loads(res.read()).get("ready")
+            conn.close()
+            if ready:
+                return True
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_server(workers, port, database_url, scenario):
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}",
+               DATABASE_URL=database_url,
+               PRELOAD_MODELS="1" if scenario == "frames" else "0",
+               INFERENCE_PROCESSES=str(workers),
+               # Every upload should reach the model
+               FRAME_SKIP_ENABLED="0")
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                            cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def report(workers, latencies, errors, duration):
+    if not len(latencies):
+        print(f"{workers:>8}{'-':>10}{'-':>9}{'-':>9}{'-':>9}{errors:>8}")
+        return
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{workers:>8}{len(latencies) / duration:>10.0f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["api", "frames"], default="api")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--url", help="load-test a running server instead of starting gunicorn")
+    parser.add_argument("--database-url", help="database to seed (default: a new SQLite file)")
+    parser.add_argument("--seed-only", action="store_true")
+    args = parser.parse_args()
+
+    path = None
+    database_url = args.database_url
+    if not database_url:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    try:
+        tokens = seed(database_url, args.students, insert=not args.url)
+        if args.seed_only:
+            print(f"Seeded {args.students} students, live lecture 1")
+            return
+
+        print(f"scenario {args.scenario}: {args.clients} client processes x {args.concurrency} connections, "
+              f"{args.duration:.0f} s per run ({multiprocessing.cpu_count()} cores)")
+        print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+
+        if args.url:
+            latencies, errors = load(args.url, args.scenario, tokens, args.clients, args.concurrency, args.duration)
+            report("-", latencies, errors, args.duration)
+            return
+
+        for workers in args.workers:
+            server = start_server(workers, args.port, database_url, args.scenario)
+            url = f"http://127.0.0.1:{args.port}"
+            try:
+                if not wait_ready(url, timeout=300):
+                    sys.exit(f"Server with {workers} workers did not become ready")
+                latencies, errors = load(url, args.scenario, tokens, args.clients, args.concurrency, args.duration)
+                report(workers, latencies, errors, args.duration)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=60)
+    finally:
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""
+Virtual classroom: how many concurrent students one create_app() deployment
+carries, end to end over HTTP.
+
+Every step of the ramp starts the app on a fresh database (SQLite file, or
+the --database-url MySQL database, wiped first) in its own process, served by
+werkzeug's threaded server with the inference engine of the real app. It
+seeds --lectures live lectures, each with its own faculty and group of N
+students (N from --students), then simulates them for --duration seconds:
+  students  POST log_emotion_frame every --frame-interval s (320x240 JPEGs like
+            the browser client; with --adaptive they follow next_capture_ms)
+            and GET the group list every --groups-interval s (with the ETag
+            the browser would send back)
+  faculty   GET live_status every --live-status-interval s
+Requests are scheduled like the real clients (polls on a fixed clock, the
+next frame once the previous one was answered) and sent by --threads client
+threads over keep-alive connections. Each step ends with end_lecture for
+every lecture.
+
+Reported per step and endpoint: throughput, p50/p95/p99 latency, 304s, 503s
+(load shedding), errors and SQL statements per request (read from the
+server's /metrics). A step is saturated when a p95 exceeds --slo-ms, more
+than 1% of the requests are shed or fail, or the server falls more than 5%
+behind the rate the clients want; the ramp stops at the first one.
+
+--inference stub (default) replaces the models with the stub backend, so the
+numbers are the HTTP + DB cost alone; deepface / opencv add the real models.
+Frames are generated (a face-like oval that moves between frames) unless
+--images points at real webcam frames.
+
+Usage (from backend/):
+    python benchmarks/virtual_classroom.py [--lectures 2] [--students 10 25 50 100 200] [--duration 30]
+        [--inference stub|deepface|opencv] [--inference-workers 1] [--adaptive] [--images DIR]
+    python benchmarks/virtual_classroom.py --database-url mysql+pymysql://user:pw@localhost/bench --wipe ...
+"""
+import argparse
+import contextlib
+import heapq
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = {
+    # name -> Flask endpoint, for the statement counts of /metrics
+    "log_emotion_frame": "student_lecture.log_live_emotion_frame",
+    "groups_list": "student_group.get_student_groups",
+    "live_status": "faculty_lecture.get_live_status",
+    "end_lecture": "faculty_lecture.end_lecture",
+}
+MAX_SHED_OR_FAILED = 0.01
+MIN_RATE_SHARE = 0.95
+
+
+# ---------------- database ----------------
+
+def seed(database_url, lectures, students, wipe):
+    # K groups with their own faculty (user k), N students each and a live
+    # lecture per group. Returns the tokens:
+    #   {"faculty": {lecture_id: token}, "students": {lecture_id: [token, ...]}}
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from extensions import db
+    from models.group import Group
+    from models.group_member import GroupMember
+    from models.lecture import Lecture
+    from models.user import User
+
+    with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+        app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "PRELOAD_MODELS": False})
+    with app.app_context():
+        if wipe:
+            db.drop_all()
+            db.create_all()
+        now = datetime.utcnow()
+        student_ids = {k: [lectures + (k - 1) * students + i for i in range(1, students + 1)]
+                       for k in range(1, lectures + 1)}
+        db.session.execute(User.__table__.insert(), [
+            {"user_id": k, "name": f"Faculty {k}", "email": f"f{k}@classroom", "password": "x", "role": "faculty"}
+            for k in range(1, lectures + 1)
+        ] + [
+            {"user_id": sid, "name": f"Student {sid}", "email": f"s{sid}@classroom", "password": "x",
+             "role": "student", "roll_no": str(sid)}
+            for ids in student_ids.values() for sid in ids
+        ])
+        db.session.execute(Group.__table__.insert(), [
+            {"id": k, "name": f"Class {k}", "faculty_id": k, "join_code": f"VC{k:04d}"}
+            for k in range(1, lectures + 1)
+        ])
+        db.session.execute(GroupMember.__table__.insert(), [
+            {"group_id": k, "student_id": sid} for k, ids in student_ids.items() for sid in ids
+        ])
+        db.session.execute(Lecture.__table__.insert(), [
+            {"id": k, "group_id": k, "topic": f"Lecture {k}", "status": "live",
+             "scheduled_start": now, "scheduled_end": now, "actual_start": now}
+            for k in range(1, lectures + 1)
+        ])
+        db.session.commit()
+        tokens = {
+            "faculty": {k: create_access_token(identity=str(k), additional_claims={"role": "faculty"})
+                        for k in student_ids},
+            "students": {k: [create_access_token(identity=str(sid), additional_claims={"role": "student"})
+                             for sid in ids]
+                         for k, ids in student_ids.items()},
+        }
+        db.engine.dispose()
+    return tokens
+
+
+# ---------------- server ----------------
+
+def serve(database_url, port, overrides, ready):
+    # Runs in its own process: the app as one web worker would run it
+    import logging
+
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from services.emotion_log_buffer import emotion_log_buffer
+    from services.inference_engine import inference_engine
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    sys.stdout = open(os.devnull, "w")  # the url map and a line per frame
+    app = create_app(dict(overrides, SQLALCHEMY_DATABASE_URI=database_url))
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    # SIGTERM -> stop serving, then drain inference and the log buffer
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    ready.set()
+    server.serve_forever()
+    inference_engine.shutdown()
+    emotion_log_buffer.flush()
+
+
+def wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/api/health/ready", timeout=2) as res:
+                if json.loads(res.read()).get("ready"):
+                    return True
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def statements_per_request(url):
+    # {flask endpoint: (statements, requests)} from smartclass_http_request_db_queries
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as res:
+        text = res.read().decode()
+    found = {}
+    for kind, endpoint, value in re.findall(
+            r'^smartclass_http_request_db_queries_(sum|count)\{[^}]*endpoint="([^"]+)"[^}]*\} (\S+)$', text, re.M):
+        sums = found.setdefault(endpoint, [0.0, 0.0])
+        sums[0 if kind == "sum" else 1] += float(value)
+    return found
+
+
+# ---------------- virtual users ----------------
+
+def make_frames(images_dir, count=48):
+    # JPEG bytes of 320x240 frames, like the browser client sends
+    frames = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir))[:count]:
+            img = cv2.imread(os.path.join(images_dir, name))
+            if img is not None:
+                frames.append(cv2.imencode(".jpg", cv2.resize(img, (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 70])[1])
+    rng = np.random.default_rng(0)
+    while len(frames) < count:
+        img = np.full((240, 320, 3), 100 + int(rng.integers(0, 40)), dtype=np.uint8)
+        center = (160 + int(rng.integers(-40, 40)), 120 + int(rng.integers(-20, 20)))
+        cv2.ellipse(img, center, (45, 60), 0, 0, 360, (180, 170, 160), -1)
+        img = np.clip(img + rng.normal(0, 4, img.shape), 0, 255).astype(np.uint8)
+        frames.append(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 70])[1])
+    return [frame.tobytes() for frame in frames]
+
+
+class Action:
+    # One recurring request of one virtual user
+
+    def __init__(self, name, method, path, token, interval, frames=None, adaptive=False, closed_loop=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.headers = {"Authorization": f"Bearer {token}"}
+        if frames:
+            self.headers["Content-Type"] = "image/jpeg"
+        self.interval = interval
+        self.frames = frames
+        self.frame_index = 0
+        self.adaptive = adaptive
+        # Frames: the next capture is scheduled once the answer arrived;
+        # polls run on a fixed clock (setInterval)
+        self.closed_loop = closed_loop
+        self.etag = None
+
+    def request(self):
+        headers = dict(self.headers)
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        body = None
+        if self.frames:
+            body = self.frames[self.frame_index % len(self.frames)]
+            self.frame_index += 1
+        return self.method, self.path, body, headers
+
+    def next_due(self, due, answered_at, status, response):
+        if not self.closed_loop:
+            return due + self.interval
+        interval = self.interval
+        if self.adaptive and status in (201, 200, 503):
+            try:
+                interval = json.loads(response).get("next_capture_ms", interval * 1000) / 1000
+            except ValueError:
+                pass
+        return answered_at + interval
+
+
+def virtual_users(tokens, frames, args, rng):
+    actions = []
+    for lecture_id, student_tokens in tokens["students"].items():
+        actions.append(Action("live_status", "GET", f"/api/faculty/lectures/{lecture_id}/live_status",
+                              tokens["faculty"][lecture_id], args.live_status_interval))
+        for token in student_tokens:
+            # Every student cycles through the frames from a different start
+            offset = int(rng.integers(len(frames)))
+            actions.append(Action("log_emotion_frame", "POST", f"/api/student/lectures/{lecture_id}/log_emotion_frame",
+                                  token, args.frame_interval, frames[offset:] + frames[:offset],
+                                  adaptive=args.adaptive, closed_loop=True))
+            actions.append(Action("groups_list", "GET", "/api/student/groups/", token, args.groups_interval))
+    return actions
+
+
+def drive(port, actions, duration, threads, rng):
+    # Runs the users for `duration` seconds. Returns per-endpoint samples and
+    # how late the client threads picked requests up (client saturation).
+    start = time.monotonic() + 0.5
+    deadline = start + duration
+    # Users join at random moments of their first interval
+    heap = [(start + rng.uniform(0, action.interval), i, action) for i, action in enumerate(actions)]
+    heapq.heapify(heap)
+    cond = threading.Condition()
+    samples = {name: [] for name in ENDPOINTS}  # (latency ms, status)
+    lags = []
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local, local_lags = [], []
+        while True:
+            with cond:
+                while True:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+                    if heap and heap[0][0] <= now:
+                        due, seq, action = heapq.heappop(heap)
+                        break
+                    cond.wait((min(heap[0][0], deadline) if heap else deadline) - now)
+                if now >= deadline:
+                    break
+            local_lags.append((now - due) * 1000)
+
+            method, path, body, headers = action.request()
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                res = conn.getresponse()
+                response = res.read()
+                status = res.status
+                if res.getheader("ETag"):
+                    action.etag = res.getheader("ETag")
+            except (OSError, http.client.HTTPException):
+                status, response = None, b""
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            local.append((action.name, (time.perf_counter() - started) * 1000, status))
+
+            with cond:
+                heapq.heappush(heap, (action.next_due(due, time.monotonic(), status, response), seq, action))
+                cond.notify()
+        conn.close()
+        with cond:
+            for name, latency, status in local:
+                samples[name].append((latency, status))
+            lags.extend(local_lags)
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return samples, lags
+
+
+def end_lectures(port, tokens):
+    samples = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    for lecture_id, token in tokens["faculty"].items():
+        started = time.perf_counter()
+        conn.request("POST", f"/api/faculty/lectures/{lecture_id}/end", headers={"Authorization": f"Bearer {token}"})
+        res = conn.getresponse()
+        res.read()
+        samples.append(((time.perf_counter() - started) * 1000, res.status))
+    conn.close()
+    return samples
+
+
+# ---------------- one step ----------------
+
+def run_step(args, students, frames, port):
+    path = None
+    database_url = args.database_url
+    if not database_url:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    try:
+        tokens = seed(database_url, args.lectures, students, wipe=bool(args.database_url))
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Event()
+        server = ctx.Process(target=serve, args=(database_url, port, {
+            "INFERENCE_BACKEND": args.inference,
+            "INFERENCE_WORKERS": args.inference_workers,
+            "PRELOAD_MODELS": True,
+        }, ready))
+        server.start()
+        url = f"http://127.0.0.1:{port}"
+        try:
+            if not ready.wait(120) or not wait_ready(url, timeout=600):
+                sys.exit(f"Server for {students} students per lecture did not become ready")
+            rng = np.random.default_rng(students)
+            actions = virtual_users(tokens, frames, args, rng)
+            samples, lags = drive(port, actions, args.duration, args.threads, rng)
+            samples["end_lecture"] = end_lectures(port, tokens)
+            statements = statements_per_request(url)
+        finally:
+            server.terminate()
+            server.join(timeout=60)
+    finally:
+        if path:
+            os.remove(path)
+
+    wanted = args.lectures * (students * (1 / args.frame_interval + 1 / args.groups_interval)
+                              + 1 / args.live_status_interval)
+    return samples, lags, statements, wanted
+
+
+def summarize(name, samples, duration, statements):
+    latencies = np.array([latency for latency, status in samples if status is not None and status < 500])
+    statuses = [status for _, status in samples]
+    row = {
+        "requests": len(samples),
+        "rate": len(samples) / duration if name != "end_lecture" else None,
+        "not_modified": statuses.count(304),
+        "shed": statuses.count(503),
+        "errors": sum(1 for s in statuses if s is None or (s >= 400 and s != 503)),
+    }
+    if len(latencies):
+        row["p50"], row["p95"], row["p99"] = np.percentile(latencies, [50, 95, 99])
+    stmts, count = statements.get(ENDPOINTS[name], (0, 0))
+    row["statements"] = stmts / count if count else None
+    return row
+
+
+def print_step(students, rows, lags, wanted, args):
+    print(f"\n{args.lectures} lectures x {students} students "
+          f"({args.lectures * students} students, clients want {wanted:.1f} req/s)")
+    print(f"{'endpoint':>18}{'requests':>10}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'304':>7}{'503':>6}{'errors':>8}{'SQL/req':>9}")
+    for name, row in rows.items():
+        def ms(key):
+            return f"{row[key]:.1f}" if key in row else "-"
+        rate = f"{row['rate']:.1f}" if row["rate"] is not None else "-"
+        sql = f"{row['statements']:.1f}" if row["statements"] is not None else "-"
+        print(f"{name:>18}{row['requests']:>10}{rate:>8}{ms('p50'):>9}{ms('p95'):>9}{ms('p99'):>9}"
+              f"{row['not_modified']:>7}{row['shed']:>6}{row['errors']:>8}{sql:>9}")
+    if lags and np.percentile(lags, 95) > 1000:
+        print(f"  client threads fell behind (p95 pick-up delay {np.percentile(lags, 95):.0f} ms): "
+              f"raise --threads or the numbers understate the server")
+
+
+def saturation(rows, wanted, args):
+    # -> reason the step is saturated, or None
+    live = {name: row for name, row in rows.items() if name != "end_lecture"}
+    for name, row in live.items():
+        if row.get("p95", 0) > args.slo_ms:
+            return f"{name} p95 {row['p95']:.0f} ms > {args.slo_ms:.0f} ms"
+    total = sum(row["requests"] for row in live.values())
+    bad = sum(row["shed"] + row["errors"] for row in live.values())
+    if total and bad / total > MAX_SHED_OR_FAILED:
+        return f"{bad / total:.1%} of the requests shed or failed"
+    achieved = sum(row["rate"] for row in live.values())
+    if achieved < MIN_RATE_SHARE * wanted:
+        return f"served {achieved:.1f} of {wanted:.1f} req/s"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lectures", type=int, default=2)
+    parser.add_argument("--students", type=int, nargs="+", default=[10, 25, 50, 100, 200],
+                        help="students per lecture, one ramp step each")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per step")
+    parser.add_argument("--inference", default="stub", help="INFERENCE_BACKEND of the server")
+    parser.add_argument("--inference-workers", type=int, default=1)
+    parser.add_argument("--frame-interval", type=float, default=5)
+    parser.add_argument("--groups-interval", type=float, default=5)
+    parser.add_argument("--live-status-interval", type=float, default=3)
+    parser.add_argument("--adaptive", action="store_true", help="students follow next_capture_ms")
+    parser.add_argument("--images", help="directory of webcam frames to send instead of generated ones")
+    parser.add_argument("--threads", type=int, default=64, help="client threads")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p95 latency that counts as saturated")
+    parser.add_argument("--database-url", help="e.g. a local MySQL database (default: a new SQLite file per step)")
+    parser.add_argument("--wipe", action="store_true", help="confirm that --database-url may be dropped and re-created")
+    parser.add_argument("--port", type=int, default=5056)
+    args = parser.parse_args()
+
+    if args.database_url and not args.wipe:
+        sys.exit("Every step drops and re-creates the tables of --database-url; add --wipe to confirm")
+
+    frames = make_frames(args.images)
+    print(f"inference backend {args.inference} x {args.inference_workers} workers, {args.duration:.0f} s per step, "
+          f"{args.threads} client threads, {os.cpu_count()} cores, "
+          f"{'MySQL/other' if args.database_url else 'SQLite'} database")
+
+    summary, saturated_at, last_ok = [], None, None
+    for students in args.students:
+        samples, lags, statements, wanted = run_step(args, students, frames, args.port)
+        rows = {name: summarize(name, samples[name], args.duration, statements) for name in ENDPOINTS}
+        print_step(students, rows, lags, wanted, args)
+        reason = saturation(rows, wanted, args)
+        summary.append((students, wanted, sum(r["rate"] for n, r in rows.items() if n != "end_lecture"),
+                        rows["log_emotion_frame"].get("p95"), reason))
+        if reason:
+            saturated_at = students
+            break
+        last_ok = students
+
+    print(f"\n{'students':>10}{'wanted/s':>10}{'served/s':>10}{'frame p95':>11}  saturated")
+    for students, wanted, achieved, p95, reason in summary:
+        p95 = f"{p95:.1f}" if p95 is not None else "-"
+        print(f"{args.lectures * students:>10}{wanted:>10.1f}{achieved:>10.1f}{p95:>11}  {reason or 'no'}")
+    if saturated_at is None:
+        print(f"\nNot saturated up to {args.lectures} x {args.students[-1]} students")
+    elif last_ok is None:
+        print(f"\nSaturated already at {args.lectures} x {saturated_at} students")
+    else:
+        print(f"\nSaturation point: between {args.lectures * last_ok} and {args.lectures * saturated_at} "
+              f"concurrent students ({args.lectures} lectures)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import Integer, case, column, func, inspect, select, table, text
+
+from emotions import Emotion, LABELS
+from extensions import db
+from models.lecture import Lecture
+from models.emotion_log import EmotionLog
+from models.emotion_rollup import EmotionRollup
+from services.archive import archive_lecture, is_archived
+from services.rollups import rebuild_lecture_rollup
+
+
+# Columns that used to hold emotion labels as strings, with the code given to
+# anything outside the vocabulary
+EMOTION_COLUMNS = [
+    ("emotion_logs", "emotion", Emotion.BORED),
+    ("emotion_rollups", "emotion", Emotion.BORED),
+    ("lecture_attendance", "dominant_mood", Emotion.ABSENT),
+    ("lectures", "dominant_class_mood", Emotion.PENDING),
+]
+MIGRATION_CHUNK = 50000
+
+
+def _convert_emotion_column(table_name, column_name, fallback):
+    # Rewrites labels as code digits in id-range chunks, then changes the
+    # column type. Safe to re-run after an interruption.
+    t = table(table_name, column("id"), column(column_name))
+    col = t.c[column_name]
+    mapping = {label: str(int(code)) for label, code in LABELS.items()}
+    mapping.update({str(int(code)): str(int(code)) for code in Emotion})
+    new_value = case(mapping, value=col, else_=str(int(fallback)))
+
+    with db.engine.connect() as conn:
+        low, high = conn.execute(select(func.min(t.c.id), func.max(t.c.id))).one()
+    for start in range(low or 0, (high or 0) + 1, MIGRATION_CHUNK):
+        with db.engine.begin() as conn:
+            conn.execute(t.update()
+                         .where(t.c.id.between(start, start + MIGRATION_CHUNK - 1), col.is_not(None))
+                         .values({column_name: new_value}))
+
+    nullable = "NULL" if table_name in ("lecture_attendance", "lectures") else "NOT NULL"
+    with db.engine.begin() as conn:
+        dialect = conn.dialect.name
+        if dialect == "mysql":
+            conn.execute(text(f"ALTER TABLE {table_name} MODIFY {column_name} SMALLINT {nullable}"))
+        elif dialect == "postgresql":
+            conn.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                              f"TYPE SMALLINT USING {column_name}::smallint"))
+        # SQLite columns are dynamically typed: the codes are already what is stored
+
+
+def register_commands(app):
+
+    @app.cli.command("backfill-rollups")
+    @click.option("--lecture-id", type=int, help="Only rebuild this lecture.")
+    @click.option("--all", "rebuild_all", is_flag=True, help="Rebuild lectures that already have rollups too.")
+    def backfill_rollups(lecture_id, rebuild_all):
+        """Rebuild emotion_rollups from emotion_logs (e.g. for old lectures)."""
+        if lecture_id:
+            lecture_ids = [lecture_id]
+        else:
+            # Live lectures are skipped: their rollup is being written right now
+            query = db.session.query(EmotionLog.lecture_id).distinct()\
+                .join(Lecture, Lecture.id == EmotionLog.lecture_id)\
+                .filter(Lecture.status != "live")
+            if not rebuild_all:
+                has_rollup = db.session.query(EmotionRollup.lecture_id).distinct()
+                query = query.filter(EmotionLog.lecture_id.not_in(has_rollup))
+            lecture_ids = [lid for (lid,) in query.all()]
+
+        archive_dir = app.config["EMOTION_LOG_ARCHIVE_DIR"]
+        rebuilt = 0
+        for lid in lecture_ids:
+            if is_archived(archive_dir, lid):
+                # Raw logs are gone; rebuilding would wipe the stored rollup
+                click.echo(f"Lecture {lid}: archived, skipped")
+                continue
+            with db.engine.begin() as conn:
+                rebuild_lecture_rollup(conn, lid)
+            rebuilt += 1
+            click.echo(f"Lecture {lid}: rollup rebuilt")
+
+        click.echo(f"✅ Backfilled {rebuilt} lecture(s).")
+
+    @app.cli.command("create-indexes")
+    def create_indexes():
+        """Create indexes declared on the models that are missing in the database."""
+        # db.create_all() only creates missing tables, so databases created
+        # before an index was added to a model need this once.
+        inspector = inspect(db.engine)
+        created = 0
+        for table in db.metadata.sorted_tables:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(db.engine)
+                click.echo(f"Created {index.name} on {table.name}")
+                created += 1
+
+        click.echo(f"✅ {created} index(es) created.")
+
+    @app.cli.command("archive-logs")
+    @click.option("--lecture-id", type=int, help="Only archive this lecture.")
+    @click.option("--older-than-days", type=int, default=None,
+                  help="Archive completed lectures that ended this many days ago (default: EMOTION_LOG_ARCHIVE_AFTER_DAYS).")
+    def archive_logs(lecture_id, older_than_days):
+        """Move emotion_logs of completed lectures into per-lecture archives."""
+        archive_dir = app.config["EMOTION_LOG_ARCHIVE_DIR"]
+        query = Lecture.query.filter(Lecture.status == "completed")
+
+        if lecture_id:
+            query = query.filter(Lecture.id == lecture_id)
+        else:
+            if older_than_days is None:
+                older_than_days = app.config["EMOTION_LOG_ARCHIVE_AFTER_DAYS"]
+            cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+            has_logs = db.session.query(EmotionLog.lecture_id).distinct()
+            query = query.filter(Lecture.actual_end <= cutoff, Lecture.id.in_(has_logs))
+
+        lecture_ids = [lecture.id for lecture in query.all()]
+        total = 0
+        for lid in lecture_ids:
+            moved = archive_lecture(lid, archive_dir)
+            total += moved
+            click.echo(f"Lecture {lid}: {moved} log row(s) archived")
+
+        click.echo(f"✅ Archived {total} row(s) from {len(lecture_ids)} lecture(s) into {archive_dir}.")
+
+    @app.cli.command("migrate-emotion-codes")
+    def migrate_emotion_codes():
+        """Convert emotion label columns (String) to small integer codes."""
+        inspector = inspect(db.engine)
+        for table_name, column_name, fallback in EMOTION_COLUMNS:
+            columns = {c["name"]: c["type"] for c in inspector.get_columns(table_name)}
+            if isinstance(columns[column_name], Integer):
+                click.echo(f"{table_name}.{column_name}: already SMALLINT, skipped")
+                continue
+            _convert_emotion_column(table_name, column_name, fallback)
+            click.echo(f"{table_name}.{column_name}: converted")
+
+        click.echo("✅ Emotion columns now store codes.")
+
+    @app.cli.command("migrate-rollup-coverage")
+    def migrate_rollup_coverage():
+        """Add emotion_rollups.covered_seconds to databases created before it existed."""
+        columns = {c["name"] for c in inspect(db.engine).get_columns("emotion_rollups")}
+        if "covered_seconds" in columns:
+            click.echo("emotion_rollups.covered_seconds already exists, nothing to do")
+            return
+
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE emotion_rollups ADD COLUMN covered_seconds FLOAT NOT NULL DEFAULT 0"))
+            # Until now every client captured a frame every 5 seconds, so that
+            # is exactly the time each existing log stood for
+            conn.execute(text("UPDATE emotion_rollups SET covered_seconds = log_count * 5"))
+
+        click.echo("✅ emotion_rollups.covered_seconds added and filled.")
+
+    @app.cli.command("lowercase-emails")
+    def lowercase_emails():
+        """Store user emails lowercased, as signup, login and the roster import look them up."""
+        from models.user import User
+        users = db.session.query(User.user_id, User.email)\
+            .filter(User.email != func.lower(User.email)).all()
+        taken = {email for (email,) in db.session.query(func.lower(User.email))
+                 .filter(User.email == func.lower(User.email))}
+        updated = 0
+        for user_id, email in users:
+            if email.lower() in taken:
+                # Two accounts that differ only in case: left for an admin to merge
+                click.echo(f"User {user_id} ({email}): {email.lower()} is taken, skipped")
+                continue
+            taken.add(email.lower())
+            db.session.execute(User.__table__.update().where(User.user_id == user_id)
+                               .values(email=email.lower()))
+            updated += 1
+        db.session.commit()
+        click.echo(f"✅ {updated} emails lowercased.")
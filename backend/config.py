@@ -1,12 +1,209 @@
 import os
 
-DB_USER = "root"
-DB_PASSWORD = "vk124424861014"
-DB_HOST = "localhost"
-DB_NAME = "smart_classroom_db"
+DB_USER = os.environ.get("DB_USER", "root")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "vk124424861014")
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_NAME = os.environ.get("DB_NAME", "smart_classroom_db")
 
-SQLALCHEMY_DATABASE_URI = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# MySQL driver: "pymysql" (pure Python), "mysqlclient" (C, pip install
+# mysqlclient) or "auto" (mysqlclient when installed, else pymysql)
+DB_DRIVER = os.environ.get("DB_DRIVER", "pymysql")
+if DB_DRIVER == "auto":
+    import importlib.util
+    DB_DRIVER = "mysqlclient" if importlib.util.find_spec("MySQLdb") else "pymysql"
+_DIALECT = "mysql+mysqldb" if DB_DRIVER == "mysqlclient" else "mysql+pymysql"
+
+# DATABASE_URL overrides everything above, e.g. for local benchmarks:
+#   sqlite://                 -> in-memory, one connection shared by all threads
+#   sqlite:////tmp/bench.db   -> file
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    "DATABASE_URL", f"{_DIALECT}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 )
 
+# --- Connection pool (per process) ---
+# Every web worker process has its own pool of DB_POOL_SIZE connections plus
+# up to DB_MAX_OVERFLOW extra ones under bursts. When DB_MAX_CONNECTIONS is
+# set, both are capped so WEB_CONCURRENCY workers together stay below it
+# (leave room for the CLI and the MySQL max_connections of other clients).
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", 0))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+# Reconnect before MySQL's wait_timeout drops idle connections
+# ("MySQL server has gone away"), and test each connection on checkout
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# --- Emotion inference engine ---
+# Worker processes that keep the emotion model loaded (0 = single in-process thread)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 2))
+# Micro-batching: up to N frames, or whatever arrives within a few ms
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 8))
+INFERENCE_BATCH_WAIT_MS = int(os.environ.get("INFERENCE_BATCH_WAIT_MS", 10))
+# Frames waiting for a worker before log_emotion starts answering 503
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 256))
+# "wait": block up to the deadline for the result, then fall back to 202
+# "async": always answer 202 and persist the result in the background
+INFERENCE_RESPONSE_MODE = os.environ.get("INFERENCE_RESPONSE_MODE", "wait")
+INFERENCE_DEADLINE_SECONDS = float(os.environ.get("INFERENCE_DEADLINE_SECONDS", 3))
+# How worker processes are started: "spawn" (portable) or "forkserver"
+# (Linux/macOS; workers share the already-imported libraries)
+INFERENCE_START_METHOD = os.environ.get("INFERENCE_START_METHOD", "spawn")
+
+# Load + warm up the emotion model inside create_app(). Processes that only
+# serve auth/group routes can set PRELOAD_MODELS=0 to skip it entirely.
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "1") == "1"
+# Start the inference workers inside create_app(). gunicorn.conf.py turns it
+# off and starts them in each forked web worker instead.
+INFERENCE_AUTOSTART = os.environ.get("INFERENCE_AUTOSTART", "1") == "1"
+
+# --- Inference backend (services/emotion_backends.py) ---
+# "deepface" (TensorFlow, the original models), "opencv" (ONNX models on
+# OpenCV DNN / ONNX Runtime, no TensorFlow) or "stub" (no model, load tests)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "deepface")
+# Model files of the opencv backend (OpenCV / ONNX model zoo downloads)
+INFERENCE_MODEL_DIR = os.environ.get("INFERENCE_MODEL_DIR",
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_files"))
+INFERENCE_FACE_DETECTOR_MODEL = os.environ.get(
+    "INFERENCE_FACE_DETECTOR_MODEL", os.path.join(INFERENCE_MODEL_DIR, "face_detection_yunet_2023mar.onnx"))
+INFERENCE_EMOTION_MODEL = os.environ.get(
+    "INFERENCE_EMOTION_MODEL", os.path.join(INFERENCE_MODEL_DIR, "emotion-ferplus-12-int8.onnx"))
+# SFace, only needed for face enrollment and room-camera lectures
+INFERENCE_FACE_RECOGNIZER_MODEL = os.environ.get(
+    "INFERENCE_FACE_RECOGNIZER_MODEL", os.path.join(INFERENCE_MODEL_DIR, "face_recognition_sface_2021dec.onnx"))
+# Output classes of a custom emotion model, comma separated (default: FER+)
+INFERENCE_EMOTION_MODEL_LABELS = [
+    label.strip() for label in os.environ.get("INFERENCE_EMOTION_MODEL_LABELS", "").split(",") if label.strip()
+] or None
+# "auto" (ONNX Runtime when installed), "onnxruntime" or "opencv"
+INFERENCE_ONNX_RUNTIME = os.environ.get("INFERENCE_ONNX_RUNTIME", "auto")
+# YuNet confidence a face needs to count
+INFERENCE_FACE_SCORE_THRESHOLD = float(os.environ.get("INFERENCE_FACE_SCORE_THRESHOLD", 0.7))
+
+# Largest frame accepted by the binary log_emotion_frame endpoint
+MAX_FRAME_BYTES = int(os.environ.get("MAX_FRAME_BYTES", 2 * 1024 * 1024))
+
+# --- Room camera (one faculty-side camera for the whole classroom) ---
+# Face recognition model behind enrollment and matching (a DeepFace model
+# name, or "SFace" with INFERENCE_BACKEND=opencv). Unset: the backend's
+# default, Facenet for deepface and SFace for opencv; a model the backend
+# can't compute stops the app at startup. Enrolled faces of another model are
+# ignored, so students re-enroll after a change
+FACE_EMBEDDING_MODEL = os.environ.get("FACE_EMBEDDING_MODEL", "")
+# Cosine similarity a face needs to be taken for an enrolled student
+FACE_MATCH_MIN_SIMILARITY = float(os.environ.get("FACE_MATCH_MIN_SIMILARITY", 0.6))
+# Room frames are bigger and carry dozens of faces
+ROOM_FRAME_MAX_BYTES = int(os.environ.get("ROOM_FRAME_MAX_BYTES", 8 * 1024 * 1024))
+ROOM_FRAME_DEADLINE_SECONDS = float(os.environ.get("ROOM_FRAME_DEADLINE_SECONDS", 10))
+# The first enrollment also loads the recognition model in the worker
+FACE_ENROLL_TIMEOUT_SECONDS = float(os.environ.get("FACE_ENROLL_TIMEOUT_SECONDS", 60))
+
+# --- Capture rate (answered to the student client as next_capture_ms) ---
+# Between MIN and MAX depending on inference queue load and emotion stability
+CAPTURE_INTERVAL_MIN_MS = int(os.environ.get("CAPTURE_INTERVAL_MIN_MS", 5000))
+CAPTURE_INTERVAL_MAX_MS = int(os.environ.get("CAPTURE_INTERVAL_MAX_MS", 15000))
+# A frame covers at most this much attendance time since the previous one
+CAPTURE_MAX_GAP_SECONDS = float(os.environ.get("CAPTURE_MAX_GAP_SECONDS", 25))
+
+# --- Frame skipping ---
+# Frames that barely differ from the student's last analyzed frame (mean
+# absolute difference of 32x32 grayscale thumbnails, 0-255 scale) reuse its
+# result instead of running inference, at most FRAME_SKIP_MAX_REUSE times in a row.
+FRAME_SKIP_ENABLED = os.environ.get("FRAME_SKIP_ENABLED", "1") == "1"
+FRAME_SKIP_THRESHOLD = float(os.environ.get("FRAME_SKIP_THRESHOLD", 4.0))
+FRAME_SKIP_MAX_REUSE = int(os.environ.get("FRAME_SKIP_MAX_REUSE", 6))
+
+# --- Face tracking ---
+# Search around the student's last face box first; every N-th frame (and
+# whenever the face is lost) the whole frame is searched again.
+FACE_TRACK_ENABLED = os.environ.get("FACE_TRACK_ENABLED", "1") == "1"
+FACE_TRACK_FULL_EVERY = int(os.environ.get("FACE_TRACK_FULL_EVERY", 12))
+
+# --- Live lecture lookup ---
+# How long "which lecture is live in this group" is cached for the student
+# group list. Starting/ending a lecture invalidates it immediately.
+LIVE_LECTURE_CACHE_SECONDS = float(os.environ.get("LIVE_LECTURE_CACHE_SECONDS", 5))
+
+# --- Access checks ---
+# Group owners and lecture group/status cached for the role + ownership
+# decorators (services/access.py); entries are checked against the group's
+# version counter on every use, this only bounds memory
+ACCESS_CACHE_SIZE = int(os.environ.get("ACCESS_CACHE_SIZE", 10000))
+
+# --- Bulk roster import (services/roster.py) ---
+# Rows accepted per upload, and rows handled per set of INSERTs + commit
+ROSTER_IMPORT_MAX_ROWS = int(os.environ.get("ROSTER_IMPORT_MAX_ROWS", 20000))
+ROSTER_IMPORT_CHUNK = int(os.environ.get("ROSTER_IMPORT_CHUNK", 1000))
+# Imported students claim their account at signup with the claim_token of
+# their report row (signed, valid this many days; importing again issues a
+# new one while the account is unclaimed)
+ROSTER_CLAIM_TOKEN_DAYS = int(os.environ.get("ROSTER_CLAIM_TOKEN_DAYS", 30))
+
+# --- Password hashing (services/passwords.py) ---
+# werkzeug method string; stored hashes with other parameters are upgraded
+# on the next successful login
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+# Threads hashing at the same time (each keeps one core busy) and how many
+# logins/signups may wait for them before answering 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 256))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", 10))
+
+# --- Write-behind EmotionLog ingestion ---
+# Rows are kept in memory and written with one multi-row INSERT every
+# EMOTION_LOG_FLUSH_ROWS rows or EMOTION_LOG_FLUSH_MS milliseconds.
+EMOTION_LOG_BUFFERING = os.environ.get("EMOTION_LOG_BUFFERING", "1") == "1"
+EMOTION_LOG_FLUSH_ROWS = int(os.environ.get("EMOTION_LOG_FLUSH_ROWS", 500))
+EMOTION_LOG_FLUSH_MS = int(os.environ.get("EMOTION_LOG_FLUSH_MS", 1000))
+# Upper bound on rows held while the database is unreachable
+EMOTION_LOG_BUFFER_MAX = int(os.environ.get("EMOTION_LOG_BUFFER_MAX", 50000))
+# Completed lectures older than this many days are moved out of emotion_logs
+# into per-lecture .npz archives by `flask archive-logs`
+EMOTION_LOG_ARCHIVE_DIR = os.environ.get("EMOTION_LOG_ARCHIVE_DIR",
+                                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+EMOTION_LOG_ARCHIVE_AFTER_DAYS = int(os.environ.get("EMOTION_LOG_ARCHIVE_AFTER_DAYS", 30))
+
+# --- Exports (services/export.py) ---
+# Rows fetched from the server-side cursor and written to the response at a
+# time (one Parquet row group each)
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 10000))
+
+# --- Live lecture state (served by live_status) ---
+# "memory" keeps it inside each process; use "redis" when running several workers
+# (the ETag / access-check version counters and the event relay between
+# workers live in the same backend). gunicorn.conf.py runs a single web
+# worker unless it is "redis".
+LIVE_STATE_BACKEND = os.environ.get("LIVE_STATE_BACKEND", "memory")
+LIVE_STATE_REDIS_URL = os.environ.get("LIVE_STATE_REDIS_URL", "redis://localhost:6379/0")
+# Students without a frame in this window show up as "Offline"
+LIVE_WINDOW_SECONDS = int(os.environ.get("LIVE_WINDOW_SECONDS", 30))
+
+# --- Live push streams (SSE) ---
+# Max one message per subscriber per interval; bursts are coalesced
+STREAM_MIN_INTERVAL_MS = int(os.environ.get("STREAM_MIN_INTERVAL_MS", 1000))
+# Idle streams get a keep-alive (and a refresh of who went Offline)
+STREAM_HEARTBEAT_SECONDS = int(os.environ.get("STREAM_HEARTBEAT_SECONDS", 15))
+# An open stream holds a web worker thread for its whole lifetime; past this
+# many per process, stream requests get 503 + Retry-After and the dashboards
+# poll instead. Default: half of the gunicorn threads, the rest stay free for
+# the API. 0 = no limit.
+STREAM_MAX_PER_PROCESS = int(os.environ.get("STREAM_MAX_PER_PROCESS",
+                                            max(1, int(os.environ.get("GUNICORN_THREADS", 8)) // 2)))
+STREAM_RETRY_AFTER_SECONDS = int(os.environ.get("STREAM_RETRY_AFTER_SECONDS", 30))
+
+# --- Metrics (services/metrics.py, GET /metrics) ---
+# Latency histograms per frame stage and per endpoint, SQL statement counts
+# and times, in Prometheus format. 0 installs no hooks (/metrics then only
+# reports the /api/health/stats counters)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# Sampling profiler (services/profiler.py): requests slower than this many ms
+# are written to PROFILE_DIR as collapsed stacks for flame graphs (0 = off)
+PROFILE_SLOW_REQUEST_MS = int(os.environ.get("PROFILE_SLOW_REQUEST_MS", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+# Stop writing after this many profiles (per process)
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
@@ -0,0 +1,76 @@
+from enum import IntEnum
+
+from sqlalchemy.types import SmallInteger, TypeDecorator
+
+# Canonical emotion vocabulary.
+# Every emotion stored in the database (emotion_logs, emotion_rollups,
+# lecture_attendance.dominant_mood, lectures.dominant_class_mood) is one of
+# these small integer codes; the API keeps returning the labels.
+
+
+class Emotion(IntEnum):
+    ABSENT = 0      # attendance: no frame during the lecture
+    FOCUSED = 1
+    CONFUSED = 2
+    BORED = 3
+    DISTRACTED = 4
+    HAPPY = 5
+    PENDING = 6     # lecture not finished yet
+
+    @property
+    def label(self):
+        return self.name.capitalize()
+
+
+# Size of a per-emotion count array indexed by code
+EMOTION_SLOTS = len(Emotion)
+
+# Moods shown on the live dashboard, in chart order
+CLASSROOM_MOODS = (Emotion.FOCUSED, Emotion.CONFUSED, Emotion.BORED, Emotion.DISTRACTED, Emotion.HAPPY)
+# Counted as engaged by the engagement score
+POSITIVE_MOODS = (Emotion.FOCUSED, Emotion.HAPPY)
+
+# Shown for enrolled students without a recent frame (never stored)
+OFFLINE_LABEL = "Offline"
+
+# Raw DeepFace label -> classroom emotion
+RAW_EMOTIONS = {
+    "happy": Emotion.FOCUSED,
+    "neutral": Emotion.FOCUSED,
+    "surprise": Emotion.FOCUSED,  # Surprise can be positive engagement
+    "sad": Emotion.CONFUSED,
+    "fear": Emotion.CONFUSED,
+    "angry": Emotion.DISTRACTED,
+    "disgust": Emotion.DISTRACTED,
+}
+
+LABELS = {e.label: e for e in Emotion}
+LABELS["Neutral"] = Emotion.FOCUSED  # older dashboards logged it separately
+
+
+def classify(raw_emotion):
+    # Map Raw DeepFace Emotion to Classroom Metrics
+    return RAW_EMOTIONS.get(raw_emotion, Emotion.BORED)
+
+
+def to_emotion(value):
+    # Accepts an Emotion, its code (int or digit string) or its label
+    if isinstance(value, Emotion):
+        return value
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return Emotion(int(value))
+    return LABELS[value]
+
+
+class EmotionType(TypeDecorator):
+    # SMALLINT column holding an Emotion code.
+    # Accepts Emotion / code / label when writing, returns the label when read.
+    # Aggregations that want the raw codes select type_coerce(column, SmallInteger).
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(to_emotion(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else to_emotion(value).label
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+
+# gunicorn settings for production:
+#   cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Two kinds of processes, sized separately:
+#   - WEB_CONCURRENCY web workers x GUNICORN_THREADS threads serve the
+#     IO-bound API (DB queries, SSE streams, waiting on inference results);
+#     at most STREAM_MAX_PER_PROCESS threads per worker go to SSE streams
+#   - INFERENCE_PROCESSES model-holding inference processes in total (CPU
+#     bound, default: one per core), split evenly between the web workers;
+#     each web worker gets at least one
+# The app is created once in the master (preload_app) and forked, so the
+# imported Python code is shared copy-on-write between web workers. Inference
+# processes come from a forkserver that imported the ML libraries once.
+
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+# On shutdown / reload a worker stops accepting, finishes its requests and
+# drains the inference queue within this many seconds (see worker_exit)
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# Access log lines (when enabled with --access-logfile) without the query
+# string: the SSE streams carry the JWT as ?jwt=
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+inference_processes = int(os.environ.get("INFERENCE_PROCESSES", cores))
+
+# The live view, the ETag / access-check versions and the dashboard events
+# are only shared between processes through Redis. With the in-memory
+# backend every worker would see its own lectures (live_status missing
+# students, a lecture ended on one worker still live on the other), so it
+# runs a single web worker.
+live_state_backend = os.environ.get("LIVE_STATE_BACKEND", "memory")
+if workers > 1 and live_state_backend != "redis":
+    print(f"LIVE_STATE_BACKEND={live_state_backend} is per process: starting 1 web worker instead of "
+          f"{workers} (set LIVE_STATE_BACKEND=redis to run several)")
+    workers = 1
+
+# Read by config.py when wsgi.py is preloaded below
+os.environ["WEB_CONCURRENCY"] = str(workers)  # per-worker DB pool sizing
+os.environ.setdefault("INFERENCE_WORKERS", str(max(1, -(-inference_processes // workers))))
+os.environ.setdefault("INFERENCE_START_METHOD", "forkserver")
+# Threads and child processes don't survive fork(): start them in post_fork
+os.environ["INFERENCE_AUTOSTART"] = "0"
+
+
+def on_starting(server):
+    # Several workers only work together through Redis: don't start them
+    # against a Redis that isn't there
+    if workers > 1:
+        import redis
+        url = os.environ.get("LIVE_STATE_REDIS_URL", "redis://localhost:6379/0")
+        try:
+            redis.Redis.from_url(url).ping()
+        except redis.RedisError as e:
+            raise RuntimeError(f"{workers} web workers need the shared live state, "
+                               f"but Redis at {url} is not reachable: {e}")
+
+
+def post_fork(server, worker):
+    from extensions import db
+    from services.inference_engine import inference_engine
+    from wsgi import app
+
+    # Don't share the master's pooled connections with the other workers
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    if app.config["PRELOAD_MODELS"]:
+        inference_engine.start()
+
+
+def worker_exit(server, worker):
+    from services.emotion_log_buffer import emotion_log_buffer
+    from services.inference_engine import inference_engine
+
+    # Frames still queued are analyzed and stored before the worker goes away
+    left = inference_engine.drain(graceful_timeout)
+    if left:
+        server.log.warning("Worker %s exiting with %d frames not analyzed", worker.pid, left)
+    inference_engine.shutdown()
+    emotion_log_buffer.flush()
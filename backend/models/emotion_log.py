@@ -1,4 +1,5 @@
 from extensions import db
+from emotions import EmotionType
 from datetime import datetime
 
 class EmotionLog(db.Model):
@@ -10,4 +11,9 @@ class EmotionLog(db.Model):
     
     # Live data point from the Python Face script
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    emotion = db.Column(db.String(50), nullable=False)
\ No newline at end of file
+    emotion = db.Column(EmotionType, nullable=False)  # Emotion code, see emotions.py
+
+    # Every hot query filters on (lecture_id, student_id) and orders/filters by timestamp
+    __table_args__ = (
+        db.Index('ix_emotion_logs_lecture_student_ts', 'lecture_id', 'student_id', 'timestamp'),
+    )
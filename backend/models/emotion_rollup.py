@@ -0,0 +1,22 @@
+from extensions import db
+from emotions import EmotionType
+
+class EmotionRollup(db.Model):
+    __tablename__ = "emotion_rollups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    lecture_id = db.Column(db.Integer, db.ForeignKey('lectures.id', ondelete="CASCADE"), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete="CASCADE"), nullable=False)
+    emotion = db.Column(EmotionType, nullable=False)
+
+    # Maintained incrementally every time buffered emotion logs are flushed
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    # Attendance time these logs cover (see services/capture_rate.py)
+    covered_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    first_seen = db.Column(db.DateTime)
+    last_seen = db.Column(db.DateTime)
+
+    # One row per (lecture, student, emotion)
+    __table_args__ = (
+        db.UniqueConstraint('lecture_id', 'student_id', 'emotion', name='uq_emotion_rollup'),
+    )
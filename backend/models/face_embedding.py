@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+class FaceEmbedding(db.Model):
+    __tablename__ = "face_embeddings"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # One enrolled face per student (enrolling again replaces it)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete="CASCADE"), nullable=False, unique=True)
+
+    # L2-normalized float32 vector, as raw bytes; only comparable with
+    # embeddings of the same model
+    model = db.Column(db.String(50), nullable=False)
+    dim = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -6,4 +6,10 @@ class GroupMember(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # ondelete="CASCADE" ensures that if a group is deleted, all student memberships for that group are automatically erased
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id', ondelete="CASCADE"), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete="CASCADE"), nullable=False)
\ No newline at end of file
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete="CASCADE"), nullable=False)
+
+    # Roster lookups go by group, "my groups" lookups go by student
+    __table_args__ = (
+        db.Index('ix_group_members_group_student', 'group_id', 'student_id'),
+        db.Index('ix_group_members_student', 'student_id'),
+    )
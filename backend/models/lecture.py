@@ -1,4 +1,5 @@
 from extensions import db
+from emotions import Emotion, EmotionType
 from datetime import datetime
 
 class Lecture(db.Model):
@@ -21,11 +22,14 @@ class Lecture(db.Model):
     
     # Final Averages
     avg_attendance_percentage = db.Column(db.Float, default=0.0)
-    dominant_class_mood = db.Column(db.String(50), default="Pending")
+    dominant_class_mood = db.Column(EmotionType, default=Emotion.PENDING)
     
     # Relationships to easily fetch related data
     attendances = db.relationship('LectureAttendance', backref='lecture', cascade='all, delete-orphan')
     emotion_logs = db.relationship('EmotionLog', backref='lecture', cascade='all, delete-orphan')
+    emotion_rollups = db.relationship('EmotionRollup', backref='lecture', cascade='all, delete-orphan')
 
-
-
+    # "Is there a live lecture for this group?" is asked on every dashboard load
+    __table_args__ = (
+        db.Index('ix_lectures_group_status', 'group_id', 'status'),
+    )
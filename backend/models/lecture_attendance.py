@@ -1,4 +1,5 @@
 from extensions import db
+from emotions import Emotion, EmotionType
 
 class LectureAttendance(db.Model):
     __tablename__ = "lecture_attendance"
@@ -11,4 +12,8 @@ class LectureAttendance(db.Model):
     # Final performance metrics for the dashboard
     total_minutes_detected = db.Column(db.Integer, default=0)
     attendance_percentage = db.Column(db.Float, default=0.0)
-    dominant_mood = db.Column(db.String(50), default="Absent")
\ No newline at end of file
+    dominant_mood = db.Column(EmotionType, default=Emotion.ABSENT)
+
+    __table_args__ = (
+        db.Index('ix_lecture_attendance_lecture_student', 'lecture_id', 'student_id'),
+    )
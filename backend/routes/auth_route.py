@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from extensions import db  
 from models.user import User
-from werkzeug.security import generate_password_hash # For password security
 from flask_jwt_extended import create_access_token # To generate token
-from werkzeug.security import check_password_hash
+from services.passwords import password_hasher, PasswordHasherBusy, UNUSABLE_PASSWORD # For password security
+from services.roster import claimed_user_id
+from sqlalchemy.exc import IntegrityError
+from concurrent.futures import TimeoutError as HashTimeout
 
 
 # Create the Blueprint
@@ -16,20 +18,20 @@ def signup():
 
     # 2. Extract fields (using .get avoids errors if a field is missing)
     name = data.get('name')
-    email = data.get('email')
+    # Emails are stored lowercased (as the roster import does)
+    email = (data.get('email') or '').strip().lower() or None
     password = data.get('password')
     role = data.get('role', 'student') # Default to student if not provided
     roll_no = data.get('roll_no')
     collage = data.get('collage') 
 
-    # 3. Validation: Check if email already exists
-    if User.query.filter_by(email=email).first():
-        return jsonify({"error": "Email already exists"}), 400
-
-    # 4. Hash the password (NEVER store plain text passwords!)
-    hashed_password = generate_password_hash(password)
+    # 3. Hash the password (NEVER store plain text passwords!)
+    try:
+        hashed_password = password_hasher.hash(password)
+    except (PasswordHasherBusy, HashTimeout):
+        return jsonify({"error": "Server busy, please try again"}), 503
 
-    # 5. Create new User instance
+    # 4. Create new User instance
     new_user = User(
         name=name,
         email=email,
@@ -40,10 +42,29 @@ def signup():
     )
 
     try:
-        # 6. Add to DB and Commit
+        # 5. Add to DB and Commit. The unique index on email catches
+        # duplicates (no separate lookup, no race between two signups)
         db.session.add(new_user)
         db.session.commit()
         return jsonify({"message": "User registered successfully!"}), 201
+    except IntegrityError:
+        db.session.rollback()
+        # 6. A student imported with a roster (no password yet) claims the
+        # account with the claim token from the import; the WHERE makes sure
+        # it only happens once. Without a valid token it's a taken email.
+        claim_user_id = claimed_user_id(data.get('claim_token'), email) if role == 'student' else None
+        if claim_user_id is not None:
+            details = {k: v for k, v in {"name": name, "roll_no": roll_no, "collage": collage}.items() if v}
+            claimed = db.session.execute(
+                User.__table__.update()
+                .where(User.user_id == claim_user_id, User.role == 'student',
+                       User.password == UNUSABLE_PASSWORD)
+                .values(password=hashed_password, **details)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return jsonify({"message": "User registered successfully!"}), 201
+        return jsonify({"error": "Email already exists"}), 400
     except Exception as e:
         db.session.rollback() # Undo changes if error occurs
         return jsonify({"error": str(e)}), 500
@@ -54,15 +75,21 @@ def signup():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
-    email = data.get('email')
+    typed_email = (data.get('email') or '').strip()
     password = data.get('password')
 
-    # 1. Find user by email
-    user = User.query.filter_by(email=email).first()
+    # 1. Find user by email (stored lowercased; older accounts keep the
+    # spelling they signed up with until `flask lowercase-emails` runs)
+    user = User.query.filter_by(email=typed_email.lower()).first()
+    if user is None and typed_email != typed_email.lower():
+        user = User.query.filter_by(email=typed_email).first()
 
-    # 2. Check if user exists AND password is correct
-    if not user or not check_password_hash(user.password, password):
-        return jsonify({"error": "Invalid email or password"}), 401
+    # 2. Check if user exists AND password is correct (on the hashing pool)
+    try:
+        if not user or not password_hasher.verify(user, password):
+            return jsonify({"error": "Invalid email or password"}), 401
+    except (PasswordHasherBusy, HashTimeout):
+        return jsonify({"error": "Server busy, please try again"}), 503
 
     # 3. Create a JWT Token
     # You can store the user_id and role inside the token
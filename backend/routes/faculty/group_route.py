@@ -1,20 +1,21 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+import json
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
+from flask_jwt_extended import get_jwt_identity
 from extensions import db
 from models.group import Group
 from models.group_member import GroupMember
 from models.user import User
+from services.resource_versions import resource_versions, conditional_get
+from services.access import role_required, owns_group
+from services.face_index import face_index
+from services import roster, export
 
 # Blueprint specifically for faculty group operations
 faculty_group_bp = Blueprint('faculty_group', __name__)
 
 @faculty_group_bp.route('/create', methods=['POST'])
-@jwt_required()
+@role_required("faculty", "Unauthorized. Only faculty can create groups.")
 def create_group():
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized. Only faculty can create groups."}), 403
-
     data = request.get_json()
     name = data.get('name')
     faculty_id = get_jwt_identity() 
@@ -27,16 +28,14 @@ def create_group():
 
     db.session.add(new_group)
     db.session.commit()
+    resource_versions.bump(f"faculty:{faculty_id}")
 
     return jsonify({"message": "Group created successfully!", "join_code": new_group.join_code}), 201
 
 @faculty_group_bp.route('/', methods=['GET']) # URL will just be /api/faculty/groups/
-@jwt_required()
+@role_required("faculty", "Unauthorized.")
+@conditional_get("faculty:{identity}")
 def get_faculty_groups():
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized."}), 403
-
     faculty_id = get_jwt_identity()
     groups = Group.query.filter_by(faculty_id=faculty_id).all()
 
@@ -44,56 +43,83 @@ def get_faculty_groups():
     return jsonify({"groups": group_list}), 200
 
 @faculty_group_bp.route('/<int:group_id>', methods=['DELETE'])
-@jwt_required()
+@role_required("faculty", "Unauthorized.")
+@owns_group
 def delete_group(group_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized."}), 403
-    
     faculty_id = get_jwt_identity()
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-
+    group = db.session.get(Group, group_id)
     if not group:
         return jsonify({"error": "Group not found or access denied."}), 404
 
+    # Its members' group lists change too; collect them before the cascade
+    scopes = resource_versions.group_scopes(group_id)
     db.session.delete(group)
     db.session.commit()
+    resource_versions.bump(f"faculty:{faculty_id}", *scopes)
     return jsonify({"message": "Group deleted successfully!"}), 200
 
 @faculty_group_bp.route('/<int:group_id>/students', methods=['GET'])
-@jwt_required()
+@role_required("faculty", "Unauthorized.")
+@owns_group
 def get_group_students(group_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized."}), 403
-
-    faculty_id = get_jwt_identity()
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-    if not group:
-        return jsonify({"error": "Group not found or access denied."}), 404
-
+    group_name = db.session.query(Group.name).filter(Group.id == group_id).scalar()
     students = db.session.query(User).join(GroupMember, User.user_id == GroupMember.student_id)\
         .filter(GroupMember.group_id == group_id).all()
 
     student_list = [{"user_id": s.user_id, "name": s.name, "email": s.email, "roll_no": s.roll_no} for s in students]
-    return jsonify({"group_name": group.name, "total_students": len(student_list), "students": student_list}), 200
+    return jsonify({"group_name": group_name, "total_students": len(student_list), "students": student_list}), 200
 
 @faculty_group_bp.route('/<int:group_id>/remove_student/<int:student_id>', methods=['DELETE'])
-@jwt_required()
+@role_required("faculty", "Unauthorized.")
+@owns_group
 def remove_student(group_id, student_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized."}), 403
-
-    faculty_id = get_jwt_identity()
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-    if not group:
-        return jsonify({"error": "Group not found or access denied."}), 404
-
     membership = GroupMember.query.filter_by(group_id=group_id, student_id=student_id).first()
     if membership:
         db.session.delete(membership)
         db.session.commit()
+        resource_versions.bump(f"student:{student_id}")
+        face_index.invalidate_groups([group_id])
         return jsonify({"message": "Student removed from group."}), 200
     
-    return jsonify({"error": "Student not found in this group."}), 404
\ No newline at end of file
+    return jsonify({"error": "Student not found in this group."}), 404
+
+@faculty_group_bp.route('/<int:group_id>/roster', methods=['POST'])
+@role_required("faculty", "Unauthorized.")
+@owns_group
+def import_roster(group_id):
+    # Creates missing students and enrolls everyone in the group.
+    # Body: CSV (multipart "file" or text/csv; columns name, email, roll_no,
+    # collage) or JSON [{"name": ..., "email": ...}, ...].
+    # Answers with one JSON line per roster row as the import goes, then a summary.
+    try:
+        rows = roster.parse_request(request)
+    except roster.RosterError as e:
+        return jsonify({"error": str(e)}), 400
+
+    max_rows = current_app.config.get("ROSTER_IMPORT_MAX_ROWS", 20000)
+    if len(rows) > max_rows:
+        return jsonify({"error": f"Roster too large (max {max_rows} rows)."}), 413
+
+    report = roster.import_roster(group_id, rows, current_app.config.get("ROSTER_IMPORT_CHUNK", 1000))
+    lines = (json.dumps(result) + "\n" for result in report)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+@faculty_group_bp.route('/<int:group_id>/export', methods=['GET'])
+@role_required("faculty", "Unauthorized.")
+@owns_group
+def export_group_data(group_id):
+    # Streams the data of all the group's lectures as CSV or Parquet; from / to
+    # also pick the lectures (e.g. a semester):
+    # ?data=timeline|attendance &format=csv|parquet &student_id= &from= &to= &emotion=
+    try:
+        what, fmt = export.parse_format(request.args)
+        filters = export.parse_filters(request.args)
+    except export.ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    if fmt == "parquet" and not export.parquet_available():
+        return jsonify({"error": "Parquet export is not available on this server (needs pyarrow)."}), 501
+
+    lecture_ids = export.group_lecture_ids(group_id, filters)
+    return export.export_response(what, fmt, lecture_ids, filters,
+                                  f"group_{group_id}_{what}", current_app.config)
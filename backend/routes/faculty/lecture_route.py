@@ -1,25 +1,38 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask import Blueprint, request, jsonify, Response, g, current_app
+from flask_jwt_extended import get_jwt_identity
 from extensions import db
+from emotions import Emotion, EMOTION_SLOTS, CLASSROOM_MOODS, POSITIVE_MOODS, OFFLINE_LABEL, classify
 from models.lecture import Lecture
-from models.group import Group
 from datetime import datetime , timedelta
 from models.lecture_attendance import LectureAttendance
 from models.emotion_log import EmotionLog
 from models.group_member import GroupMember
 from models.user import User
+from services.emotion_log_buffer import emotion_log_buffer
+from services.live_state import live_state
+from services.frame_filter import frame_filter
+from services.face_tracker import face_tracker
+from services.event_bus import event_bus, sse_message, stream_busy, StreamLimitReached, STREAM_TOKEN_LOCATIONS
+from services.live_lectures import live_lectures
+from services.resource_versions import resource_versions, conditional_get
+from services.access import access_cache, role_required, owns_group, owns_lecture
+from services.lecture_stats import finalize_lecture_statistics, lecture_duration_minutes
+from services.inference_engine import inference_engine, InferenceQueueFull
+from services.capture_rate import capture_rate
+from services.face_index import face_index
+from services.metrics import metrics
+from concurrent.futures import TimeoutError as InferenceTimeout
+import numpy as np
+import time
+from services import export, uploads
 
 
 # Create a new Blueprint for faculty lectures
 faculty_lecture_bp = Blueprint('faculty_lecture', __name__)
 
 @faculty_lecture_bp.route('/create', methods=['POST'])
-@jwt_required()
+@role_required("faculty", "Unauthorized. Only faculty can schedule lectures.")
 def schedule_lecture():
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized. Only faculty can schedule lectures."}), 403
-
     data = request.get_json()
     group_id = data.get('group_id')
     topic = data.get('topic')
@@ -29,9 +42,9 @@ def schedule_lecture():
     faculty_id = get_jwt_identity()
 
     # Verify the group belongs to this faculty member
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-    if not group:
+    if not access_cache.owns_group(faculty_id, group_id):
         return jsonify({"error": "Group not found or you do not have permission."}), 404
+    group_id = int(group_id)
 
     try:
         # Convert string dates from frontend into Python DateTime objects
@@ -39,7 +52,7 @@ def schedule_lecture():
         end_time = datetime.strptime(scheduled_end_str, "%Y-%m-%d %H:%M:%S")
 
         new_lecture = Lecture(
-            group_id=group.id,
+            group_id=group_id,
             topic=topic,
             scheduled_start=start_time,
             scheduled_end=end_time,
@@ -48,6 +61,7 @@ def schedule_lecture():
 
         db.session.add(new_lecture)
         db.session.commit()
+        resource_versions.bump(f"group:{group_id}")
 
         return jsonify({"message": "Lecture scheduled successfully!", "lecture_id": new_lecture.id}), 201
 
@@ -62,102 +76,65 @@ def schedule_lecture():
 # ... (Keep your existing schedule_lecture route here) ...
 
 @faculty_lecture_bp.route('/<int:lecture_id>/start', methods=['POST'])
-@jwt_required()
+@role_required("faculty")
+@owns_lecture
 def start_lecture(lecture_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized"}), 403
-
-    faculty_id = get_jwt_identity()
     lecture = Lecture.query.get(lecture_id)
 
-    if not lecture:
-        return jsonify({"error": "Lecture not found"}), 404
-
-    # Verify faculty owns this group
-    group = Group.query.filter_by(id=lecture.group_id, faculty_id=faculty_id).first()
-    if not group:
-        return jsonify({"error": "Access denied"}), 403
-
     lecture.status = "live"
     lecture.actual_start = datetime.utcnow()
     db.session.commit()
+    live_lectures.invalidate(lecture.group_id)
+    resource_versions.bump(*resource_versions.group_scopes(lecture.group_id))
+    # Enrolled faces of the group, for room-camera frames
+    face_index.build(lecture.id, lecture.group_id)
+
+    # Tell open student dashboards right away (no polling needed)
+    event_bus.publish(f"group:{lecture.group_id}", "lecture_live",
+                      {"group_id": lecture.group_id, "lecture_id": lecture.id, "topic": lecture.topic},
+                      key=lecture.group_id)
 
     return jsonify({"message": "Lecture is now LIVE! Camera tracking can begin."}), 200
 
 
 @faculty_lecture_bp.route('/<int:lecture_id>/end', methods=['POST'])
-@jwt_required()
+@role_required("faculty")
+@owns_lecture
 def end_lecture(lecture_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized"}), 403
-
     lecture = Lecture.query.get(lecture_id)
     if not lecture or lecture.status != "live":
         return jsonify({"error": "Lecture is not currently live."}), 400
 
-    # 1. Stop the clock
+    # 1. Stop the clock. Committed first: from here on every emotion log
+    # write (in any process) drops frames stamped after actual_end and
+    # refinalizes the lecture for the ones it still writes
     lecture.status = "completed"
     lecture.actual_end = datetime.utcnow()
-    
-    # Calculate duration in minutes (minimum 1 minute)
-    duration_seconds = (lecture.actual_end - lecture.actual_start).total_seconds()
-    total_duration_minutes = max(1, int(duration_seconds / 60))
-
-    enrolled_members = GroupMember.query.filter_by(group_id=lecture.group_id).all()
-    total_students_count = len(enrolled_members)
-
-    class_total_percentage = 0
-    class_mood_counts = {}
-
-    # --- CONFIGURATION: How often does the student frontend send a photo? ---
-    CAPTURE_INTERVAL_SECONDS = 5  # Must match your frontend setInterval (10000ms)
-    # -----------------------------------------------------------------------
-
-    for member in enrolled_members:
-        logs = EmotionLog.query.filter_by(lecture_id=lecture.id, student_id=member.student_id).all()
-        
-        # ✅ FIXED MATH: Convert raw log count to actual minutes
-        # Example: 6 logs * 10 seconds = 60 seconds = 1 minute
-        minutes_detected = (len(logs) * CAPTURE_INTERVAL_SECONDS) / 60
-        
-        # Round to 2 decimal places for cleaner database storage
-        minutes_detected = round(minutes_detected, 2)
-
-        # Calculate percentage
-        attendance_pct = min(100.0, (minutes_detected / total_duration_minutes) * 100)
-        
-        # Dominant Mood Logic
-        student_moods = [log.emotion for log in logs]
-        if student_moods:
-            dominant_mood = max(set(student_moods), key=student_moods.count) 
-        else:
-            dominant_mood = "Absent"
-
-        attendance_record = LectureAttendance(
-            lecture_id=lecture.id,
-            student_id=member.student_id,
-            total_minutes_detected=minutes_detected, # Now stores accurate minutes!
-            attendance_percentage=attendance_pct,
-            dominant_mood=dominant_mood
-        )
-        db.session.add(attendance_record)
+    db.session.commit()
 
-        class_total_percentage += attendance_pct
-        if dominant_mood != "Absent":
-            class_mood_counts[dominant_mood] = class_mood_counts.get(dominant_mood, 0) + 1
+    # Write out this process's buffered emotion logs so the statistics below are exact
+    emotion_log_buffer.flush(finalizing=lecture.id)
 
-    if total_students_count > 0:
-        lecture.avg_attendance_percentage = class_total_percentage / total_students_count
-    
-    if class_mood_counts:
-        lecture.dominant_class_mood = max(class_mood_counts, key=class_mood_counts.get)
-    else:
-        lecture.dominant_class_mood = "Absent"
+    total_duration_minutes = lecture_duration_minutes(lecture)
+
+    # 2. Attendance + dominant mood per student, from the per-student rollup
+    finalize_lecture_statistics(lecture, total_duration_minutes)
 
     db.session.commit()
 
+    # The live view is no longer needed once the lecture is closed
+    live_state.clear(lecture.id)
+    frame_filter.clear(lecture.id)
+    face_tracker.clear(lecture.id)
+    face_index.clear(lecture.id)
+    live_lectures.invalidate(lecture.group_id)
+    resource_versions.bump(*resource_versions.group_scopes(lecture.group_id))
+
+    event_bus.publish(f"lecture:{lecture.id}", "ended")
+    event_bus.publish(f"group:{lecture.group_id}", "lecture_ended",
+                      {"group_id": lecture.group_id, "lecture_id": lecture.id},
+                      key=lecture.group_id)
+
     return jsonify({
         "message": "Lecture ended. Statistics updated.",
         "duration_minutes": total_duration_minutes,
@@ -166,12 +143,8 @@ def end_lecture(lecture_id):
 
 
 @faculty_lecture_bp.route('/start_instant', methods=['POST'])
-@jwt_required()
+@role_required("faculty")
 def start_instant_lecture():
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized"}), 403
-
     data = request.get_json()
     group_id = data.get('group_id')
     topic = data.get('topic')
@@ -182,15 +155,15 @@ def start_instant_lecture():
     faculty_id = get_jwt_identity()
 
     # Verify the group belongs to this faculty member
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-    if not group:
+    if not access_cache.owns_group(faculty_id, group_id):
         return jsonify({"error": "Group not found or access denied."}), 404
+    group_id = int(group_id)
 
     now = datetime.utcnow()
 
     # Create and start the lecture simultaneously
     new_lecture = Lecture(
-        group_id=group.id,
+        group_id=group_id,
         topic=topic,
         status="live", # <-- Automatically set to live!
         scheduled_start=now, 
@@ -200,6 +173,13 @@ def start_instant_lecture():
 
     db.session.add(new_lecture)
     db.session.commit()
+    live_lectures.invalidate(group_id)
+    resource_versions.bump(*resource_versions.group_scopes(group_id))
+    face_index.build(new_lecture.id, group_id)
+
+    event_bus.publish(f"group:{group_id}", "lecture_live",
+                      {"group_id": group_id, "lecture_id": new_lecture.id, "topic": topic},
+                      key=group_id)
 
     return jsonify({
         "message": "Lecture created and is now LIVE!", 
@@ -208,86 +188,125 @@ def start_instant_lecture():
 
 
 
-@faculty_lecture_bp.route('/<int:lecture_id>/live_status', methods=['GET'])
-@jwt_required()
-def get_live_status(lecture_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized"}), 403
+def get_lecture_roster(lecture):
+    # Everyone enrolled in the lecture's group (one query for the whole roster)
+    return db.session.query(User.user_id, User.name, User.roll_no)\
+        .join(GroupMember, User.user_id == GroupMember.student_id)\
+        .filter(GroupMember.group_id == lecture.group_id).all()
 
-    lecture = Lecture.query.get(lecture_id)
-    if not lecture or lecture.status != "live":
-        return jsonify({"error": "Lecture not live"}), 400
 
+def build_live_status(lecture, roster=None):
     # 1. Find everyone enrolled in this class
-    enrolled_members = GroupMember.query.filter_by(group_id=lecture.group_id).all()
-    
+    if roster is None:
+        roster = get_lecture_roster(lecture)
+
+    # 2. Latest emotion per student + running counts, straight from memory.
+    # Students without a frame in the last 30 seconds have already aged out.
+    latest, active_counts, active_ids = live_state.snapshot(lecture.id)
+
     live_students = []
-    # Initialize counts for the graph
-    mood_counts = {"Focused": 0, "Confused": 0, "Bored": 0, "Distracted": 0, "Happy": 0}
-    total_active = 0
-
-    # ✅ NEW: Define the "Active" Window (30 Seconds)
-    # Any log older than this is considered "stale" (student disconnected)
-    cutoff_time = datetime.utcnow() - timedelta(seconds=30)
-
-    # 2. Get the VERY LATEST emotion log for each student (WITHIN WINDOW)
-    for member in enrolled_members:
-        user = User.query.get(member.student_id)
-        
-        # ✅ UPDATED QUERY: Added .filter(EmotionLog.timestamp >= cutoff_time)
-        latest_log = EmotionLog.query.filter(
-            EmotionLog.lecture_id == lecture_id, 
-            EmotionLog.student_id == member.student_id,
-            EmotionLog.timestamp >= cutoff_time  # <--- THIS IS THE FIX
-        ).order_by(EmotionLog.timestamp.desc()).first()
-
-        current_emotion = "Offline" # Default state if no recent log found
-
-        if latest_log:
-            current_emotion = latest_log.emotion
-            total_active += 1 # Only count them as active if they have RECENT data
-            
-            # Update graph counts
-            if current_emotion in mood_counts:
-                mood_counts[current_emotion] += 1
-            elif current_emotion == "Neutral": # Map Neutral to Focused if needed, or ignore
-                 mood_counts["Focused"] += 1
+    # Counts for the graph, indexed by emotion code
+    counts = [0] * EMOTION_SLOTS
+    for code, count in active_counts.items():
+        counts[code] += count
+    total_active = len(active_ids)
+
+    for student_id, name, roll_no in roster:
+        current_emotion = OFFLINE_LABEL # Default state if no recent log found
+        if student_id in active_ids:
+            current_emotion = Emotion(latest[student_id][0]).label
 
         live_students.append({
-            "name": user.name,
-            "rollNo": user.roll_no,
+            "studentId": student_id,
+            "name": name,
+            "rollNo": roll_no,
             "emotion": current_emotion # Will be "Offline" if they left >30s ago
         })
 
     # Calculate overall engagement score (Focused + Happy count)
     engagement_score = 0
     if total_active > 0:
-        positive_moods = mood_counts.get("Focused", 0) + mood_counts.get("Happy", 0)
+        positive_moods = sum(counts[code] for code in POSITIVE_MOODS)
         engagement_score = int((positive_moods / total_active) * 100)
 
-    return jsonify({
+    return {
         "total_active": total_active,
         "engagement_score": engagement_score,
-        "mood_distribution": mood_counts,
+        "mood_distribution": {code.label: counts[code] for code in CLASSROOM_MOODS},
         "students": live_students
-    }), 200
+    }
 
 
-@faculty_lecture_bp.route('/group/<int:group_id>', methods=['GET'])
-@jwt_required()
-def get_scheduled_lectures(group_id):
-    claims = get_jwt()
-    if claims.get("role") != "faculty":
-        return jsonify({"error": "Unauthorized"}), 403
+@faculty_lecture_bp.route('/<int:lecture_id>/live_status', methods=['GET'])
+@role_required("faculty")
+@owns_lecture
+def get_live_status(lecture_id):
+    if g.lecture.status != "live":
+        return jsonify({"error": "Lecture not live"}), 400
 
-    faculty_id = get_jwt_identity()
-    
-    # Verify faculty owns this group
-    group = Group.query.filter_by(id=group_id, faculty_id=faculty_id).first()
-    if not group:
-        return jsonify({"error": "Group not found or access denied."}), 404
+    return jsonify(build_live_status(g.lecture)), 200
 
+
+@faculty_lecture_bp.route('/<int:lecture_id>/stream', methods=['GET'])
+@role_required("faculty", locations=STREAM_TOKEN_LOCATIONS)
+@owns_lecture
+def stream_live_status(lecture_id):
+    # Server-Sent Events version of live_status (EventSource can't set headers,
+    # so the token may also come as ?jwt=...).
+    #   "status" -> full payload once on connect
+    #   "delta"  -> mood distribution + only the students whose state changed
+    #   "ended"  -> lecture was closed, stream stops
+    lecture = g.lecture
+    if lecture.status != "live":
+        return jsonify({"error": "Lecture not live"}), 400
+
+    roster = get_lecture_roster(lecture)
+    initial = build_live_status(lecture, roster)
+    interval_ms = request.args.get('interval_ms', type=int)
+    try:
+        sub = event_bus.subscribe([f"lecture:{lecture_id}"],
+                                  min_interval=interval_ms / 1000.0 if interval_ms else None)
+    except StreamLimitReached:
+        return stream_busy()
+
+    def generate():
+        try:
+            yield sse_message("status", initial)
+            last_view = {s["studentId"]: s["emotion"] for s in initial["students"]}
+
+            while True:
+                events = sub.wait(event_bus.heartbeat)
+                if any(event == "ended" for event, _ in events):
+                    yield sse_message("ended", {"lecture_id": lecture_id})
+                    return
+
+                # Woken by a change (or the heartbeat, which also catches students
+                # going Offline): diff against what this subscriber last saw
+                status = build_live_status(lecture, roster)
+                changed = [s for s in status["students"] if last_view.get(s["studentId"]) != s["emotion"]]
+                for s in changed:
+                    last_view[s["studentId"]] = s["emotion"]
+
+                if changed or events:
+                    status["students"] = changed
+                    yield sse_message("delta", status)
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            sub.close()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # The generator's finally never runs if the client leaves before the first chunk
+    response.call_on_close(sub.close)
+    return response
+
+
+@faculty_lecture_bp.route('/group/<int:group_id>', methods=['GET'])
+@role_required("faculty")
+@owns_group
+@conditional_get("group:{group_id}")
+def get_scheduled_lectures(group_id):
     # Fetch only lectures that are scheduled but haven't started
     scheduled_lectures = Lecture.query.filter_by(group_id=group_id, status="scheduled").all()
     
@@ -300,13 +319,10 @@ def get_scheduled_lectures(group_id):
     return jsonify({"scheduled_lectures": lecture_list}), 200
 
 @faculty_lecture_bp.route('/group/<int:group_id>/current', methods=['GET'])
-@jwt_required()
+@role_required("faculty")
+@owns_group
+@conditional_get("group:{group_id}")
 def get_current_live_lecture(group_id):
-    # ... (Auth checks same as other routes) ...
-    claims = get_jwt()
-    if claims.get("role") != "faculty": return jsonify({"error": "Unauthorized"}), 403
-    faculty_id = get_jwt_identity()
-
     # Find if any lecture in this group is 'live'
     live_lecture = Lecture.query.filter_by(group_id=group_id, status='live').first()
     
@@ -319,3 +335,113 @@ def get_current_live_lecture(group_id):
         }), 200
     
     return jsonify({"active": False}), 200
+
+@faculty_lecture_bp.route('/<int:lecture_id>/export', methods=['GET'])
+@role_required("faculty")
+@owns_lecture
+def export_lecture_data(lecture_id):
+    # Streams the lecture's emotion timeline or attendance summary as CSV or Parquet:
+    # ?data=timeline|attendance &format=csv|parquet &student_id= &from= &to= &emotion=
+    try:
+        what, fmt = export.parse_format(request.args)
+        filters = export.parse_filters(request.args)
+    except export.ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    if fmt == "parquet" and not export.parquet_available():
+        return jsonify({"error": "Parquet export is not available on this server (needs pyarrow)."}), 501
+
+    return export.export_response(what, fmt, [lecture_id], filters,
+                                  f"lecture_{lecture_id}_{what}", current_app.config)
+
+
+def save_room_frame(lecture, result):
+    # Log every student recognised in an analyzed room-camera frame.
+    # Returns the per-face answer for the camera client.
+    metrics.observe_inference(result)
+    faces = result["faces"] if result else []
+    embeddings = np.stack([face["embedding"] for face in faces]) if faces else np.empty((0, 0))
+    matches = face_index.match(lecture.id, lecture.group_id, embeddings)
+
+    now = time.time()
+    timestamp = datetime.utcfromtimestamp(now)
+    entries, answer, changed = [], [], False
+    for face, (student_id, similarity) in zip(faces, matches):
+        item = {"box": face["box"], "student_id": student_id, "similarity": round(similarity, 3)}
+        if student_id is not None:
+            emotion = classify(face["emotion"])
+            previous = live_state.record(lecture.id, student_id, emotion, now)
+            previous_ts = previous[1] if previous else None
+            entries.append((lecture.id, student_id, emotion, timestamp, capture_rate.credit(previous_ts, now)))
+            changed = changed or previous is None or previous[0] != emotion \
+                or previous_ts < now - live_state.window_seconds
+            item["emotion"] = emotion.label
+        answer.append(item)
+
+    # All matched students in one go (one multi-row INSERT)
+    emotion_log_buffer.add_many(entries)
+    if changed:
+        event_bus.publish(f"lecture:{lecture.id}", "changed")
+    return {"faces": len(faces), "matched": len(entries), "students": answer}
+
+
+def _save_room_frame_when_done(app, lecture):
+    # Runs on the inference dispatcher thread once the worker answers
+    def callback(future):
+        try:
+            result = future.result()
+            with app.app_context():
+                # The lecture may have ended while the frame was queued
+                current = access_cache.lecture(lecture.id)
+                if current and current.status == "live":
+                    save_room_frame(lecture, result)
+        except Exception as e:
+            print(f"Error persisting queued room frame: {e}")
+    return callback
+
+
+@faculty_lecture_bp.route('/<int:lecture_id>/room_frame', methods=['POST'])
+@role_required("faculty")
+@owns_lecture
+def log_room_frame(lecture_id):
+    # One frame of a classroom camera: every face is detected in one pass,
+    # matched against the students' enrolled faces and logged for them.
+    #   Content-Type: image/jpeg          -> the frame itself
+    #   Content-Type: multipart/form-data -> "frame" file part
+    lecture = g.lecture
+    if lecture.status != "live":
+        return jsonify({"error": "Lecture is not currently live."}), 400
+
+    limit = current_app.config["ROOM_FRAME_MAX_BYTES"]
+    if request.content_length and request.content_length > limit:
+        return jsonify({"error": "Frame too large"}), 413
+
+    if request.mimetype == 'multipart/form-data':
+        frame_bytes = uploads.read_part(uploads.files(limit).get('frame'), limit)
+    else:
+        frame_bytes = uploads.read_body(limit)
+    if not frame_bytes:
+        return jsonify({"error": "No image data provided"}), 400
+
+    try:
+        future = inference_engine.submit(frame_bytes, {"room": face_index.model})
+    except InferenceQueueFull:
+        return jsonify({"error": "Server busy, frame dropped"}), 503
+
+    app = current_app._get_current_object()
+    if current_app.config["INFERENCE_RESPONSE_MODE"] == "async":
+        future.add_done_callback(_save_room_frame_when_done(app, lecture))
+        return jsonify({"status": "queued"}), 202
+
+    try:
+        result = future.result(timeout=current_app.config["ROOM_FRAME_DEADLINE_SECONDS"])
+    except InferenceTimeout:
+        inference_engine.record_timeout()
+        future.add_done_callback(_save_room_frame_when_done(app, lecture))
+        return jsonify({"status": "queued"}), 202
+    except Exception as e:
+        print(f"Error analyzing room frame: {e}")
+        return jsonify({"error": "Image processing failed"}), 500
+
+    if result is None:
+        return jsonify({"error": "Unreadable image"}), 400
+    return jsonify(dict(save_room_frame(lecture, result), status="success")), 201
@@ -0,0 +1,56 @@
+from flask import Blueprint, jsonify, current_app
+from extensions import db
+from services.inference_engine import inference_engine
+from services.frame_filter import frame_filter
+from services.face_tracker import face_tracker
+from services.emotion_log_buffer import emotion_log_buffer
+from services.live_lectures import live_lectures
+from services.resource_versions import resource_versions
+from services.db_pool import pool_stats
+from services.access import access_cache
+from services.passwords import password_hasher
+from services.face_index import face_index
+from services.profiler import profiler
+from services.event_bus import event_bus
+
+# Readiness / health checks for load balancers and deploy scripts
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/ready', methods=['GET'])
+def readiness():
+    # Processes started with PRELOAD_MODELS=False don't serve inference,
+    # so they are ready as soon as the app is up.
+    if not current_app.config.get("PRELOAD_MODELS"):
+        return jsonify({"ready": True, "models": "not_preloaded"}), 200
+
+    # Not ready while a worker is loading or being restarted; if the model
+    # can't be loaded, inference.load_error says why
+    if not inference_engine.is_ready():
+        return jsonify({"ready": False, "inference": inference_engine.stats()}), 503
+
+    return jsonify({"ready": True, "inference": inference_engine.stats()}), 200
+
+
+def service_stats():
+    # Queue / buffer counters of every service in this process
+    return {
+        "inference": inference_engine.stats(),
+        "frame_filter": frame_filter.stats(),
+        "face_tracker": face_tracker.stats(),
+        "emotion_log_buffer": emotion_log_buffer.stats(),
+        "live_lectures": live_lectures.stats(),
+        "conditional_get": resource_versions.stats(),
+        "access_cache": access_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "face_index": face_index.stats(),
+        "profiler": profiler.stats(),
+        "streams": event_bus.stats(),
+        "db_pool": pool_stats(db.engine)
+    }
+
+
+@health_bp.route('/stats', methods=['GET'])
+def stats():
+    # Queue / buffer counters for dashboards and load tests
+    return jsonify(service_stats()), 200
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from services.metrics import metrics
+from routes.health_route import service_stats
+
+# Prometheus scrape endpoint: latency histograms (services/metrics.py) plus
+# the /api/health/stats counters as gauges
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(service_stats()), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,77 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+from extensions import db
+from models.face_embedding import FaceEmbedding
+from models.group_member import GroupMember
+from services.inference_engine import inference_engine, InferenceQueueFull
+from services.face_index import face_index
+from services.access import role_required
+from services import uploads
+from concurrent.futures import TimeoutError as InferenceTimeout
+import base64
+
+# Blueprint for the student's enrolled face (used by room-camera lectures)
+student_face_bp = Blueprint('student_face', __name__)
+
+
+def _invalid_frame():
+    return jsonify({"status": "invalid_frame", "error": "Unreadable image"}), 400
+
+
+@student_face_bp.route('/enroll', methods=['POST'])
+@role_required("student")
+def enroll_face():
+    # A clear photo of the student's face, as
+    #   Content-Type: image/jpeg          -> the JPEG itself
+    #   Content-Type: multipart/form-data -> "frame" file part
+    #   JSON {"image": "data:image/jpeg;base64,..."}
+    # Enrolling again replaces the stored face.
+    student_id = int(get_jwt_identity())
+
+    limit = current_app.config["MAX_FRAME_BYTES"]
+    if request.content_length and request.content_length > limit:
+        return jsonify({"error": "Frame too large"}), 413
+
+    if request.mimetype == 'multipart/form-data':
+        frame_bytes = uploads.read_part(uploads.files(limit).get('frame'), limit)
+    elif request.is_json:
+        image_data = (request.get_json() or {}).get('image') or ''
+        try:
+            frame_bytes = base64.b64decode(image_data.split(',')[-1], validate=True)
+        except ValueError:  # binascii.Error
+            return _invalid_frame()
+    else:
+        frame_bytes = uploads.read_body(limit)
+    if not frame_bytes:
+        return jsonify({"error": "No image data provided"}), 400
+
+    # 1. Detect the face + compute its embedding on the inference workers
+    try:
+        future = inference_engine.submit(frame_bytes, {"embed": face_index.model})
+        result = future.result(timeout=current_app.config["FACE_ENROLL_TIMEOUT_SECONDS"])
+    except InferenceQueueFull:
+        return jsonify({"error": "Server busy, please try again"}), 503
+    except InferenceTimeout:
+        inference_engine.record_timeout()
+        return jsonify({"error": "Server busy, please try again"}), 503
+    except Exception as e:
+        print(f"Error enrolling face: {e}")
+        return jsonify({"error": "Image processing failed"}), 500
+
+    if result is None:
+        return _invalid_frame()
+    if result.get("box") is None or result.get("embedding") is None:
+        return jsonify({"error": "No face detected. Face the camera in good light and try again."}), 400
+
+    # 2. Store it (one face per student)
+    vector = result["embedding"]
+    FaceEmbedding.query.filter_by(student_id=student_id).delete()
+    db.session.add(FaceEmbedding(student_id=student_id, model=face_index.model,
+                                 dim=len(vector), vector=vector.astype("float32").tobytes()))
+    db.session.commit()
+
+    # 3. Live lectures of the student's groups pick the new face up
+    group_ids = [gid for (gid,) in db.session.query(GroupMember.group_id).filter_by(student_id=student_id)]
+    face_index.invalidate_groups(group_ids)
+
+    return jsonify({"message": "Face enrolled successfully!"}), 201
@@ -1,20 +1,20 @@
-from models.lecture import Lecture 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import get_jwt_identity
 from extensions import db
 from models.group import Group
 from models.group_member import GroupMember
+from services.event_bus import event_bus, sse_message, stream_busy, StreamLimitReached, STREAM_TOKEN_LOCATIONS
+from services.live_lectures import live_lectures
+from services.resource_versions import resource_versions, conditional_get
+from services.access import role_required
+from services.face_index import face_index
 
 # Blueprint specifically for student group operations
 student_group_bp = Blueprint('student_group', __name__)
 
 @student_group_bp.route('/join', methods=['POST'])
-@jwt_required()
+@role_required("student", "Unauthorized. Only students can join groups.")
 def join_group():
-    claims = get_jwt()
-    if claims.get("role") != "student":
-        return jsonify({"error": "Unauthorized. Only students can join groups."}), 403
-
     data = request.get_json()
     join_code = data.get('join_code')
     student_id = get_jwt_identity()
@@ -30,47 +30,75 @@ def join_group():
     new_member = GroupMember(group_id=group.id, student_id=student_id)
     db.session.add(new_member)
     db.session.commit()
+    resource_versions.bump(f"student:{student_id}")
+    face_index.invalidate_groups([group.id])
 
     return jsonify({"message": f"Successfully joined {group.name}!"}), 200
 
-# You need to import Lecture at the top of the file!
-
 @student_group_bp.route('/', methods=['GET']) 
-@jwt_required()
+@role_required("student", "Unauthorized.")
+@conditional_get("student:{identity}")
 def get_student_groups():
-    claims = get_jwt()
-    if claims.get("role") != "student":
-        return jsonify({"error": "Unauthorized."}), 403
-
     student_id = get_jwt_identity()
     
     # 1. Get all groups the student is in
     enrolled_groups = db.session.query(Group).join(GroupMember).filter(GroupMember.student_id == student_id).all()
     
+    # 2. Live lecture of every group at once (cached, misses in one IN query)
+    live = live_lectures.get_many([g.id for g in enrolled_groups])
+
     group_list = []
     for g in enrolled_groups:
-        # 2. Check if there is a LIVE lecture for this group right now!
-        live_lecture = Lecture.query.filter_by(group_id=g.id, status="live").first()
-        
         group_data = {
             "id": g.id, 
             "name": g.name, 
             "faculty_id": g.faculty_id,
             "join_code": g.join_code,
             # 3. Send the Live Lecture ID (or None if no class is running)
-            "live_lecture_id": live_lecture.id if live_lecture else None
+            "live_lecture_id": live[g.id]
         }
         group_list.append(group_data)
 
     return jsonify({"enrolled_groups": group_list}), 200
 
+@student_group_bp.route('/stream', methods=['GET'])
+@role_required("student", "Unauthorized.", locations=STREAM_TOKEN_LOCATIONS)
+def stream_group_events():
+    # Server-Sent Events: "lecture_live" / "lecture_ended" for the student's groups,
+    # so the dashboard doesn't have to poll the group list to find live lectures.
+    # (EventSource can't set headers, so the token may also come as ?jwt=...)
+    student_id = get_jwt_identity()
+    group_ids = [gid for (gid,) in db.session.query(GroupMember.group_id)
+                 .filter(GroupMember.student_id == student_id).all()]
+
+    interval_ms = request.args.get('interval_ms', type=int)
+    try:
+        sub = event_bus.subscribe([f"group:{gid}" for gid in group_ids],
+                                  min_interval=interval_ms / 1000.0 if interval_ms else None)
+    except StreamLimitReached:
+        return stream_busy()
+
+    def generate():
+        try:
+            yield sse_message("subscribed", {"group_ids": group_ids})
+            while True:
+                events = sub.wait(event_bus.heartbeat)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event, data in events:
+                    yield sse_message(event, data)
+        finally:
+            sub.close()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # The generator's finally never runs if the client leaves before the first chunk
+    response.call_on_close(sub.close)
+    return response
+
 @student_group_bp.route('/<int:group_id>/leave', methods=['DELETE'])
-@jwt_required()
+@role_required("student", "Unauthorized.")
 def leave_group(group_id):
-    claims = get_jwt()
-    if claims.get("role") != "student":
-        return jsonify({"error": "Unauthorized."}), 403
-
     student_id = get_jwt_identity()
     membership = GroupMember.query.filter_by(group_id=group_id, student_id=student_id).first()
 
@@ -79,6 +107,8 @@ def leave_group(group_id):
 
     db.session.delete(membership)
     db.session.commit()
+    resource_versions.bump(f"student:{student_id}")
+    face_index.invalidate_groups([group_id])
     return jsonify({"message": "Successfully left the group."}), 200
 
 
@@ -1,85 +1,218 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import get_jwt_identity
 from extensions import db
-from models.lecture import Lecture
-from models.emotion_log import EmotionLog
-import cv2
-import numpy as np
+from emotions import classify
+from services.emotion_log_buffer import emotion_log_buffer
+from services.live_state import live_state
+from services.event_bus import event_bus
+from services.inference_engine import inference_engine, InferenceQueueFull
+from services.frame_filter import frame_filter
+from services.face_tracker import face_tracker
+from services.capture_rate import capture_rate
+from services.access import access_cache, role_required
+from services.metrics import metrics
+from services import uploads
+from concurrent.futures import TimeoutError as InferenceTimeout
+from werkzeug.exceptions import RequestEntityTooLarge
+from datetime import datetime
+from flask import current_app
 import base64
-from deepface import DeepFace
+import functools
+import time
 
 student_lecture_bp = Blueprint('student_lecture', __name__)
 
+
+def save_emotion_log(lecture_id, student_id, raw_emotion):
+    # Returns (classroom emotion label, next_capture_ms for the client)
+    detected_emotion = classify(raw_emotion)
+
+    # O(1) update of the in-memory live view used by live_status
+    now = time.time()
+    previous = live_state.record(lecture_id, student_id, detected_emotion, now)
+    previous_ts = previous[1] if previous else None
+
+    # Buffered: written in bulk by the flusher thread (see emotion_log_buffer).
+    # The frame is credited with the time since the student's previous frame.
+    emotion_log_buffer.add(lecture_id, student_id, detected_emotion,
+                           datetime.utcfromtimestamp(now), capture_rate.credit(previous_ts, now))
+
+    # Wake the faculty dashboard streams only when what they show changes
+    if previous is None or previous[0] != detected_emotion or previous_ts < now - live_state.window_seconds:
+        event_bus.publish(f"lecture:{lecture_id}", "changed")
+
+    print(f"Student {student_id} -> {detected_emotion.label}") # Debug log
+    stable = previous is not None and previous[0] == detected_emotion
+    return detected_emotion.label, capture_rate.next_interval_ms(stable)
+
+
+def _track_result(lecture_id, student_id, signature, kind, hinted, result):
+    # Feed one inference result back into the per-student caches.
+    # Returns the raw emotion label (None for an unreadable frame).
+    metrics.observe_inference(result)
+    face_tracker.update(lecture_id, student_id, result, hinted)
+    raw_emotion = result["emotion"] if result else None
+    frame_filter.remember(lecture_id, student_id, signature, raw_emotion, kind)
+    return raw_emotion
+
+
+def _persist_when_done(app, lecture_id, student_id, track):
+    # Runs on the inference dispatcher thread once the worker answers
+    def callback(future):
+        try:
+            raw_emotion = track(future.result())
+            if raw_emotion is None:
+                return
+            with app.app_context():
+                # The lecture may have ended while the frame was queued
+                lecture = access_cache.lecture(lecture_id)
+                if lecture and lecture.status == "live":
+                    save_emotion_log(lecture_id, student_id, raw_emotion)
+        except Exception as e:
+            print(f"Error persisting queued frame: {e}")
+    return callback
+
+
+def _invalid_frame():
+    return jsonify({"status": "invalid_frame", "error": "Unreadable image",
+                    "next_capture_ms": capture_rate.next_interval_ms()}), 400
+
+
+def analyze_frame(lecture_id, student_id, frame_bytes, options=None):
+    # Shared by the JSON (base64) and the binary upload endpoints.
+    # Every answer tells the client when to send its next frame (next_capture_ms).
+    kind = "face" if options and options.get("face_crop") else "frame"
+
+    # 1. Nothing changed since the last analyzed frame -> reuse its result.
+    # The frame is still logged, so attendance keeps counting.
+    with metrics.stage("frame_filter"):
+        signature = frame_filter.signature(frame_bytes)
+        unchanged, raw_emotion = frame_filter.lookup(lecture_id, student_id, signature, kind)
+    if unchanged:
+        if raw_emotion is None:
+            return _invalid_frame()
+        with metrics.stage("save_emotion_log"):
+            detected_emotion, next_capture_ms = save_emotion_log(lecture_id, student_id, raw_emotion)
+        return jsonify({"status": "success", "emotion": detected_emotion,
+                        "next_capture_ms": next_capture_ms}), 201
+
+    # 2. Full frames: search around the student's last face box first
+    roi = face_tracker.hint(lecture_id, student_id) if kind == "frame" else None
+    if roi:
+        options = dict(options or {}, roi=roi)
+    track = functools.partial(_track_result, lecture_id, student_id, signature, kind, roi is not None)
+
+    # 3. Hand the frame to the inference engine
+    try:
+        future = inference_engine.submit(frame_bytes, options)
+    except InferenceQueueFull:
+        return jsonify({"error": "Server busy, frame dropped",
+                        "next_capture_ms": capture_rate.max_interval_ms}), 503
+
+    app = current_app._get_current_object()
+
+    if current_app.config["INFERENCE_RESPONSE_MODE"] == "async":
+        future.add_done_callback(_persist_when_done(app, lecture_id, student_id, track))
+        return jsonify({"status": "queued", "next_capture_ms": capture_rate.next_interval_ms()}), 202
+
+    try:
+        with metrics.stage("inference_wait"):
+            result = future.result(timeout=current_app.config["INFERENCE_DEADLINE_SECONDS"])
+    except InferenceTimeout:
+        # Don't lose the frame: store it once the worker gets to it
+        inference_engine.record_timeout()
+        future.add_done_callback(_persist_when_done(app, lecture_id, student_id, track))
+        return jsonify({"status": "queued", "next_capture_ms": capture_rate.next_interval_ms()}), 202
+
+    # Every decodable frame gets an emotion (the whole frame stands in for a
+    # face that wasn't found), so None means the bytes aren't an image
+    raw_emotion = track(result)
+    if raw_emotion is None:
+        return _invalid_frame()
+
+    # 4. Save to Database
+    with metrics.stage("save_emotion_log"):
+        detected_emotion, next_capture_ms = save_emotion_log(lecture_id, student_id, raw_emotion)
+
+    return jsonify({"status": "success", "emotion": detected_emotion,
+                    "next_capture_ms": next_capture_ms}), 201
+
+
 @student_lecture_bp.route('/<int:lecture_id>/log_emotion', methods=['POST'])
-@jwt_required()
+@role_required("student")
 def log_live_emotion(lecture_id):
-    claims = get_jwt()
-    if claims.get("role") != "student":
-        return jsonify({"error": "Unauthorized"}), 403
-
     student_id = get_jwt_identity()
     
-    # 1. Verify Lecture is Live
-    lecture = Lecture.query.get(lecture_id)
+    # 1. Verify Lecture is Live (cached, see services/access.py)
+    lecture = access_cache.lecture(lecture_id)
     if not lecture or lecture.status != "live":
         return jsonify({"error": "Lecture is not currently live."}), 400
 
     try:
-        data = request.get_json()
+        with metrics.stage("json_parse"):
+            data = request.get_json()
         image_data = data.get('image')
 
         if not image_data:
             return jsonify({"error": "No image data provided"}), 400
 
-        # 2. Decode Base64 Image
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # 3. Analyze with DeepFace (Fast Mode)
-        # using 'opencv' backend is faster than default for real-time
-        analysis = DeepFace.analyze(img, 
-                                    actions=['emotion'], 
-                                    detector_backend='opencv', 
-                                    enforce_detection=False, 
-                                    silent=True)
-        
-        detected_emotion = "Neutral" # Default
-        
-        if analysis and isinstance(analysis, list) and len(analysis) > 0:
-            # Check confidence (if available) or just take dominant emotion
-            # DeepFace format is usually [{'dominant_emotion': 'happy', ...}]
-            face_data = analysis[0]
-            raw_emotion = face_data.get('dominant_emotion', 'neutral')
-
-            # 4. Map Raw Emotion to Classroom Metrics
-            if raw_emotion in ['happy', 'neutral']: 
-                detected_emotion = 'Focused'
-            elif raw_emotion in ['sad', 'fear']: 
-                detected_emotion = 'Confused'
-            elif raw_emotion in ['angry', 'disgust']: 
-                detected_emotion = 'Distracted'
-            elif raw_emotion == 'surprise':
-                detected_emotion = 'Focused' # Surprise can be positive engagement
-            else: 
-                detected_emotion = 'Bored'
-        else:
-            return jsonify({"status": "no_face_detected"}), 200
-
-        # 5. Save to Database
-        new_log = EmotionLog(
-            lecture_id=lecture_id,
-            student_id=student_id,
-            emotion=detected_emotion
-        )
-        
-        db.session.add(new_log)
-        db.session.commit()
-
-        print(f"Student {student_id} -> {detected_emotion}") # Debug log
-
-        return jsonify({"status": "success", "emotion": detected_emotion}), 201
+        # 2. Decode Base64 Image (the worker decodes the JPEG itself)
+        with metrics.stage("base64_decode"):
+            try:
+                frame_bytes = base64.b64decode(image_data.split(',')[-1], validate=True)
+            except ValueError:
+                return _invalid_frame()
+
+        return analyze_frame(lecture_id, student_id, frame_bytes)
+
+    except Exception as e:
+        print(f"Error analyzing face: {e}")
+        return jsonify({"error": "Image processing failed"}), 500
+
+
+@student_lecture_bp.route('/<int:lecture_id>/log_emotion_frame', methods=['POST'])
+@role_required("student")
+def log_live_emotion_frame(lecture_id):
+    # Binary variant of log_emotion: the body is the JPEG itself
+    #   Content-Type: image/jpeg          -> whole frame (add ?face_crop=1 if the
+    #                                        client already cropped the face)
+    #   Content-Type: multipart/form-data -> "frame" and/or "face" file parts
+
+    student_id = get_jwt_identity()
+
+    # 1. Verify Lecture is Live (cached, see services/access.py)
+    lecture = access_cache.lecture(lecture_id)
+    if not lecture or lecture.status != "live":
+        return jsonify({"error": "Lecture is not currently live."}), 400
+
+    limit = current_app.config["MAX_FRAME_BYTES"]
+    if request.content_length and request.content_length > limit:
+        return jsonify({"error": "Frame too large"}), 413
+
+    try:
+        face_crop = request.args.get('face_crop') == '1'
+
+        # 2. Read the JPEG bytes straight from the request stream (no base64, no JSON)
+        with metrics.stage("read_body"):
+            if request.mimetype == 'multipart/form-data':
+                parts = uploads.files(limit)
+                upload = parts.get('face')
+                face_crop = upload is not None
+                if upload is None:
+                    upload = parts.get('frame')
+                frame_bytes = uploads.read_part(upload, limit)
+            else:
+                frame_bytes = uploads.read_body(limit)
+
+        if not frame_bytes:
+            return jsonify({"error": "No image data provided"}), 400
+
+        # A client-side face crop goes straight to the emotion model (no detection)
+        options = {"face_crop": True} if face_crop else None
+        return analyze_frame(lecture_id, student_id, frame_bytes, options)
 
+    except (uploads.FrameTooLarge, RequestEntityTooLarge):
+        raise
     except Exception as e:
         print(f"Error analyzing face: {e}")
-        return jsonify({"error": "Image processing failed"}), 500
\ No newline at end of file
+        return jsonify({"error": "Image processing failed"}), 500
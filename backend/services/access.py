@@ -0,0 +1,155 @@
+import functools
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+
+from extensions import db
+from models.group import Group
+from models.lecture import Lecture
+from services.resource_versions import resource_versions
+
+# Role + ownership checks shared by the routes, and the small cache behind
+# them so the hot polls (live_status, log_emotion) don't query the groups /
+# lectures tables on every request:
+#   group_id   -> owning faculty_id (None: no such group)
+#   lecture_id -> group_id + status
+# Each entry remembers the "group:<id>" version counter it was read under
+# (see resource_versions); deleting a group and scheduling / starting /
+# ending a lecture bump it, which invalidates the entries in every process.
+# The counter is read before the row, so an entry is never newer than its
+# version. Least recently used entries are dropped beyond max_entries.
+
+LectureRef = namedtuple("LectureRef", "id group_id status")
+
+
+class AccessCache:
+
+    def __init__(self):
+        self.max_entries = 10000
+        self._groups = OrderedDict()    # group_id -> (faculty_id, version)
+        self._lectures = OrderedDict()  # lecture_id -> [group_id, status, version]
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def init_app(self, app):
+        self.max_entries = app.config.get("ACCESS_CACHE_SIZE", self.max_entries)
+        self.clear()
+        app.extensions["access_cache"] = self
+
+    def _version(self, group_id):
+        return resource_versions.backend.get([f"group:{group_id}"])[0]
+
+    def _store(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def _lookup(self, entries, key):
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+            return entry
+
+    def _count(self, hit):
+        with self._lock:
+            self.counters["hits" if hit else "misses"] += 1
+
+    def group_owner(self, group_id):
+        group_id = int(group_id)
+        version = self._version(group_id)
+        entry = self._lookup(self._groups, group_id)
+        if entry is not None and entry[1] == version:
+            self._count(True)
+            return entry[0]
+
+        self._count(False)
+        owner = db.session.query(Group.faculty_id).filter(Group.id == group_id).scalar()
+        self._store(self._groups, group_id, (owner, version))
+        return owner
+
+    def owns_group(self, faculty_id, group_id):
+        # group_id may come straight from a JSON body
+        try:
+            owner = self.group_owner(group_id)
+        except (TypeError, ValueError):
+            return False
+        return owner is not None and str(owner) == str(faculty_id)
+
+    def lecture(self, lecture_id):
+        # LectureRef, or None if there is no such lecture
+        lecture_id = int(lecture_id)
+        entry = self._lookup(self._lectures, lecture_id)
+        version = None
+        if entry is not None:
+            # A lecture never changes group, only the status has to be checked
+            version = self._version(entry[0])
+            if entry[2] == version:
+                self._count(True)
+                return LectureRef(lecture_id, entry[0], entry[1])
+
+        self._count(False)
+        row = db.session.query(Lecture.group_id, Lecture.status).filter(Lecture.id == lecture_id).first()
+        if row is None:
+            return None
+        # First sight of the lecture: its group (and with it the version to
+        # read) wasn't known before the query, so only the group is kept
+        self._store(self._lectures, lecture_id, [row.group_id, row.status, version])
+        return LectureRef(lecture_id, row.group_id, row.status)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+            self._lectures.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, groups=len(self._groups), lectures=len(self._lectures))
+
+
+access_cache = AccessCache()
+
+
+def role_required(role, message="Unauthorized", locations=None):
+    # @jwt_required() + the caller's role claim. locations overrides
+    # JWT_TOKEN_LOCATION for this view (the SSE streams also read ?jwt=)
+    def decorator(view):
+        @functools.wraps(view)
+        @jwt_required(locations=locations)
+        def wrapper(*args, **kwargs):
+            if get_jwt().get("role") != role:
+                return jsonify({"error": message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def owns_group(view):
+    # Faculty routes with a <group_id>: the group must belong to the caller.
+    # Use below @role_required("faculty").
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not access_cache.owns_group(get_jwt_identity(), kwargs["group_id"]):
+            return jsonify({"error": "Group not found or access denied."}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def owns_lecture(view):
+    # Faculty routes with a <lecture_id>: the lecture's group must belong to
+    # the caller. The view finds the LectureRef in g.lecture.
+    # Use below @role_required("faculty").
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        lecture = access_cache.lecture(kwargs["lecture_id"])
+        if lecture is None:
+            return jsonify({"error": "Lecture not found"}), 404
+        if not access_cache.owns_group(get_jwt_identity(), lecture.group_id):
+            return jsonify({"error": "Access denied"}), 403
+        g.lecture = lecture
+        return view(*args, **kwargs)
+    return wrapper
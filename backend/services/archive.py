@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import SmallInteger, select, type_coerce
+
+from emotions import Emotion, to_emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.emotion_rollup import EmotionRollup
+from services.rollups import rebuild_lecture_rollup
+
+# Retention for emotion_logs: once a lecture is completed and its rollup is
+# stored, its raw frames are moved into one compressed NPZ file per lecture
+# (<EMOTION_LOG_ARCHIVE_DIR>/lecture_<id>.npz) and deleted from the hot table.
+#
+# Archive layout (all arrays have one entry per log row, sorted by student, time):
+#   student_id   int32
+#   timestamp    int64   milliseconds since the epoch (UTC)
+#   emotion_idx  uint8   Emotion code (emotions.py)
+#   emotions     str     label of every code, so the file reads on its own
+
+DELETE_CHUNK = 5000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch_ms(ts):
+    return int((ts - _EPOCH).total_seconds() * 1000)
+
+
+def archive_path(archive_dir, lecture_id):
+    return os.path.join(archive_dir, f"lecture_{lecture_id}.npz")
+
+
+def is_archived(archive_dir, lecture_id):
+    return os.path.exists(archive_path(archive_dir, lecture_id))
+
+
+def archive_lecture(lecture_id, archive_dir):
+    # Returns the number of rows moved out of emotion_logs
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # 1. Make sure the rollup exists before the raw rows disappear
+    has_rollup = db.session.query(EmotionRollup.id).filter_by(lecture_id=lecture_id).first()
+    if not has_rollup:
+        with db.engine.begin() as conn:
+            rebuild_lecture_rollup(conn, lecture_id)
+
+    # 2. Stream the rows (server-side cursor) into compact arrays
+    query = select(EmotionLog.id, EmotionLog.student_id, EmotionLog.timestamp,
+                   type_coerce(EmotionLog.emotion, SmallInteger))\
+        .where(EmotionLog.lecture_id == lecture_id)\
+        .order_by(EmotionLog.student_id, EmotionLog.timestamp)
+
+    ids, students, stamps, codes = [], [], [], []
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=DELETE_CHUNK).execute(query)
+        for log_id, student_id, ts, code in result:
+            ids.append(log_id)
+            students.append(student_id)
+            stamps.append(_epoch_ms(ts))
+            codes.append(code)
+
+    if not ids:
+        return 0
+
+    # Rows logged after an earlier archive run are appended to it
+    target = archive_path(archive_dir, lecture_id)
+    if os.path.exists(target):
+        for student_id, ts, emotion in load_lecture_archive(lecture_id, archive_dir):
+            students.append(student_id)
+            stamps.append(_epoch_ms(ts))
+            codes.append(int(to_emotion(emotion)))
+
+    students = np.asarray(students, dtype=np.int32)
+    stamps = np.asarray(stamps, dtype=np.int64)
+    order = np.lexsort((stamps, students))
+
+    tmp = target + ".tmp.npz"
+    np.savez_compressed(tmp,
+                        student_id=students[order],
+                        timestamp=stamps[order],
+                        emotion_idx=np.asarray(codes, dtype=np.uint8)[order],
+                        emotions=np.asarray([e.label for e in Emotion]))
+
+    # 3. Verify the file before deleting anything, then publish it atomically
+    with np.load(tmp) as check:
+        if len(check["student_id"]) != len(students):
+            os.remove(tmp)
+            raise RuntimeError(f"Archive of lecture {lecture_id} is incomplete")
+    os.replace(tmp, target)
+
+    # 4. Delete the archived rows in small chunks to keep locks short
+    table = EmotionLog.__table__
+    for i in range(0, len(ids), DELETE_CHUNK):
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id.in_(ids[i:i + DELETE_CHUNK])))
+
+    return len(ids)
+
+
+def load_lecture_archive(lecture_id, archive_dir):
+    # Yields (student_id, timestamp, emotion) tuples in (student, time) order
+    with np.load(archive_path(archive_dir, lecture_id)) as data:
+        emotions = [str(e) for e in data["emotions"]]
+        students, stamps, codes = data["student_id"], data["timestamp"], data["emotion_idx"]
+
+    for student_id, ms, code in zip(students.tolist(), stamps.tolist(), codes.tolist()):
+        yield student_id, datetime.utcfromtimestamp(ms / 1000), emotions[code]
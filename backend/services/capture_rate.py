@@ -0,0 +1,52 @@
+from services.inference_engine import inference_engine
+
+# Server-chosen capture rate + the attendance credit of each frame.
+#
+# Every log_emotion response carries next_capture_ms. It stays at
+# CAPTURE_INTERVAL_MIN_MS while the inference queue is short and the
+# student's emotion keeps changing, and grows towards
+# CAPTURE_INTERVAL_MAX_MS when the queue fills up or the emotion is stable.
+#
+# Attendance no longer assumes a fixed interval: each logged frame covers
+# the time since the student's previous frame, capped at
+# CAPTURE_MAX_GAP_SECONDS so a student who left and came back is not
+# credited for the gap. A student's first frame covers one minimum interval.
+
+
+class CaptureRateController:
+
+    def __init__(self):
+        self.min_interval_ms = 5000
+        self.max_interval_ms = 15000
+        self.max_gap_seconds = 25.0
+        # Queue fill ratio where slowing down starts / reaches the maximum
+        self.load_low = 0.25
+        self.load_high = 0.75
+        # Share of the range added for a student whose emotion did not change
+        self.stable_slowdown = 0.5
+
+    def init_app(self, app):
+        self.min_interval_ms = app.config.get("CAPTURE_INTERVAL_MIN_MS", self.min_interval_ms)
+        self.max_interval_ms = app.config.get("CAPTURE_INTERVAL_MAX_MS", self.max_interval_ms)
+        self.max_gap_seconds = app.config.get("CAPTURE_MAX_GAP_SECONDS", self.max_gap_seconds)
+        app.extensions["capture_rate"] = self
+
+    def load(self):
+        # 0.0 (idle) .. 1.0 (queue at or above load_high)
+        stats = inference_engine.stats()
+        fill = stats["queue_depth"] / stats["queue_capacity"] if stats["queue_capacity"] else 0
+        return min(1.0, max(0.0, (fill - self.load_low) / (self.load_high - self.load_low)))
+
+    def next_interval_ms(self, stable=False):
+        slowdown = max(self.load(), self.stable_slowdown if stable else 0.0)
+        interval = self.min_interval_ms + (self.max_interval_ms - self.min_interval_ms) * slowdown
+        return int(round(interval, -2))
+
+    def credit(self, previous_ts, ts):
+        # Seconds of attendance covered by a frame at ts (epoch seconds)
+        if previous_ts is None:
+            return self.min_interval_ms / 1000.0
+        return min(max(0.0, ts - previous_ts), self.max_gap_seconds)
+
+
+capture_rate = CaptureRateController()
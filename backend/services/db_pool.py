@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+# Engine options built from the DB_* settings, and a QueuePool that measures
+# how long requests wait for a connection.
+# checkout wait = time spent in the pool getting a connection (queue wait
+# + opening a new one); saturation = connections in use / (size + overflow).
+# Both are reported by /api/health/stats under "db_pool".
+
+
+class InstrumentedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._depth = threading.local()
+        self._waits_ms = deque(maxlen=1000)
+        self.counters = {"checkouts": 0, "waited": 0, "timeouts": 0, "peak_in_use": 0}
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    def _do_get(self):
+        # QueuePool._do_get retries itself after an overflow race; only the
+        # outermost call is timed
+        depth = getattr(self._depth, "value", 0)
+        if depth:
+            return super()._do_get()
+        self._depth.value = 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.counters["timeouts"] += 1
+            raise
+        finally:
+            self._depth.value = 0
+            self._record((time.perf_counter() - started) * 1000)
+
+    def _record(self, wait_ms):
+        with self._stats_lock:
+            self.counters["checkouts"] += 1
+            # Anything above a millisecond had to queue or open a connection
+            self.counters["waited"] += wait_ms > 1.0
+            self._wait_ms_total += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+            self._waits_ms.append(wait_ms)
+            self.counters["peak_in_use"] = max(self.counters["peak_in_use"], self.checkedout())
+
+    def capacity(self):
+        return self.size() + max(self._max_overflow, 0)
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts = self.counters["checkouts"]
+            recent = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+            return dict(
+                self.counters,
+                pool="QueuePool",
+                size=self.size(),
+                max_overflow=self._max_overflow,
+                in_use=self.checkedout(),
+                saturation=round(self.checkedout() / self.capacity(), 3),
+                peak_saturation=round(self.counters["peak_in_use"] / self.capacity(), 3),
+                avg_wait_ms=round(self._wait_ms_total / checkouts, 3) if checkouts else 0.0,
+                p95_wait_ms=round(float(np.percentile(recent, 95)), 3),
+                max_wait_ms=round(self._wait_ms_max, 3),
+            )
+
+
+def engine_options(config):
+    # SQLALCHEMY_ENGINE_OPTIONS for the configured database
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # One in-memory database only exists on one connection: share it
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        options = {"connect_args": {"check_same_thread": False}}
+    else:
+        options = {"pool_recycle": config["DB_POOL_RECYCLE"]}
+
+    pool_size, max_overflow = config["DB_POOL_SIZE"], config["DB_MAX_OVERFLOW"]
+    if config.get("DB_MAX_CONNECTIONS"):
+        per_worker = max(1, config["DB_MAX_CONNECTIONS"] // max(1, config.get("WEB_CONCURRENCY", 1)))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_pre_ping=config["DB_POOL_PRE_PING"],
+    )
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"pool": type(pool).__name__}
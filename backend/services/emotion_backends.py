@@ -0,0 +1,316 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# Inference backends behind services/emotion_model.py (INFERENCE_BACKEND).
+# A backend only provides the model-specific steps; the pipeline around
+# them (tracking hints, micro-batching, room frames) is shared:
+#   load()                    build the models once per worker process
+#   detect_face(img)          -> (RGB face, box) of the main face; the whole
+#                                frame and box None when there is none
+#   detect_faces(img)         -> [(RGB face, box)] for every face (room camera)
+#   find_boxes(region, size)  -> [box] inside a small BGR region (tracking),
+#                                None if the backend can't search regions
+#   predict(faces)            -> one raw label per face, from EMOTION_LABELS
+#   embed(faces, model)       -> (faces x dim) L2-normalized float32 embeddings
+# and the face recognition models embed() knows: EMBEDDING_MODELS (None: any
+# name the library accepts), DEFAULT_EMBEDDING_MODEL when FACE_EMBEDDING_MODEL
+# is not set.
+# Boxes are [x, y, w, h]. Every backend answers with the DeepFace labels
+# below, so classify() and the stored emotion codes don't depend on it.
+#
+#   deepface  TensorFlow + the DeepFace "Emotion" model (the original path)
+#   opencv    ONNX models on OpenCV DNN (or ONNX Runtime when installed):
+#             YuNet face detector, FER+ emotion CNN (an int8 quantized export
+#             works too), SFace embeddings. No TensorFlow import, a fraction
+#             of the memory; the model files go in INFERENCE_MODEL_DIR.
+#   stub      no model at all: fixed face box, label and embedding derived
+#             from the pixels. For load tests of everything around inference.
+
+# Output order of the DeepFace "Emotion" model = the shared vocabulary
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# app.config keys handed to the backend in the worker processes
+CONFIG_KEYS = ("INFERENCE_FACE_DETECTOR_MODEL", "INFERENCE_EMOTION_MODEL", "INFERENCE_EMOTION_MODEL_LABELS",
+               "INFERENCE_FACE_RECOGNIZER_MODEL", "INFERENCE_ONNX_RUNTIME", "INFERENCE_FACE_SCORE_THRESHOLD")
+
+
+def _to_float(face):
+    face = np.asarray(face, dtype=np.float32)
+    return face / 255.0 if face.max() > 1.0 else face
+
+
+class DeepFaceBackend:
+    name = "deepface"
+    EMBEDDING_MODELS = None  # any DeepFace recognition model
+    DEFAULT_EMBEDDING_MODEL = "Facenet"
+
+    def __init__(self, options):
+        self._emotion_model = None
+        self._face_cascade = None
+        self._embedding_models = {}
+
+    def load(self):
+        # Build the emotion CNN once per process and keep it around
+        if self._emotion_model is None:
+            from deepface import DeepFace
+            try:
+                client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+            except TypeError:
+                # Older DeepFace releases only take the model name
+                client = DeepFace.build_model("Emotion")
+            # Newer releases wrap the keras model in a client object
+            self._emotion_model = getattr(client, "model", client)
+        return self._emotion_model
+
+    def _embedding_model(self, name):
+        # Face recognition model (DeepFace name, e.g. "Facenet"), built on the
+        # first room-camera / enrollment frame: most workers never need it
+        if name not in self._embedding_models:
+            from deepface import DeepFace
+            try:
+                client = DeepFace.build_model(task="facial_recognition", model_name=name)
+            except TypeError:
+                client = DeepFace.build_model(name)
+            self._embedding_models[name] = client
+        return self._embedding_models[name]
+
+    def _extract(self, img):
+        # Same detector the old in-request DeepFace.analyze call used ('opencv').
+        # With enforce_detection=False DeepFace falls back to the whole frame
+        # (confidence 0, no facial area).
+        from deepface import DeepFace
+        return DeepFace.extract_faces(img_path=img,
+                                      detector_backend='opencv',
+                                      enforce_detection=False,
+                                      align=True)
+
+    @staticmethod
+    def _box(face):
+        area = face.get("facial_area") or {}
+        if face.get("confidence", 0) > 0 and area.get("w"):
+            return [int(area["x"]), int(area["y"]), int(area["w"]), int(area["h"])]
+        return None
+
+    def detect_face(self, img):
+        faces = self._extract(img)
+        return faces[0]["face"], self._box(faces[0])
+
+    def detect_faces(self, img):
+        found = []
+        for face in self._extract(img):
+            box = self._box(face)
+            if box:
+                found.append((face["face"], box))
+        return found
+
+    def _cascade(self):
+        # The Haar cascade behind DeepFace's 'opencv' detector, loaded once.
+        # None if this OpenCV build has no Haar cascades (OpenCV 5 dropped them);
+        # tracked frames then simply take the full-frame path.
+        if self._face_cascade is None:
+            import cv2
+            self._face_cascade = False
+            if hasattr(cv2, "CascadeClassifier"):
+                cascade = cv2.CascadeClassifier(
+                    os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+                if not cascade.empty():
+                    self._face_cascade = cascade
+        return self._face_cascade or None
+
+    def find_boxes(self, region, min_size):
+        import cv2
+        cascade = self._cascade()
+        if cascade is None:
+            return None
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        found = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=min_size)
+        return [[int(v) for v in box] for box in found]
+
+    def predict(self, faces):
+        # The emotion CNN expects 48x48 grayscale faces scaled to [0, 1];
+        # one forward pass for all of them
+        import cv2
+        batch = [cv2.resize(cv2.cvtColor(_to_float(face), cv2.COLOR_RGB2GRAY), (48, 48))[:, :, np.newaxis]
+                 for face in faces]
+        predictions = self.load().predict(np.stack(batch), verbose=0)
+        return [EMOTION_LABELS[int(np.argmax(scores))] for scores in predictions]
+
+    def embed(self, faces, model_name):
+        import cv2
+        client = self._embedding_model(model_name)
+        height, width = client.input_shape
+        batch = [cv2.resize(_to_float(face), (width, height)) for face in faces]
+        model = getattr(client, "model", client)
+        vectors = np.asarray(model.predict(np.stack(batch), verbose=0), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class OpenCVDNNBackend:
+    name = "opencv"
+
+    # Output order of the FER+ model (ONNX model zoo), and the DeepFace label
+    # each class is reported as
+    FERPLUS_LABELS = ['neutral', 'happiness', 'surprise', 'sadness', 'anger', 'disgust', 'fear', 'contempt']
+    TO_VOCABULARY = {'neutral': 'neutral', 'happiness': 'happy', 'surprise': 'surprise', 'sadness': 'sad',
+                     'anger': 'angry', 'disgust': 'disgust', 'fear': 'fear', 'contempt': 'disgust'}
+    EMOTION_INPUT = 64  # FER+: 64x64 grayscale, 0-255
+    EMBEDDING_MODELS = ("SFace",)
+    DEFAULT_EMBEDDING_MODEL = "SFace"
+
+    def __init__(self, options):
+        self.detector_path = options.get("INFERENCE_FACE_DETECTOR_MODEL")
+        self.emotion_path = options.get("INFERENCE_EMOTION_MODEL")
+        self.recognizer_path = options.get("INFERENCE_FACE_RECOGNIZER_MODEL")
+        self.labels = options.get("INFERENCE_EMOTION_MODEL_LABELS") or self.FERPLUS_LABELS
+        self.runtime = options.get("INFERENCE_ONNX_RUNTIME", "auto")
+        self.score_threshold = options.get("INFERENCE_FACE_SCORE_THRESHOLD", 0.7)
+        self._detector = None
+        self._emotion = None
+        self._recognizer = None
+
+    def load(self):
+        import cv2
+        if self._detector is None:
+            self._detector = cv2.FaceDetectorYN.create(self.detector_path, "", (320, 320), self.score_threshold)
+        if self._emotion is None:
+            use_ort = self.runtime == "onnxruntime" or (
+                self.runtime == "auto" and importlib.util.find_spec("onnxruntime") is not None)
+            if use_ort:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                # One worker process per core already; don't oversubscribe
+                session_options.intra_op_num_threads = 1
+                session = onnxruntime.InferenceSession(self.emotion_path, session_options,
+                                                       providers=["CPUExecutionProvider"])
+                input_name = session.get_inputs()[0].name
+                self._emotion = lambda batch: session.run(None, {input_name: batch})[0]
+            else:
+                net = cv2.dnn.readNetFromONNX(self.emotion_path)
+
+                def run(batch):
+                    net.setInput(batch)
+                    return net.forward()
+                self._emotion = run
+        return self._emotion
+
+    def _boxes(self, img):
+        height, width = img.shape[:2]
+        self.load()
+        self._detector.setInputSize((width, height))
+        _, faces = self._detector.detect(img)
+        boxes = []
+        for face in faces if faces is not None else []:
+            x, y, w, h = (int(v) for v in face[:4])
+            x, y = max(0, x), max(0, y)
+            w, h = min(w, width - x), min(h, height - y)
+            if w > 0 and h > 0:
+                boxes.append([x, y, w, h])
+        return boxes
+
+    @staticmethod
+    def _crop(img, box):
+        x, y, w, h = box
+        return img[y:y + h, x:x + w][:, :, ::-1]
+
+    def detect_face(self, img):
+        boxes = self._boxes(img)
+        if not boxes:
+            return img[:, :, ::-1], None
+        box = max(boxes, key=lambda b: b[2] * b[3])
+        return self._crop(img, box), box
+
+    def detect_faces(self, img):
+        return [(self._crop(img, box), box) for box in self._boxes(img)]
+
+    def find_boxes(self, region, min_size):
+        return [b for b in self._boxes(region) if b[2] >= min_size[0] and b[3] >= min_size[1]]
+
+    def predict(self, faces):
+        import cv2
+        size = self.EMOTION_INPUT
+        batch = np.stack([
+            cv2.resize(cv2.cvtColor(_to_float(face) * 255.0, cv2.COLOR_RGB2GRAY), (size, size))
+            for face in faces
+        ])[:, np.newaxis, :, :].astype(np.float32)
+        scores = self.load()(batch)
+        return [self.TO_VOCABULARY.get(self.labels[int(np.argmax(row))], 'neutral') for row in scores]
+
+    def embed(self, faces, model_name):
+        import cv2
+        if model_name not in self.EMBEDDING_MODELS:
+            raise ValueError(f"The opencv backend computes {', '.join(self.EMBEDDING_MODELS)} embeddings, "
+                             f"not {model_name} (set FACE_EMBEDDING_MODEL)")
+        if self._recognizer is None:
+            self._recognizer = cv2.FaceRecognizerSF.create(self.recognizer_path, "")
+        vectors = []
+        for face in faces:
+            bgr = (np.clip(_to_float(face), 0, 1) * 255).astype(np.uint8)[:, :, ::-1]
+            vectors.append(self._recognizer.feature(cv2.resize(bgr, (112, 112))).reshape(-1))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class StubBackend:
+    name = "stub"
+    EMBEDDING_MODELS = None
+    DEFAULT_EMBEDDING_MODEL = "Facenet"
+
+    # The face is always the middle of the frame; label and embedding come
+    # from a hash of its pixels, so identical frames give identical answers
+    def __init__(self, options):
+        pass
+
+    def load(self):
+        return self
+
+    @staticmethod
+    def _middle(img):
+        height, width = img.shape[:2]
+        return [width // 4, height // 4, width // 2, height // 2]
+
+    def detect_face(self, img):
+        box = self._middle(img)
+        x, y, w, h = box
+        return img[y:y + h, x:x + w][:, :, ::-1], box
+
+    def detect_faces(self, img):
+        return [self.detect_face(img)]
+
+    def find_boxes(self, region, min_size):
+        return [self._middle(region)]
+
+    def predict(self, faces):
+        return [EMOTION_LABELS[int(_to_float(face).mean() * 997) % len(EMOTION_LABELS)] for face in faces]
+
+    def embed(self, faces, model_name):
+        import cv2
+        vectors = np.stack([
+            cv2.resize(cv2.cvtColor(_to_float(face), cv2.COLOR_RGB2GRAY), (16, 8)).reshape(-1)
+            for face in faces
+        ]) - 0.5
+        return (vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+BACKENDS = {backend.name: backend for backend in (DeepFaceBackend, OpenCVDNNBackend, StubBackend)}
+
+
+def create_backend(name, options=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](options or {})
+
+
+def embedding_model(backend_name, requested=None):
+    # FACE_EMBEDDING_MODEL for this backend: its default when unset, and a
+    # configuration error (at startup, not on every enrollment) when the
+    # backend can't compute that model
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND {backend_name!r} (choose from {', '.join(BACKENDS)})")
+    backend = BACKENDS[backend_name]
+    model = requested or backend.DEFAULT_EMBEDDING_MODEL
+    if backend.EMBEDDING_MODELS is not None and model not in backend.EMBEDDING_MODELS:
+        raise ValueError(f"FACE_EMBEDDING_MODEL={model} doesn't work with INFERENCE_BACKEND={backend_name} "
+                         f"(use {', '.join(backend.EMBEDDING_MODELS)})")
+    return model
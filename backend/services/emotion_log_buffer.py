@@ -0,0 +1,219 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from emotions import to_emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.lecture import Lecture
+from services.capture_rate import capture_rate
+from services.lecture_stats import refinalize_lectures
+from services.metrics import metrics
+from services.rollups import apply_log_rows
+
+
+LOG_COLUMNS = ("lecture_id", "student_id", "emotion", "timestamp")
+
+
+class EmotionLogBuffer:
+    # Write-behind buffer for EmotionLog rows.
+    # log_emotion appends rows in memory; they are written with one multi-row
+    # INSERT every EMOTION_LOG_FLUSH_ROWS rows or EMOTION_LOG_FLUSH_MS ms,
+    # whichever comes first. end_lecture calls flush() so its stats are exact.
+    #
+    # Other web workers' buffers (and frames still being analyzed) can hold
+    # rows of a lecture that was just ended. Every write therefore looks up
+    # which of its lectures are completed: rows stamped after actual_end are
+    # dropped, and the statistics of a completed lecture that still got rows
+    # are recomputed once they are in (end_lecture committed the status
+    # before reading the rollup, so no row falls between the two).
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.max_rows = 500
+        self.interval = 1.0
+        self.max_pending = 50000
+
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.counters = {
+            "rows_buffered": 0,
+            "rows_flushed": 0,
+            "rows_dropped": 0,
+            "rows_after_end_dropped": 0,
+            "lectures_refinalized": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+        }
+        self._flush_ms_total = 0.0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("EMOTION_LOG_BUFFERING", self.enabled)
+        self.max_rows = app.config.get("EMOTION_LOG_FLUSH_ROWS", self.max_rows)
+        self.interval = app.config.get("EMOTION_LOG_FLUSH_MS", 1000) / 1000.0
+        self.max_pending = app.config.get("EMOTION_LOG_BUFFER_MAX", self.max_pending)
+        app.extensions["emotion_log_buffer"] = self
+        atexit.register(self.flush)
+
+    # ---------------- producer side ----------------
+
+    def add(self, lecture_id, student_id, emotion, timestamp=None, covered_seconds=None):
+        # covered_seconds only goes into the rollup (attendance time of this
+        # frame); without it the frame counts as one minimum capture interval
+        self.add_many([(lecture_id, student_id, emotion, timestamp, covered_seconds)])
+
+    def add_many(self, entries):
+        # entries: (lecture_id, student_id, emotion, timestamp, covered_seconds)
+        # tuples, e.g. every student matched in one room-camera frame.
+        # Unbuffered, they still go out as a single INSERT.
+        rows = [self._row(*entry) for entry in entries]
+        if not rows:
+            return
+
+        if not self.enabled:
+            self._write(rows)
+            return
+
+        self._ensure_flusher()
+        with self._lock:
+            self._rows.extend(rows)
+            self.counters["rows_buffered"] += len(rows)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self._wakeup.set()
+
+    @staticmethod
+    def _row(lecture_id, student_id, emotion, timestamp=None, covered_seconds=None):
+        return {
+            "lecture_id": int(lecture_id),
+            "student_id": int(student_id),
+            "emotion": int(to_emotion(emotion)),
+            # Stamp now, not at flush time, so the 30s live window stays correct
+            "timestamp": timestamp or datetime.utcnow(),
+            "covered_seconds": capture_rate.credit(None, 0) if covered_seconds is None else covered_seconds,
+        }
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop,
+                                                    name="emotion-log-flusher", daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Emotion log flush failed: {e}")
+
+    # ---------------- flushing ----------------
+
+    def flush(self, finalizing=None):
+        # Write everything buffered so far. Safe to call from any thread.
+        # finalizing: id of a lecture whose statistics the caller computes
+        # right after (end_lecture), so it isn't refinalized here.
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    written = self._write(rows, finalizing)
+            except Exception:
+                self._requeue(rows)
+                raise
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            metrics.observe_stage("emotion_log_flush", elapsed_ms / 1000)
+            with self._lock:
+                self.counters["flushes"] += 1
+                self.counters["rows_flushed"] += written
+                self._flush_ms_total += elapsed_ms
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            return written
+
+    def _write(self, rows, finalizing=None):
+        # One multi-row INSERT ... VALUES (...), (...) per chunk, on its own
+        # connection so it never mixes with the caller's session.
+        # The per-student rollup is updated in the same transaction.
+        # Returns the number of rows written.
+        with db.engine.begin() as conn:
+            rows, completed = self._drop_after_end(conn, rows)
+            for i in range(0, len(rows), self.max_rows):
+                chunk = rows[i:i + self.max_rows]
+                conn.execute(EmotionLog.__table__.insert().values([
+                    {key: row[key] for key in LOG_COLUMNS} for row in chunk
+                ]))
+                apply_log_rows(conn, chunk)
+
+        # The rows are committed; a failure here must not requeue them
+        completed.discard(finalizing)
+        if completed:
+            try:
+                refinalize_lectures(completed)
+            except Exception as e:
+                print(f"Refinalizing lectures {sorted(completed)} failed: {e}")
+            else:
+                with self._lock:
+                    self.counters["lectures_refinalized"] += len(completed)
+        return len(rows)
+
+    def _drop_after_end(self, conn, rows):
+        # -> (rows to write, ids of completed lectures among them)
+        ended = dict(conn.execute(
+            select(Lecture.id, Lecture.actual_end)
+            .where(Lecture.id.in_({row["lecture_id"] for row in rows}), Lecture.status == "completed")
+        ).all())
+        if not ended:
+            return rows, set()
+
+        kept = [row for row in rows
+                if row["lecture_id"] not in ended or row["timestamp"] <= ended[row["lecture_id"]]]
+        with self._lock:
+            self.counters["rows_after_end_dropped"] += len(rows) - len(kept)
+        return kept, {row["lecture_id"] for row in kept if row["lecture_id"] in ended}
+
+    def _requeue(self, rows):
+        # Put the failed batch back in front; drop the oldest rows if the
+        # database stays unavailable for too long.
+        with self._lock:
+            self.counters["flush_failures"] += 1
+            merged = rows + self._rows
+            overflow = len(merged) - self.max_pending
+            if overflow > 0:
+                merged = merged[overflow:]
+                self.counters["rows_dropped"] += overflow
+            self._rows = merged
+
+    # ---------------- stats ----------------
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["depth"] = len(self._rows)
+        data["last_flush_ms"] = round(self.last_flush_ms, 2)
+        data["max_flush_ms"] = round(self.max_flush_ms, 2)
+        data["avg_flush_ms"] = round(self._flush_ms_total / data["flushes"], 2) if data["flushes"] else 0
+        return data
+
+
+emotion_log_buffer = EmotionLogBuffer()
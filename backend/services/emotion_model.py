@@ -0,0 +1,172 @@
+import os
+import time
+
+import numpy as np
+
+from services.emotion_backends import EMOTION_LABELS, create_backend  # noqa: F401 (EMOTION_LABELS re-exported)
+
+# Emotion model helpers used by the inference workers.
+# The model-specific steps (face detection, emotion CNN, embeddings) come from
+# the configured backend (see emotion_backends.py); this module is the shared
+# pipeline around them.
+# NOTE: cv2 / deepface (and with it tensorflow) are imported lazily by the
+# backends, so importing this module stays cheap for the API process.
+
+# Tracked detection: the padded region around the student's last face box
+# is searched first (ROI_PADDING x the box size on every side)
+ROI_PADDING = 0.5
+
+_backend = None
+
+
+def configure(name, options=None):
+    # Called once per worker process with INFERENCE_BACKEND + its settings
+    global _backend
+    _backend = create_backend(name, options)
+    return _backend
+
+
+def backend():
+    # Processes that never called configure() (scripts, benchmarks) follow
+    # the INFERENCE_BACKEND environment variable
+    if _backend is None:
+        configure(os.environ.get("INFERENCE_BACKEND", "deepface"))
+    return _backend
+
+
+def load_models():
+    # Build the models once per process and keep them around
+    return backend().load()
+
+
+def warm_up():
+    # Run one inference on a synthetic frame so the face detector and the
+    # model graph are fully built before the first real student frame.
+    # (Uniform gray + a lighter oval is enough to exercise the whole path.)
+    import cv2
+    frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+    cv2.ellipse(frame, (160, 120), (55, 75), 0, 0, 360, (190, 190, 190), -1)
+    analyze_batch([frame, frame], [{}, {"roi": [105, 45, 110, 150]}])
+
+
+def decode_image(frame_bytes):
+    import cv2
+    nparr = np.frombuffer(frame_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def _detect_in_roi(img, roi):
+    # Look for the face only around its last known box [x, y, w, h].
+    # Returns (RGB face crop, box) or (None, None) if it is not there any more
+    # (or the backend can't search a region).
+    x, y, w, h = roi
+    pad_w, pad_h = int(w * ROI_PADDING), int(h * ROI_PADDING)
+    x0, y0 = max(0, x - pad_w), max(0, y - pad_h)
+    x1, y1 = min(img.shape[1], x + w + pad_w), min(img.shape[0], y + h + pad_h)
+    if x1 <= x0 or y1 <= y0:
+        return None, None
+
+    found = backend().find_boxes(img[y0:y1, x0:x1], (max(1, w // 2), max(1, h // 2)))
+    if not found:
+        return None, None
+
+    fx, fy, fw, fh = max(found, key=lambda b: b[2] * b[3])
+    box = [int(x0 + fx), int(y0 + fy), int(fw), int(fh)]
+    face = img[box[1]:box[1] + box[3], box[0]:box[0] + box[2]][:, :, ::-1]
+    return face, box
+
+
+def locate_face(img, opts):
+    # -> (face, box, mode). mode tells which path found the face:
+    #   "crop" the client sent a face crop, no detection at all
+    #   "roi"  found around the tracked box given as opts["roi"]
+    #   "full" full-frame detection (no hint, or the face left the region)
+    if opts.get("face_crop"):
+        return img[:, :, ::-1], None, "crop"
+    if opts.get("roi"):
+        face, box = _detect_in_roi(img, opts["roi"])
+        if face is not None:
+            return face, box, "roi"
+    face, box = backend().detect_face(img)
+    return face, box, "full"
+
+
+def analyze_batch(frames, options=None):
+    # frames: list of JPEG bytes (or already decoded images)
+    # options: optional list of per-frame dicts:
+    #          {"face_crop": True}  the client already cropped the face
+    #          {"roi": [x, y, w, h]} search around this box before the full frame
+    #          {"embed": "Facenet"} also return the face's embedding (enrollment)
+    #          {"room": "Facenet"}  room camera: every face, each with emotion + embedding
+    # returns one dict per frame (None if the frame was unreadable):
+    #   {"emotion": raw label (EMOTION_LABELS), "box": face box or None,
+    #    "mode": "crop" | "roi" | "full", "detect_ms": detection time,
+    #    "embedding": float32 vector (embed only)}
+    #   room frames: {"mode": "room", "detect_ms": ..., "faces": [{"box", "emotion", "embedding"}, ...]}
+    #   plus "stage_ms": {"decode", "detect", "classify"[, "embed"]} for
+    #   services/metrics.py (the batched steps split evenly over the frames)
+    model = backend()
+    model.load()
+    options = options or [{}] * len(frames)
+
+    results = [None] * len(frames)
+    batch, positions = [], []
+    # Faces that need an embedding, per model: {model: ([face], [position])}
+    to_embed = {}
+
+    for i, (frame, opts) in enumerate(zip(frames, options)):
+        started = time.perf_counter()
+        img = decode_image(frame) if isinstance(frame, (bytes, bytearray, memoryview)) else frame
+        if img is None:
+            continue
+        decode_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        if opts.get("room"):
+            found = model.detect_faces(img)
+            detect_ms = round((time.perf_counter() - started) * 1000, 3)
+            results[i] = {"mode": "room", "faces": [{"box": box} for _, box in found],
+                          "detect_ms": detect_ms, "stage_ms": {"decode": decode_ms, "detect": detect_ms}}
+            for j, (face, _) in enumerate(found):
+                batch.append(face)
+                positions.append((i, j))
+                faces, where = to_embed.setdefault(opts["room"], ([], []))
+                faces.append(face)
+                where.append((i, j))
+            continue
+
+        face, box, mode = locate_face(img, opts)
+        detect_ms = round((time.perf_counter() - started) * 1000, 3)
+        results[i] = {"box": box, "mode": mode, "detect_ms": detect_ms,
+                      "stage_ms": {"decode": decode_ms, "detect": detect_ms}}
+        batch.append(face)
+        positions.append((i, None))
+        if opts.get("embed"):
+            faces, where = to_embed.setdefault(opts["embed"], ([], []))
+            faces.append(face)
+            where.append((i, None))
+
+    def target(i, j):
+        return results[i] if j is None else results[i]["faces"][j]
+
+    def share(stage, where, started):
+        # Time of one batched call, split evenly over the frames it served
+        frame_ids = [i for i, _ in where]
+        per_frame = (time.perf_counter() - started) * 1000 / len(frame_ids)
+        for i in frame_ids:
+            stages = results[i]["stage_ms"]
+            stages[stage] = stages.get(stage, 0.0) + per_frame
+
+    if batch:
+        # One forward pass for the whole micro-batch
+        started = time.perf_counter()
+        for (i, j), label in zip(positions, model.predict(batch)):
+            target(i, j)["emotion"] = label
+        share("classify", positions, started)
+
+    for model_name, (faces, where) in to_embed.items():
+        started = time.perf_counter()
+        for (i, j), vector in zip(where, model.embed(faces, model_name)):
+            target(i, j)["embedding"] = vector
+        share("embed", where, started)
+
+    return results
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+from flask import jsonify
+
+# Tiny pub/sub used by the server-sent event streams.
+# Channels are plain strings ("lecture:12", "group:3"). Every subscriber keeps
+# only the LATEST payload per (event, key), so a burst of updates collapses
+# into one message, and never receives more than one batch per min_interval.
+#
+# Every open stream holds one web worker thread for as long as the client is
+# connected, so subscribe() refuses more than STREAM_MAX_PER_PROCESS streams
+# per process (StreamLimitReached); the views answer 503 + Retry-After and the
+# clients fall back to polling, leaving the remaining threads to the API.
+
+
+# Token locations of the stream views: EventSource can't set headers, so the
+# token may also come as ?jwt=... there (and only there)
+STREAM_TOKEN_LOCATIONS = ["headers", "query_string"]
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+class Subscription:
+
+    def __init__(self, bus, channels, min_interval):
+        self.bus = bus
+        self.channels = list(channels)
+        self.min_interval = min_interval
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._last_sent = 0.0
+        self.closed = False
+
+    def push(self, event, data, key=None):
+        with self._cond:
+            self._pending[(event, key)] = data
+            self._cond.notify()
+
+    def wait(self, timeout):
+        # Block until there is something to send (or timeout -> []).
+        # Returns a list of (event, data) tuples, coalesced.
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._pending and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            delay = self._last_sent + self.min_interval - time.monotonic()
+
+        # Rate limit: anything arriving while we sleep is merged into this batch
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._cond:
+            items = [(event, data) for (event, _), data in self._pending.items()]
+            self._pending.clear()
+            self._last_sent = time.monotonic()
+        return items
+
+    def close(self):
+        # Called from the generator and from the response's close hook
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify()
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.min_interval = 1.0
+        self.heartbeat = 15.0
+        self.max_streams = 0  # 0 = no limit
+        self.retry_after = 30
+        self._streams = 0
+        self._rejected = 0
+        self._redis = None
+        self._relay = None
+        self._listeners = []
+
+    def init_app(self, app):
+        self.min_interval = app.config.get("STREAM_MIN_INTERVAL_MS", 1000) / 1000.0
+        self.heartbeat = app.config.get("STREAM_HEARTBEAT_SECONDS", self.heartbeat)
+        self.max_streams = app.config.get("STREAM_MAX_PER_PROCESS", self.max_streams)
+        self.retry_after = app.config.get("STREAM_RETRY_AFTER_SECONDS", self.retry_after)
+        # With the shared Redis live state, relay events between worker processes too
+        if app.config.get("LIVE_STATE_BACKEND") == "redis":
+            import redis
+            self._redis = redis.Redis.from_url(app.config["LIVE_STATE_REDIS_URL"])
+            if self._relay is None:
+                # Threads don't survive fork(): gunicorn workers forked from a
+                # preloaded app start their own relay
+                os.register_at_fork(after_in_child=self._start_relay)
+            self._start_relay()
+        app.extensions["event_bus"] = self
+
+    def _start_relay(self):
+        if self._redis is not None and not (self._relay and self._relay.is_alive()):
+            self._relay = threading.Thread(target=self._relay_loop, name="event-relay", daemon=True)
+            self._relay.start()
+
+    def subscribe(self, channels, min_interval=None):
+        sub = Subscription(self, channels, max(self.min_interval, min_interval or 0))
+        with self._lock:
+            if self.max_streams and self._streams >= self.max_streams:
+                self._rejected += 1
+                raise StreamLimitReached()
+            self._streams += 1
+            for channel in sub.channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._streams -= 1
+            for channel in sub.channels:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def stats(self):
+        with self._lock:
+            return {"streams": self._streams, "max_streams": self.max_streams, "rejected": self._rejected}
+
+    def add_listener(self, callback):
+        # callback(channel, event, data) for every event of every channel,
+        # including the ones relayed from other processes
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def publish(self, channel, event, data=None, key=None):
+        if self._redis is not None:
+            self._redis.publish(f"events:{channel}", json.dumps([event, data, key]))
+        else:
+            self._deliver(channel, event, data, key)
+
+    def _deliver(self, channel, event, data, key):
+        for listener in self._listeners:
+            listener(channel, event, data)
+        with self._lock:
+            subs = list(self._subscribers.get(channel, ()))
+        for sub in subs:
+            sub.push(event, data, key)
+
+    def _relay_loop(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe("events:*")
+        for message in pubsub.listen():
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            event, data, key = json.loads(message["data"])
+            self._deliver(channel.split(":", 1)[1], event, data, key)
+
+
+def sse_message(event, data):
+    # One Server-Sent Events frame
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_busy():
+    # Answer to a stream request over STREAM_MAX_PER_PROCESS: the client polls
+    # the plain endpoint instead and may retry the stream after Retry-After
+    response = jsonify({"error": "stream_limit", "retry_after": event_bus.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(event_bus.retry_after)
+    return response
+
+
+event_bus = EventBus()
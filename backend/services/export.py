@@ -0,0 +1,277 @@
+import csv
+import heapq
+import importlib.util
+import io
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from flask import Response, stream_with_context
+from sqlalchemy import SmallInteger, func, or_, select, type_coerce
+
+from emotions import Emotion, to_emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.lecture import Lecture
+from models.lecture_attendance import LectureAttendance
+from models.user import User
+from services.archive import archive_path, is_archived
+
+# Streaming CSV / Parquet exports of lecture data:
+#   timeline    -> every emotion_logs row (also read back from the per-lecture
+#                  archives of services/archive.py)
+#   attendance  -> the lecture_attendance summary, with student name / roll no
+# Rows come from a server-side cursor (stream_results) in chunks of
+# EXPORT_CHUNK_ROWS and each chunk is written to the response as soon as it
+# is encoded, so memory stays flat however long the lectures are. Archived
+# lectures are the exception: one lecture's arrays (13 bytes a row) are
+# loaded at a time. Per lecture, the archived rows and the ones still in
+# emotion_logs are merged in (student, time) order; a row found in both (an
+# archive run that stopped before deleting what it archived) is written once.
+#
+# Parquet needs pyarrow (optional, imported on first use); every chunk
+# becomes one row group.
+
+ExportFilters = namedtuple("ExportFilters", "student_ids start end emotions")
+
+# (column, type); the types are mapped to Arrow types for Parquet
+TIMELINE_COLUMNS = [("lecture_id", "int32"), ("student_id", "int32"),
+                    ("timestamp", "timestamp"), ("emotion", "string")]
+ATTENDANCE_COLUMNS = [("lecture_id", "int32"), ("student_id", "int32"), ("name", "string"),
+                      ("roll_no", "string"), ("total_minutes_detected", "int32"),
+                      ("attendance_percentage", "float64"), ("dominant_mood", "string")]
+
+FORMATS = {"csv": ("text/csv", "csv"), "parquet": ("application/vnd.apache.parquet", "parquet")}
+
+_LABELS = [e.label for e in Emotion]
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _parse_time(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise ExportError(f"'{name}' must be an ISO date/time")
+
+
+def parse_filters(args):
+    # ?student_id=1,2&student_id=3 &from=2024-01-08&to=2024-05-01T00:00 &emotion=Bored,Confused
+    # The time range is [from, to); all filters are optional
+    try:
+        student_ids = {int(s) for value in args.getlist("student_id") for s in value.split(",") if s.strip()}
+    except ValueError:
+        raise ExportError("'student_id' must be a list of ids")
+    try:
+        emotions = {to_emotion(e.strip().capitalize())
+                    for value in args.getlist("emotion") for e in value.split(",") if e.strip()}
+    except (KeyError, ValueError):
+        raise ExportError(f"'emotion' must be one of {', '.join(_LABELS)}")
+    start, end = _parse_time(args.get("from"), "from"), _parse_time(args.get("to"), "to")
+    if start and end and start >= end:
+        raise ExportError("'from' must be before 'to'")
+    return ExportFilters(student_ids or None, start, end, emotions or None)
+
+
+def parse_format(args):
+    # -> (what, fmt) from ?data=timeline|attendance&format=csv|parquet
+    what = args.get("data", "timeline")
+    fmt = args.get("format", "csv")
+    if what not in ("timeline", "attendance"):
+        raise ExportError("'data' must be 'timeline' or 'attendance'")
+    if fmt not in FORMATS:
+        raise ExportError("'format' must be 'csv' or 'parquet'")
+    return what, fmt
+
+
+def group_lecture_ids(group_id, filters):
+    # The group's lectures that ran (at least partly) inside the time range
+    query = db.session.query(Lecture.id).filter(Lecture.group_id == group_id)
+    if filters.end:
+        query = query.filter(func.coalesce(Lecture.actual_start, Lecture.scheduled_start) < filters.end)
+    if filters.start:
+        query = query.filter(or_(Lecture.actual_end.is_(None), Lecture.actual_end >= filters.start))
+    return [lid for (lid,) in query.order_by(Lecture.scheduled_start, Lecture.id)]
+
+
+def _archived_timeline(lecture_id, archive_dir, filters, chunk_rows):
+    with np.load(archive_path(archive_dir, lecture_id)) as data:
+        labels = [str(e) for e in data["emotions"]]
+        students, stamps, codes = data["student_id"], data["timestamp"], data["emotion_idx"]
+
+    stamps = stamps.astype("datetime64[ms]")
+    keep = np.ones(len(students), dtype=bool)
+    if filters.student_ids:
+        keep &= np.isin(students, list(filters.student_ids))
+    if filters.start:
+        keep &= stamps >= np.datetime64(filters.start, "ms")
+    if filters.end:
+        keep &= stamps < np.datetime64(filters.end, "ms")
+    if filters.emotions:
+        keep &= np.isin(codes, [int(e) for e in filters.emotions])
+    students, stamps, codes = students[keep], stamps[keep], codes[keep]
+
+    for i in range(0, len(students), chunk_rows):
+        yield [(lecture_id, s, ts, labels[c]) for s, ts, c in zip(
+            students[i:i + chunk_rows].tolist(), stamps[i:i + chunk_rows].tolist(), codes[i:i + chunk_rows].tolist())]
+
+
+def _stream(query, chunk_rows):
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(query)
+        yield from result.partitions()
+
+
+def _live_timeline(lecture_id, filters, chunk_rows):
+    code = type_coerce(EmotionLog.emotion, SmallInteger)
+    query = select(EmotionLog.lecture_id, EmotionLog.student_id, EmotionLog.timestamp, code)\
+        .where(EmotionLog.lecture_id == lecture_id)
+    if filters.student_ids:
+        query = query.where(EmotionLog.student_id.in_(filters.student_ids))
+    if filters.start:
+        query = query.where(EmotionLog.timestamp >= filters.start)
+    if filters.end:
+        query = query.where(EmotionLog.timestamp < filters.end)
+    if filters.emotions:
+        query = query.where(code.in_([int(e) for e in filters.emotions]))
+    query = query.order_by(EmotionLog.student_id, EmotionLog.timestamp)
+
+    for rows in _stream(query, chunk_rows):
+        yield [(lid, sid, ts, _LABELS[c]) for lid, sid, ts, c in rows]
+
+
+def _row_key(row):
+    # (student, time) at the millisecond precision of the archives
+    ts = row[2]
+    return row[1], ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+def _merged(archived, live, chunk_rows):
+    # Both sources are in (student, time) order
+    rows = heapq.merge((row for chunk in archived for row in chunk),
+                       (row for chunk in live for row in chunk), key=_row_key)
+    chunk, key, seen = [], None, set()
+    for row in rows:
+        if _row_key(row) != key:
+            key, seen = _row_key(row), set()
+        if row[3] in seen:
+            continue
+        seen.add(row[3])
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def timeline_chunks(lecture_ids, filters, archive_dir, chunk_rows):
+    for lecture_id in lecture_ids:
+        live = _live_timeline(lecture_id, filters, chunk_rows)
+        if is_archived(archive_dir, lecture_id):
+            yield from _merged(_archived_timeline(lecture_id, archive_dir, filters, chunk_rows), live, chunk_rows)
+        else:
+            yield from live
+
+
+def attendance_chunks(lecture_ids, filters, chunk_rows):
+    if not lecture_ids:
+        return
+    mood = type_coerce(LectureAttendance.dominant_mood, SmallInteger)
+    query = select(LectureAttendance.lecture_id, LectureAttendance.student_id, User.name, User.roll_no,
+                   LectureAttendance.total_minutes_detected, LectureAttendance.attendance_percentage, mood)\
+        .join(User, User.user_id == LectureAttendance.student_id)\
+        .where(LectureAttendance.lecture_id.in_(lecture_ids))
+    if filters.student_ids:
+        query = query.where(LectureAttendance.student_id.in_(filters.student_ids))
+    if filters.emotions:
+        query = query.where(mood.in_([int(e) for e in filters.emotions]))
+    query = query.order_by(LectureAttendance.lecture_id, LectureAttendance.student_id)
+
+    for rows in _stream(query, chunk_rows):
+        yield [row[:6] + (None if row[6] is None else _LABELS[row[6]],) for row in rows]
+
+
+def write_csv(columns, chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in columns])
+    yield buf.getvalue().encode()
+    for rows in chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+
+
+class _Sink:
+    # Write-only file for pyarrow; take() hands over what was written so far
+
+    def __init__(self):
+        self._parts = []
+        self._size = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def write_parquet(columns, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"int32": pa.int32(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("ms")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for rows in chunks:
+            if not rows:
+                continue
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def export_response(what, fmt, lecture_ids, filters, filename, config):
+    # what: "timeline" | "attendance", fmt: "csv" | "parquet"
+    chunk_rows = config.get("EXPORT_CHUNK_ROWS", 10000)
+    if what == "timeline":
+        columns = TIMELINE_COLUMNS
+        chunks = timeline_chunks(lecture_ids, filters, config["EMOTION_LOG_ARCHIVE_DIR"], chunk_rows)
+    else:
+        columns = ATTENDANCE_COLUMNS
+        chunks = attendance_chunks(lecture_ids, filters, chunk_rows)
+
+    mimetype, extension = FORMATS[fmt]
+    body = write_csv(columns, chunks) if fmt == "csv" else write_parquet(columns, chunks)
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{os.path.basename(filename)}.{extension}"',
+        "X-Accel-Buffering": "no",
+    })
+
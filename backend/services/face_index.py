@@ -0,0 +1,124 @@
+import threading
+import time
+
+import numpy as np
+
+from extensions import db
+from models.face_embedding import FaceEmbedding
+from models.group_member import GroupMember
+from services.emotion_backends import embedding_model
+from services.resource_versions import resource_versions
+
+# Room-camera matching: per live lecture, the enrolled face embeddings of
+# the group's students as one (students x dim) float32 matrix, L2-normalized.
+# Matching the m faces of a frame is a single (m x dim) @ (dim x students)
+# product, so 100 faces against 500 students is well under a millisecond.
+#
+# The index is built at start_lecture (one query) and dropped at
+# end_lecture. Other processes build it on their first room frame. A new
+# enrollment bumps the "faces:<group_id>" version of the student's groups,
+# joining or leaving a group (or being added / removed by the faculty) the
+# version of that group (see resource_versions), and indexes built under an
+# older version are rebuilt on their next use.
+
+
+class FaceIndex:
+
+    def __init__(self):
+        self.model = "Facenet"
+        self.min_similarity = 0.6
+
+        self._lectures = {}  # lecture_id -> {"version", "student_ids", "matrix"}
+        self._lock = threading.Lock()
+        self.counters = {"builds": 0, "frames": 0, "faces": 0, "matched": 0}
+        self._match_ms_total = 0.0
+
+    def init_app(self, app):
+        self.model = embedding_model(app.config.get("INFERENCE_BACKEND", "deepface"),
+                                     app.config.get("FACE_EMBEDDING_MODEL"))
+        self.min_similarity = app.config.get("FACE_MATCH_MIN_SIMILARITY", self.min_similarity)
+        with self._lock:
+            self._lectures.clear()
+        app.extensions["face_index"] = self
+
+    @staticmethod
+    def _scope(group_id):
+        return f"faces:{group_id}"
+
+    def build(self, lecture_id, group_id):
+        # Load the group's enrolled embeddings into memory
+        version = resource_versions.backend.get([self._scope(group_id)])[0]
+        rows = db.session.query(FaceEmbedding.student_id, FaceEmbedding.vector)\
+            .join(GroupMember, GroupMember.student_id == FaceEmbedding.student_id)\
+            .filter(GroupMember.group_id == group_id, FaceEmbedding.model == self.model)\
+            .distinct().all()
+
+        if rows:
+            student_ids = np.array([sid for sid, _ in rows], dtype=np.int64)
+            matrix = np.stack([np.frombuffer(vector, dtype=np.float32) for _, vector in rows])
+        else:
+            student_ids, matrix = np.empty(0, dtype=np.int64), None
+
+        entry = {"group_id": group_id, "version": version, "student_ids": student_ids, "matrix": matrix}
+        with self._lock:
+            self._lectures[int(lecture_id)] = entry
+            self.counters["builds"] += 1
+        return entry
+
+    def _entry(self, lecture_id, group_id):
+        with self._lock:
+            entry = self._lectures.get(int(lecture_id))
+        if entry is None or entry["version"] != resource_versions.backend.get([self._scope(group_id)])[0]:
+            entry = self.build(lecture_id, group_id)
+        return entry
+
+    def match(self, lecture_id, group_id, embeddings):
+        # embeddings: (faces x dim) normalized vectors of one frame.
+        # Returns [(student_id or None, best similarity)] per face. A student
+        # is given to at most one face: the most similar one wins, the others
+        # stay unmatched for this frame.
+        entry = self._entry(lecture_id, group_id)
+        faces = len(embeddings)
+        matches = [(None, 0.0)] * faces
+        started = time.perf_counter()
+
+        if faces and entry["matrix"] is not None:
+            scores = np.asarray(embeddings, dtype=np.float32) @ entry["matrix"].T
+            best = scores.argmax(axis=1)
+            best_score = scores[np.arange(faces), best]
+            matches = [(None, score) for score in best_score.tolist()]
+
+            order = np.argsort(-best_score)
+            order = order[best_score[order] >= self.min_similarity]
+            # First (= most similar) face of each student
+            _, first = np.unique(best[order], return_index=True)
+            for face in order[first].tolist():
+                matches[face] = (int(entry["student_ids"][best[face]]), float(best_score[face]))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.counters["frames"] += 1
+            self.counters["faces"] += faces
+            self.counters["matched"] += sum(1 for sid, _ in matches if sid is not None)
+            self._match_ms_total += elapsed_ms
+        return matches
+
+    def invalidate_groups(self, group_ids):
+        # The enrolled faces of these groups changed (an enrollment, a member
+        # joined or left): their indexes are stale
+        resource_versions.bump(*(self._scope(gid) for gid in group_ids))
+
+    def clear(self, lecture_id):
+        with self._lock:
+            self._lectures.pop(int(lecture_id), None)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["lectures"] = len(self._lectures)
+            data["students_indexed"] = sum(len(e["student_ids"]) for e in self._lectures.values())
+        data["avg_match_ms"] = round(self._match_ms_total / data["frames"], 3) if data["frames"] else 0
+        return data
+
+
+face_index = FaceIndex()
@@ -0,0 +1,80 @@
+import threading
+
+# Per-student face tracking for the inference workers.
+# Remembers where each student's face was last found; the next frame is sent
+# with that box as a hint ({"roi": [x, y, w, h]}) so the worker searches a
+# small padded region instead of the whole frame. Every FACE_TRACK_FULL_EVERY
+# frames, and whenever the face is lost, the full frame is searched again.
+#
+# State is per process, like the frame filter: a worker that has not seen
+# the student yet simply starts with a full-frame detection.
+
+
+class FaceTracker:
+
+    def __init__(self):
+        self.enabled = True
+        self.full_every = 12
+
+        self._lectures = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "roi_hits": 0,
+            "roi_misses": 0,
+            "full_detections": 0,
+        }
+        self._detect_ms = {"roi": 0.0, "full": 0.0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get("FACE_TRACK_ENABLED", self.enabled)
+        self.full_every = app.config.get("FACE_TRACK_FULL_EVERY", self.full_every)
+        app.extensions["face_tracker"] = self
+
+    def hint(self, lecture_id, student_id):
+        # Box to search first, or None when this frame needs a full-frame pass
+        if not self.enabled:
+            return None
+        with self._lock:
+            track = self._lectures.get(int(lecture_id), {}).get(int(student_id))
+            if track is None or track["box"] is None or track["since_full"] >= self.full_every:
+                return None
+            return track["box"]
+
+    def update(self, lecture_id, student_id, result, hinted=False):
+        # result: one analysis dict from emotion_model.analyze_batch
+        # hinted: the frame was submitted with a box from hint()
+        if not self.enabled or not result or result.get("mode") not in ("roi", "full"):
+            return
+        with self._lock:
+            students = self._lectures.setdefault(int(lecture_id), {})
+            track = students.setdefault(int(student_id), {"box": None, "since_full": 0})
+
+            if result["mode"] == "roi":
+                self.counters["roi_hits"] += 1
+                track["since_full"] += 1
+            else:
+                # Scheduled full pass, or the face left the hinted region
+                if hinted:
+                    self.counters["roi_misses"] += 1
+                self.counters["full_detections"] += 1
+                track["since_full"] = 0
+            self._detect_ms[result["mode"]] += result.get("detect_ms", 0)
+            track["box"] = result.get("box")
+
+    def clear(self, lecture_id):
+        with self._lock:
+            self._lectures.pop(int(lecture_id), None)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            roi_ms, full_ms = self._detect_ms["roi"], self._detect_ms["full"]
+        # ROI misses ran both searches; their time is part of the full-frame bucket
+        data["avg_roi_detect_ms"] = round(roi_ms / data["roi_hits"], 2) if data["roi_hits"] else 0
+        data["avg_full_detect_ms"] = round(full_ms / data["full_detections"], 2) if data["full_detections"] else 0
+        tracked = data["roi_hits"] + data["full_detections"]
+        data["roi_ratio"] = round(data["roi_hits"] / tracked, 3) if tracked else 0
+        return data
+
+
+face_tracker = FaceTracker()
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import numpy as np
+
+from services.inference_engine import inference_engine
+
+# Cheap change detection in front of the inference engine.
+# For every (lecture, student) we keep a 32x32 grayscale thumbnail of the
+# last analyzed frame and its result. A new frame whose mean absolute
+# difference to that thumbnail stays under FRAME_SKIP_THRESHOLD reuses the
+# previous result instead of running face detection + the emotion CNN.
+# The caller still logs the frame, so attendance minutes are unaffected.
+#
+# State is per process: with several API workers a student's frames may be
+# compared against an older thumbnail or miss it entirely (-> analyzed).
+
+SIGNATURE_SIZE = 32
+
+
+class FrameChangeFilter:
+
+    def __init__(self):
+        self.enabled = True
+        self.threshold = 4.0
+        self.max_reuse = 6
+
+        self._lectures = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "frames_checked": 0,
+            "frames_skipped": 0,
+            "frames_undecodable": 0,
+        }
+        self._signature_ms_total = 0.0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("FRAME_SKIP_ENABLED", self.enabled)
+        self.threshold = app.config.get("FRAME_SKIP_THRESHOLD", self.threshold)
+        self.max_reuse = app.config.get("FRAME_SKIP_MAX_REUSE", self.max_reuse)
+        app.extensions["frame_filter"] = self
+
+    # ---------------- signatures ----------------
+
+    def signature(self, frame_bytes):
+        # 32x32 grayscale thumbnail, or None when disabled / not a decodable image.
+        # The JPEG is decoded at 1/8 scale, so this costs a fraction of a millisecond.
+        if not self.enabled:
+            return None
+
+        import cv2
+        started = time.perf_counter()
+        small = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        signature = None
+        if small is not None:
+            signature = cv2.resize(small, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.counters["frames_checked"] += 1
+            self._signature_ms_total += elapsed_ms
+            if signature is None:
+                self.counters["frames_undecodable"] += 1
+        return signature
+
+    @staticmethod
+    def difference(a, b):
+        # Mean absolute pixel difference on the 0-255 scale
+        import cv2
+        return float(cv2.absdiff(a, b).mean())
+
+    # ---------------- per-student state ----------------
+
+    def lookup(self, lecture_id, student_id, signature, kind="frame"):
+        # Returns (True, previous raw label) if the frame can skip inference.
+        # kind separates full frames from client-side face crops.
+        if signature is None:
+            return False, None
+
+        with self._lock:
+            entry = self._lectures.get(int(lecture_id), {}).get((int(student_id), kind))
+            if entry is None or entry["reused"] >= self.max_reuse:
+                return False, None
+            if self.difference(signature, entry["signature"]) >= self.threshold:
+                return False, None
+            # Keep the analyzed thumbnail as reference so slow drift adds up
+            entry["reused"] += 1
+            self.counters["frames_skipped"] += 1
+            return True, entry["raw"]
+
+    def remember(self, lecture_id, student_id, signature, raw, kind="frame"):
+        # Store the result of a frame that went through inference
+        if signature is None:
+            return
+        with self._lock:
+            students = self._lectures.setdefault(int(lecture_id), {})
+            students[(int(student_id), kind)] = {"signature": signature, "raw": raw, "reused": 0}
+
+    def clear(self, lecture_id):
+        with self._lock:
+            self._lectures.pop(int(lecture_id), None)
+
+    # ---------------- stats ----------------
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+        checked, skipped = data["frames_checked"], data["frames_skipped"]
+        signature_ms = self._signature_ms_total
+
+        # CPU saved = skipped frames x measured inference CPU per frame,
+        # minus what computing the signatures cost
+        inference_ms = inference_engine.stats()["avg_cpu_ms_per_frame"]
+        data["skip_ratio"] = round(skipped / checked, 3) if checked else 0
+        data["avg_signature_ms"] = round(signature_ms / checked, 3) if checked else 0
+        data["est_cpu_saved_ms"] = round(skipped * inference_ms - signature_ms, 1)
+        return data
+
+
+frame_filter = FrameChangeFilter()
@@ -0,0 +1,449 @@
+import atexit
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+
+from services.emotion_backends import CONFIG_KEYS
+
+
+# Imported by the forkserver before it forks the inference workers
+# (missing ones are skipped)
+PRELOAD_MODULES = ["numpy", "cv2", "tensorflow", "deepface.DeepFace", "onnxruntime", "services.emotion_model"]
+
+
+# Dead workers are respawned after RESPAWN_DELAY seconds, doubling up to
+# RESPAWN_MAX_DELAY while they keep dying (e.g. the model can't be loaded)
+RESPAWN_DELAY = 1.0
+RESPAWN_MAX_DELAY = 60.0
+SUPERVISE_INTERVAL = 1.0
+
+
+class InferenceQueueFull(Exception):
+    pass
+
+
+def _collect_batch(get_job, batch_size, batch_wait):
+    # Block for the first frame, then take whatever else arrives within
+    # batch_wait seconds (up to batch_size frames). A None job means "stop".
+    first = get_job(None)
+    if first is None:
+        return None, True
+
+    batch = [first]
+    deadline = time.monotonic() + batch_wait
+    while len(batch) < batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            job = get_job(remaining)
+        except queue.Empty:
+            break
+        if job is None:
+            return batch, True
+        batch.append(job)
+    return batch, False
+
+
+def _analyze(batch):
+    from services import emotion_model
+    outputs = emotion_model.analyze_batch([frame for _, frame, _ in batch],
+                                          [options for _, _, options in batch])
+    return [(job_id, output, None) for (job_id, _, _), output in zip(batch, outputs)]
+
+
+def _run_batch(batch):
+    # Returns the per-job results, the CPU time the batch took (ms) and
+    # whether it had to be retried frame by frame
+    started = time.process_time()
+    retried = False
+    try:
+        results = _analyze(batch)
+    except Exception as e:
+        if len(batch) == 1:
+            results = [(batch[0][0], None, str(e))]
+        else:
+            # One bad frame must not fail the whole micro-batch: run the
+            # frames one at a time so only the offending ones fail
+            retried = True
+            results = []
+            for job in batch:
+                try:
+                    results.extend(_analyze([job]))
+                except Exception as e:
+                    results.append((job[0], None, str(e)))
+    return results, (time.process_time() - started) * 1000, retried
+
+
+def _worker_main(job_queue, result_conn, batch_size, batch_wait, backend):
+    # Runs in a separate process: load the model once, then serve micro-batches.
+    # Every worker has its own job queue and result pipe, so a worker that is
+    # killed can't leave a lock held that the others are waiting on.
+    from services import emotion_model
+    try:
+        emotion_model.configure(*backend)
+        emotion_model.load_models()
+        emotion_model.warm_up()
+    except Exception as e:
+        # Shown by /ready; the engine respawns the worker with a backoff
+        result_conn.send(("load_error", None, f"{type(e).__name__}: {e}"))
+        raise
+    result_conn.send(("ready", None, None))
+
+    def get_job(timeout):
+        return job_queue.get(timeout=timeout) if timeout is not None else job_queue.get()
+
+    stop = False
+    while not stop:
+        batch, stop = _collect_batch(get_job, batch_size, batch_wait)
+        if batch:
+            results, cpu_ms, retried = _run_batch(batch)
+            result_conn.send(("batch", (len(batch), cpu_ms, retried), None))
+            for result in results:
+                result_conn.send(result)
+
+
+class _WorkerSlot:
+    # One inference process, its job queue and the parent's end of its result pipe
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.jobs = None
+        self.results = None
+        self.outstanding = 0   # submitted to this worker, not answered yet
+        self.ready = False
+        self.failures = 0      # deaths since it was last ready
+        self.respawn_at = 0.0
+
+
+class InferenceEngine:
+    # Bounded frame queue + pool of model-holding workers.
+    # INFERENCE_WORKERS = 0 runs a single in-process inference thread instead
+    # (handy for local development).
+    # Frames go to the live worker with the fewest outstanding frames. The
+    # dispatcher thread also supervises the workers: when one exits, the frames
+    # it still had fail right away and it is started again.
+
+    def __init__(self):
+        self.num_workers = 0
+        self.batch_size = 8
+        self.batch_wait = 0.01
+        self.max_queue = 256
+        self.start_method = "spawn"
+        # (INFERENCE_BACKEND, its settings), see services/emotion_backends.py
+        self.backend = ("deepface", {})
+
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._assigned = {}  # job id -> worker slot
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+        self._ctx = None
+        self._slots = []
+        self._threads = []
+        self._jobs = None
+
+        self.ready_workers = 0
+        # Last model load failure of a worker, until every worker is ready
+        self.load_error = None
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected_queue_full": 0,
+            "timed_out": 0,
+            "batches": 0,
+            "batched_frames": 0,
+            "batches_retried": 0,
+            "worker_restarts": 0,
+        }
+        self._cpu_ms_total = 0.0
+
+    def init_app(self, app):
+        self.num_workers = app.config.get("INFERENCE_WORKERS", self.num_workers)
+        self.batch_size = app.config.get("INFERENCE_BATCH_SIZE", self.batch_size)
+        self.batch_wait = app.config.get("INFERENCE_BATCH_WAIT_MS", 10) / 1000.0
+        self.max_queue = app.config.get("INFERENCE_QUEUE_SIZE", self.max_queue)
+        self.start_method = app.config.get("INFERENCE_START_METHOD", self.start_method)
+        self.backend = (app.config.get("INFERENCE_BACKEND", self.backend[0]),
+                        {key: app.config[key] for key in CONFIG_KEYS if key in app.config})
+        app.extensions["inference_engine"] = self
+
+    # ---------------- lifecycle ----------------
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+
+        if self.num_workers > 0:
+            self._ctx = multiprocessing.get_context(self.start_method)
+            if self.start_method == "forkserver":
+                # Workers fork from a server that already imported the heavy
+                # libraries once, so their code pages are shared copy-on-write
+                # (the model weights are still loaded per worker)
+                self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+            self._slots = [_WorkerSlot(i) for i in range(self.num_workers)]
+            for slot in self._slots:
+                self._spawn_worker(slot)
+            self._spawn_thread(self._dispatch_results, "inference-dispatcher")
+        else:
+            self._jobs = queue.Queue()
+            self._spawn_thread(self._inline_loop, "inference-inline")
+
+        atexit.register(self.shutdown)
+
+    def _spawn_worker(self, slot):
+        jobs = self._ctx.Queue()
+        results, child_end = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(target=_worker_main,
+                                    args=(jobs, child_end, self.batch_size, self.batch_wait, self.backend),
+                                    daemon=True)
+        process.start()
+        # Our copy of the write end must go, or a dead worker's pipe never reports EOF
+        child_end.close()
+        with self._lock:
+            slot.jobs, slot.results, slot.process = jobs, results, process
+
+    def _spawn_thread(self, target, name):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def drain(self, timeout):
+        # Wait for the frames already submitted (e.g. async-mode uploads whose
+        # result still has to be stored). Returns how many are left.
+        deadline = time.monotonic() + timeout
+        while self._started and time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return 0
+            time.sleep(0.05)
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self):
+        if not self._started:
+            return
+        self._stopping = True
+        if self.num_workers > 0:
+            for slot in self._slots:
+                if slot.process is not None:
+                    slot.jobs.put(None)
+            for slot in self._slots:
+                process = slot.process
+                if process is not None:
+                    process.join(timeout=5)
+                    if process.is_alive():
+                        process.terminate()
+        else:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+        self._slots, self._threads = [], []
+        self._started = False
+
+    # ---------------- request side ----------------
+
+    def submit(self, frame, options=None):
+        # Returns a Future resolving to the analysis dict of
+        # emotion_model.analyze_batch (or None for an unreadable frame)
+        if not self._started:
+            self.start()
+
+        future = Future()
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                self.counters["rejected_queue_full"] += 1
+                raise InferenceQueueFull()
+            slot = None
+            if self.num_workers > 0:
+                # Least loaded live worker; none while they are all restarting
+                live = [s for s in self._slots if s.process is not None]
+                if not live:
+                    self.counters["rejected_queue_full"] += 1
+                    raise InferenceQueueFull()
+                slot = min(live, key=lambda s: s.outstanding)
+                slot.outstanding += 1
+            job_id = next(self._ids)
+            self._pending[job_id] = future
+            self._assigned[job_id] = slot
+            self.counters["submitted"] += 1
+
+        (slot.jobs if slot is not None else self._jobs).put((job_id, frame, options or {}))
+        return future
+
+    def record_timeout(self):
+        with self._lock:
+            self.counters["timed_out"] += 1
+
+    def _resolve(self, job_id, output, error):
+        with self._lock:
+            future = self._pending.pop(job_id, None)
+            slot = self._assigned.pop(job_id, None)
+            if slot is not None:
+                slot.outstanding -= 1
+            if error:
+                self.counters["failed"] += 1
+            else:
+                self.counters["completed"] += 1
+        if future is None:
+            return
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(output)
+
+    def _record_batch(self, size, cpu_ms, retried=False):
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["batches_retried"] += retried
+            self.counters["batched_frames"] += size
+            self._cpu_ms_total += cpu_ms
+
+    # ---------------- worker side ----------------
+
+    def _dispatch_results(self):
+        # Reads every worker's result pipe and notices exited workers through
+        # their process sentinel
+        next_check = time.monotonic() + SUPERVISE_INTERVAL
+        while True:
+            with self._lock:
+                live = [s for s in self._slots if s.process is not None]
+            if self._stopping and not live:
+                return
+            by_object = {}
+            for slot in live:
+                by_object[slot.results] = slot
+                by_object[slot.process.sentinel] = slot
+            for ready in wait_connections(list(by_object), timeout=SUPERVISE_INTERVAL):
+                slot = by_object[ready]
+                if ready is slot.results:
+                    self._read_results(slot)
+                elif slot.process is not None:
+                    self._worker_exited(slot)
+
+            now = time.monotonic()
+            if now >= next_check:
+                self._respawn_due(now)
+                next_check = now + SUPERVISE_INTERVAL
+
+    def _read_results(self, slot):
+        # Everything the worker sent so far (False once its pipe is closed)
+        try:
+            while slot.results.poll():
+                self._handle(slot, slot.results.recv())
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def _handle(self, slot, message):
+        kind, value, error = message
+        if kind == "ready":
+            with self._lock:
+                slot.ready, slot.failures = True, 0
+                self.ready_workers = sum(s.ready for s in self._slots)
+                if self.ready_workers == len(self._slots):
+                    self.load_error = None
+        elif kind == "load_error":
+            self.load_error = error
+            print(f"Inference worker {slot.index} could not load the model: {error}")
+        elif kind == "batch":
+            self._record_batch(*value)
+        else:
+            self._resolve(kind, value, error)
+
+    def _worker_exited(self, slot):
+        # Results it sent before exiting still count; whatever it had left fails
+        self._read_results(slot)
+        process = slot.process
+        process.join(timeout=1)
+        if self._stopping:
+            with self._lock:
+                slot.process = None
+            return
+        with self._lock:
+            slot.process = None
+            slot.ready = False
+            self.ready_workers = sum(s.ready for s in self._slots)
+            slot.failures += 1
+            delay = min(RESPAWN_MAX_DELAY, RESPAWN_DELAY * 2 ** (slot.failures - 1))
+            slot.respawn_at = time.monotonic() + delay
+            self.counters["worker_restarts"] += 1
+            lost = [job_id for job_id, owner in self._assigned.items() if owner is slot]
+        slot.results.close()
+        # Frames still in its queue are never read: don't let the feeder
+        # thread block on the full pipe (or block interpreter exit)
+        slot.jobs.cancel_join_thread()
+        slot.jobs.close()
+        print(f"Inference worker {slot.index} exited with code {process.exitcode}, "
+              f"failing {len(lost)} frames, restarting in {delay:.0f}s")
+        for job_id in lost:
+            self._resolve(job_id, None, f"Inference worker exited with code {process.exitcode}")
+
+    def _respawn_due(self, now):
+        for slot in self._slots:
+            if slot.process is None and now >= slot.respawn_at and not self._stopping:
+                self._spawn_worker(slot)
+
+    def _inline_loop(self):
+        from services import emotion_model
+
+        def get_job(timeout):
+            return self._jobs.get(timeout=timeout) if timeout is not None else self._jobs.get()
+
+        try:
+            emotion_model.configure(*self.backend)
+            emotion_model.load_models()
+            emotion_model.warm_up()
+        except Exception as e:
+            # Shown by /ready; every frame fails until the app is restarted
+            self.load_error = f"{type(e).__name__}: {e}"
+            print(f"Inference thread could not load the model: {self.load_error}")
+            while (job := self._jobs.get()) is not None:
+                self._resolve(job[0], None, self.load_error)
+            return
+        self.ready_workers = 1
+
+        stop = False
+        while not stop:
+            batch, stop = _collect_batch(get_job, self.batch_size, self.batch_wait)
+            if batch:
+                # process_time() also counts the Flask threads here: an upper bound
+                results, cpu_ms, retried = _run_batch(batch)
+                self._record_batch(len(batch), cpu_ms, retried)
+                for job_id, output, error in results:
+                    self._resolve(job_id, output, error)
+
+    def is_ready(self):
+        # Every worker has loaded the model and finished its warm-up frame
+        return self._started and self.ready_workers >= max(1, self.num_workers)
+
+    # ---------------- stats ----------------
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["queue_depth"] = len(self._pending)
+            data["live_workers"] = sum(s.process is not None for s in self._slots) if self._slots \
+                else int(self._started)
+        data["queue_capacity"] = self.max_queue
+        data["workers"] = self.num_workers
+        data["backend"] = self.backend[0]
+        data["ready_workers"] = self.ready_workers
+        data["load_error"] = self.load_error
+        data["avg_batch_size"] = round(data["batched_frames"] / data["batches"], 2) if data["batches"] else 0
+        # Face detection + emotion CNN cost of one frame, measured in the workers
+        data["avg_cpu_ms_per_frame"] = round(self._cpu_ms_total / data["batched_frames"], 2) if data["batched_frames"] else 0
+        return data
+
+
+inference_engine = InferenceEngine()
@@ -0,0 +1,87 @@
+import numpy as np
+from sqlalchemy import delete
+
+from emotions import Emotion, EMOTION_SLOTS
+from extensions import db
+from models.group_member import GroupMember
+from models.lecture import Lecture
+from models.lecture_attendance import LectureAttendance
+from services.rollups import get_emotion_counts, rebuild_lecture_rollup
+
+
+def lecture_duration_minutes(lecture):
+    # Minimum 1 minute
+    return max(1, int((lecture.actual_end - lecture.actual_start).total_seconds() / 60))
+
+
+def finalize_lecture_statistics(lecture, total_duration_minutes):
+    # Fills lecture_attendance for every enrolled student and the class averages.
+    # Callers flush the emotion log buffer first so the rollup is complete.
+    # Fixed number of queries regardless of class size or lecture length.
+    # Safe to run again: the previous attendance rows are replaced.
+    db.session.execute(delete(LectureAttendance).where(LectureAttendance.lecture_id == lecture.id))
+
+    member_ids = [sid for (sid,) in db.session.query(GroupMember.student_id)
+                  .filter(GroupMember.group_id == lecture.group_id).all()]
+    if not member_ids:
+        lecture.dominant_class_mood = Emotion.ABSENT
+        return
+
+    # Read the incrementally maintained rollup (O(students) rows).
+    # Lectures recorded before the rollup table existed get one built first.
+    rows = get_emotion_counts(lecture.id)
+    if not rows:
+        rebuild_lecture_rollup(db.session.connection(), lecture.id)
+        rows = get_emotion_counts(lecture.id)
+
+    # counts[i, code] = frames of member i classified as that emotion
+    position = {sid: i for i, sid in enumerate(member_ids)}
+    counts = np.zeros((len(member_ids), EMOTION_SLOTS), dtype=np.int64)
+    covered = np.zeros(len(member_ids))
+    rows = [(position[sid], code, n, seconds) for sid, code, n, seconds in rows if sid in position]
+    if rows:
+        student_idx, codes, n, seconds = np.array(rows, dtype=np.float64).T
+        student_idx, codes = student_idx.astype(np.int64), codes.astype(np.int64)
+        np.add.at(counts, (student_idx, codes), n.astype(np.int64))
+        np.add.at(covered, student_idx, seconds)
+
+    # Attendance = time covered by the student's frames (each frame covers
+    # the gap since their previous one, capped), not frames x a fixed interval
+    logs = counts.sum(axis=1)
+    minutes_detected = np.round(covered / 60, 2)
+    attendance_pct = np.minimum(100.0, minutes_detected / total_duration_minutes * 100)
+
+    # Dominant Mood: the most frequent emotion, Absent without any frame
+    present = logs > 0
+    dominant_mood = np.where(present, counts.argmax(axis=1), int(Emotion.ABSENT))
+
+    # One bulk INSERT for the whole class
+    db.session.execute(LectureAttendance.__table__.insert(), [
+        {
+            "lecture_id": lecture.id,
+            "student_id": student_id,
+            "total_minutes_detected": minutes,
+            "attendance_percentage": pct,
+            "dominant_mood": mood
+        }
+        for student_id, minutes, pct, mood in zip(member_ids, minutes_detected.tolist(),
+                                                 attendance_pct.tolist(), dominant_mood.tolist())
+    ])
+
+    lecture.avg_attendance_percentage = float(attendance_pct.mean())
+
+    # Class mood: the dominant mood shared by most present students
+    if present.any():
+        lecture.dominant_class_mood = int(np.bincount(dominant_mood[present], minlength=EMOTION_SLOTS).argmax())
+    else:
+        lecture.dominant_class_mood = Emotion.ABSENT
+
+
+def refinalize_lectures(lecture_ids):
+    # Emotion logs of already completed lectures reached the database after
+    # end_lecture (buffered in another web worker, or captured just before the
+    # end): recompute their statistics
+    for lecture in db.session.query(Lecture).filter(Lecture.id.in_(lecture_ids),
+                                                    Lecture.status == "completed").all():
+        finalize_lecture_statistics(lecture, lecture_duration_minutes(lecture))
+    db.session.commit()
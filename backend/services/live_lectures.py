@@ -0,0 +1,72 @@
+import threading
+import time
+
+from extensions import db
+from models.lecture import Lecture
+from services.event_bus import event_bus
+
+# Short-TTL cache of "which lecture is live in this group".
+# Student dashboards ask for every enrolled group on each load; misses are
+# filled with a single IN query. start/end of a lecture invalidate the group
+# right away: locally through invalidate(), and in the other worker processes
+# through the lecture_live / lecture_ended events relayed by the event bus.
+# The TTL bounds staleness for anything else (e.g. a deleted group).
+
+
+class LiveLectureCache:
+
+    def __init__(self):
+        self.ttl = 5.0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def init_app(self, app):
+        self.ttl = app.config.get("LIVE_LECTURE_CACHE_SECONDS", self.ttl)
+        event_bus.add_listener(self._on_event)
+        app.extensions["live_lectures"] = self
+
+    def get_many(self, group_ids):
+        # {group_id: live lecture id or None}
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for gid in group_ids:
+                entry = self._entries.get(gid)
+                if entry is not None and entry[1] > now:
+                    found[gid] = entry[0]
+                else:
+                    missing.append(gid)
+            self.counters["hits"] += len(found)
+            self.counters["misses"] += len(missing)
+
+        if missing:
+            live = dict.fromkeys(missing)
+            rows = db.session.query(Lecture.group_id, Lecture.id)\
+                .filter(Lecture.group_id.in_(missing), Lecture.status == "live").all()
+            for gid, lecture_id in rows:
+                live[gid] = lecture_id
+            with self._lock:
+                for gid, lecture_id in live.items():
+                    self._entries[gid] = (lecture_id, now + self.ttl)
+            found.update(live)
+        return found
+
+    def invalidate(self, group_id):
+        with self._lock:
+            self._entries.pop(int(group_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+    def _on_event(self, channel, event, data):
+        if event in ("lecture_live", "lecture_ended") and data:
+            self.invalidate(data["group_id"])
+
+
+live_lectures = LiveLectureCache()
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Live lecture state, keyed by lecture_id:
+#   - latest emotion code + timestamp per student
+#   - running mood counts over the students that are currently active
+#   - the active set (students seen inside the live window)
+# Updated in O(1) by log_emotion; students age out lazily when a snapshot
+# is taken, so get_live_status never has to scan emotion_logs.
+
+
+class MemoryLiveStateBackend:
+    # Default backend: plain dicts inside this process
+
+    def __init__(self):
+        self._lectures = {}
+        self._lock = threading.Lock()
+
+    def _state(self, lecture_id):
+        state = self._lectures.get(lecture_id)
+        if state is None:
+            state = {"latest": {}, "active": OrderedDict(), "counts": {}}
+            self._lectures[lecture_id] = state
+        return state
+
+    def record(self, lecture_id, student_id, emotion, ts):
+        with self._lock:
+            state = self._state(lecture_id)
+            previous = state["latest"].get(student_id)
+            counts, active = state["counts"], state["active"]
+
+            # Student was already counted -> move their vote to the new emotion
+            if student_id in active:
+                counts[previous[0]] -= 1
+                active.move_to_end(student_id)
+            active[student_id] = ts
+            counts[emotion] = counts.get(emotion, 0) + 1
+            state["latest"][student_id] = (emotion, ts)
+            return previous
+
+    def snapshot(self, lecture_id, cutoff):
+        with self._lock:
+            # Reading must not create state (unknown or already cleared lectures)
+            state = self._lectures.get(lecture_id)
+            if state is None:
+                return {}, {}, set()
+            latest, counts, active = state["latest"], state["counts"], state["active"]
+
+            # Oldest updates sit at the front of the ordered dict
+            while active:
+                student_id, seen = next(iter(active.items()))
+                if seen >= cutoff:
+                    break
+                active.popitem(last=False)
+                counts[latest[student_id][0]] -= 1
+
+            return dict(latest), {k: v for k, v in counts.items() if v}, set(active)
+
+    def clear(self, lecture_id):
+        with self._lock:
+            self._lectures.pop(lecture_id, None)
+
+
+# KEYS: latest hash, active zset, counts hash   ARGV: student, emotion, ts, ttl
+_RECORD_SCRIPT = """
+local prev = redis.call('HGET', KEYS[1], ARGV[1])
+if prev and redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    redis.call('HINCRBY', KEYS[3], string.match(prev, '^([^|]*)'), -1)
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. '|' .. ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('HINCRBY', KEYS[3], ARGV[2], 1)
+for i = 1, 3 do redis.call('EXPIRE', KEYS[i], ARGV[4]) end
+return prev
+"""
+
+# KEYS: latest hash, active zset, counts hash   ARGV: cutoff
+_AGE_OUT_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+for _, student in ipairs(stale) do
+    local value = redis.call('HGET', KEYS[1], student)
+    if value then
+        redis.call('HINCRBY', KEYS[3], string.match(value, '^([^|]*)'), -1)
+    end
+    redis.call('ZREM', KEYS[2], student)
+end
+return #stale
+"""
+
+
+def _as_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisLiveStateBackend:
+    # Shared backend for multi-worker deployments. Works with any
+    # redis-py compatible client (redis.Redis, fakeredis.FakeRedis, ...).
+
+    def __init__(self, client, ttl_seconds=24 * 3600, prefix="live"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._record = client.register_script(_RECORD_SCRIPT)
+        self._age_out = client.register_script(_AGE_OUT_SCRIPT)
+
+    def _keys(self, lecture_id):
+        base = f"{self.prefix}:{lecture_id}"
+        return [f"{base}:latest", f"{base}:active", f"{base}:counts"]
+
+    @staticmethod
+    def _decode(value):
+        emotion, ts = _as_str(value).rsplit("|", 1)
+        return int(emotion), float(ts)
+
+    def record(self, lecture_id, student_id, emotion, ts):
+        previous = self._record(keys=self._keys(lecture_id),
+                                args=[student_id, emotion, repr(ts), self.ttl_seconds])
+        return self._decode(previous) if previous else None
+
+    def snapshot(self, lecture_id, cutoff):
+        latest_key, active_key, counts_key = keys = self._keys(lecture_id)
+        self._age_out(keys=keys, args=[repr(cutoff)])
+
+        pipe = self.client.pipeline()
+        pipe.hgetall(latest_key)
+        pipe.hgetall(counts_key)
+        pipe.zrange(active_key, 0, -1)
+        raw_latest, raw_counts, raw_active = pipe.execute()
+
+        latest = {int(k): self._decode(v) for k, v in raw_latest.items()}
+        counts = {int(k): int(v) for k, v in raw_counts.items() if int(v)}
+        active = {int(s) for s in raw_active}
+        return latest, counts, active
+
+    def clear(self, lecture_id):
+        self.client.delete(*self._keys(lecture_id))
+
+
+class LiveStateStore:
+
+    def __init__(self):
+        self.backend = MemoryLiveStateBackend()
+        self.window_seconds = 30
+
+    def init_app(self, app):
+        self.window_seconds = app.config.get("LIVE_WINDOW_SECONDS", self.window_seconds)
+        if app.config.get("LIVE_STATE_BACKEND", "memory") == "redis":
+            import redis
+            client = redis.Redis.from_url(app.config["LIVE_STATE_REDIS_URL"])
+            self.backend = RedisLiveStateBackend(client)
+        else:
+            self.backend = MemoryLiveStateBackend()
+        app.extensions["live_state"] = self
+
+    def record(self, lecture_id, student_id, emotion, ts=None):
+        # Returns the student's previous (emotion code, ts), or None on their first frame
+        return self.backend.record(int(lecture_id), int(student_id), int(emotion), ts or time.time())
+
+    def snapshot(self, lecture_id, now=None):
+        # (latest per student, {emotion code: count} of active students, active student ids)
+        cutoff = (now or time.time()) - self.window_seconds
+        return self.backend.snapshot(int(lecture_id), cutoff)
+
+    def clear(self, lecture_id):
+        self.backend.clear(int(lecture_id))
+
+
+live_state = LiveStateStore()
@@ -0,0 +1,216 @@
+import bisect
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+
+from flask import request
+from sqlalchemy import event
+
+# Prometheus metrics of this process, served as text by GET /metrics:
+#   smartclass_stage_seconds{stage}        one step of the frame path (below)
+#   smartclass_http_request_seconds{endpoint,method,status}
+#   smartclass_http_request_db_queries{endpoint}   statements per request
+#   smartclass_db_query_seconds{operation}  every statement, from the
+#                                           SQLAlchemy cursor events
+# plus every number of /api/health/stats as a gauge.
+#
+# Stages of a student frame:
+#   read_body / json_parse / base64_decode   request parsing (API process)
+#   frame_filter                             unchanged-frame lookup
+#   inference_wait                           submit -> result (queue + worker)
+#   decode / detect / classify / embed       inside the inference worker
+#                                            (cv2.imdecode, face detection,
+#                                            emotion CNN share of the batch)
+#   save_emotion_log                         live state + write-behind buffer
+#   emotion_log_flush                        the buffered INSERT + commit
+#
+# METRICS_ENABLED=0 installs no hooks at all and stage() hands out a shared
+# null context, so the instrumented code only pays an attribute lookup.
+# With several web workers every process keeps its own numbers; the "pid"
+# label tells the scrapes apart.
+
+# Seconds; frame stages are in the ms range, whole requests up to seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    # Fixed buckets per label combination; observe() is one bisect and a
+    # few additions under a lock
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # per-bucket counts, +Inf count, sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self, lines, common):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for label_values, series in sorted(self.snapshot().items()):
+            labels = common + "".join(f',{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "stage", "started")
+
+    def __init__(self, histogram, stage):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+
+_DISABLED = nullcontext()
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = True
+        self.stages = Histogram("smartclass_stage_seconds",
+                                "Time per step of the frame path", ("stage",), LATENCY_BUCKETS)
+        self.requests = Histogram("smartclass_http_request_seconds",
+                                  "Request latency until the response headers", ("endpoint", "method", "status"),
+                                  LATENCY_BUCKETS)
+        self.request_queries = Histogram("smartclass_http_request_db_queries",
+                                         "SQL statements run by one request", ("endpoint",), QUERY_COUNT_BUCKETS)
+        self.queries = Histogram("smartclass_db_query_seconds",
+                                 "SQL statement execution time", ("operation",), QUERY_BUCKETS)
+        # Request start / statement count of the request this thread serves
+        self._local = threading.local()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", self.enabled)
+        app.extensions["metrics"] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        from extensions import db
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", self._before_query)
+        event.listen(engine, "after_cursor_execute", self._after_query)
+
+    # ---------------- instrumentation ----------------
+
+    def stage(self, name):
+        # with metrics.stage("base64_decode"): ...
+        if not self.enabled:
+            return _DISABLED
+        return _StageTimer(self.stages, name)
+
+    def observe_stage(self, name, seconds):
+        if self.enabled:
+            self.stages.observe(seconds, name)
+
+    def observe_inference(self, result):
+        # Worker-side timings of one analyze_batch result ("stage_ms")
+        if self.enabled and result:
+            for name, ms in result.get("stage_ms", {}).items():
+                self.stages.observe(ms / 1000.0, name)
+
+    def _before_request(self):
+        local = self._local
+        local.started = time.perf_counter()
+        local.queries = 0
+
+    def _after_request(self, response):
+        local = self._local
+        started, queries = getattr(local, "started", None), getattr(local, "queries", None)
+        local.started = local.queries = None
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            self.requests.observe(time.perf_counter() - started, endpoint, request.method, response.status_code)
+            self.request_queries.observe(queries, endpoint)
+        return response
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_started", None)
+        if started is None:
+            return
+        operation = statement.lstrip()[:6].upper()
+        self.queries.observe(time.perf_counter() - started, operation if operation in OPERATIONS else "OTHER")
+        local = self._local
+        if getattr(local, "queries", None) is not None:
+            local.queries += 1
+
+    def clear(self):
+        for histogram in (self.stages, self.requests, self.request_queries, self.queries):
+            histogram.clear()
+
+    # ---------------- exposition ----------------
+
+    def render(self, gauges=None):
+        # Prometheus text format 0.0.4. gauges: {section: {key: number}},
+        # e.g. the /api/health/stats dict (non-numeric values are skipped)
+        common = f'pid="{os.getpid()}"'
+        lines = []
+        for histogram in (self.stages, self.requests, self.request_queries, self.queries):
+            histogram.render(lines, common)
+        for section, values in (gauges or {}).items():
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = re.sub(r"[^a-zA-Z0-9_]", "_", f"smartclass_{section}_{key}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{{{common}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
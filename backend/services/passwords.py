@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from extensions import db
+from models.user import User
+
+# Password hashing on a small dedicated thread pool.
+# scrypt / pbkdf2 cost 50-600 ms of CPU per call by design; a 9 a.m. login
+# storm would otherwise run hundreds of them at once on the request threads.
+# hashlib releases the GIL while hashing, so PASSWORD_HASH_WORKERS threads
+# keep that many cores busy and no more. Requests beyond PASSWORD_HASH_QUEUE
+# waiting hashes are turned away with PasswordHasherBusy (-> 503).
+#
+# PASSWORD_HASH_METHOD is any werkzeug method string ("scrypt",
+# "scrypt:16384:8:1", "pbkdf2:sha256:600000", ...). Hashes stored with other
+# parameters still verify, and are re-hashed with the current ones after a
+# successful login.
+#
+# UNUSABLE_PASSWORD marks accounts created by a roster import: no password
+# matches it, signing up with the account's email sets the first one.
+
+UNUSABLE_PASSWORD = "!"
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self.method = "scrypt"
+        self.max_workers = 4
+        self.max_queue = 256
+        self.timeout = 10.0
+        self._executor = None
+        self._prefix = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.counters = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected_busy": 0}
+
+    def init_app(self, app):
+        self.app = app
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.max_workers = app.config.get("PASSWORD_HASH_WORKERS", self.max_workers)
+        self.max_queue = app.config.get("PASSWORD_HASH_QUEUE", self.max_queue)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT_SECONDS", self.timeout)
+        self._prefix = None
+        app.extensions["password_hasher"] = self
+
+    def _submit(self, fn, *args):
+        # Created on first use, i.e. after a gunicorn fork
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="password-hash")
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.counters["rejected_busy"] += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _current_prefix(self):
+        # "method:params" part of hashes made with the configured method
+        # (werkzeug fills in the defaults, so ask it once)
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    def _verify(self, stored, password):
+        if not check_password_hash(stored, password):
+            return False, False
+        return True, stored.split("$", 1)[0] != self._current_prefix()
+
+    def hash(self, password):
+        result = self._submit(generate_password_hash, password, self.method).result(self.timeout)
+        with self._lock:
+            self.counters["hashed"] += 1
+        return result
+
+    def verify(self, user, password):
+        # True if the password matches; outdated hashes are upgraded in the background
+        if user.password == UNUSABLE_PASSWORD:
+            return False
+        ok, outdated = self._submit(self._verify, user.password, password).result(self.timeout)
+        with self._lock:
+            self.counters["verified"] += 1
+        if ok and outdated:
+            try:
+                self._submit(self._rehash, user.user_id, password)
+            except PasswordHasherBusy:
+                pass  # next login tries again
+        return ok
+
+    def _rehash(self, user_id, password):
+        new_hash = generate_password_hash(password, self.method)
+        with self.app.app_context():
+            db.session.execute(User.__table__.update()
+                               .where(User.user_id == user_id).values(password=new_hash))
+            db.session.commit()
+        with self._lock:
+            self.counters["rehashed"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self._pending, workers=self.max_workers,
+                        queue_capacity=self.max_queue, method=self.method)
+
+
+password_hasher = PasswordHasher()
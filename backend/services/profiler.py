@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+# Sampling profiler for slow requests (PROFILE_SLOW_REQUEST_MS > 0).
+# One background thread looks at the stack of every thread that is serving
+# a request each PROFILE_INTERVAL_MS. When a request took longer than the
+# threshold its samples are written to PROFILE_DIR as collapsed stacks
+# ("outer;inner;leaf count" lines), the input format of flamegraph.pl and
+# speedscope:
+#   flamegraph.pl profiles/20260101-120000-student_lecture.log_live_emotion-850ms-<thread>.folded > slow.svg
+# Faster requests only cost the sampling; with the threshold at 0 no hook
+# and no thread is installed.
+
+
+class SlowRequestProfiler:
+
+    def __init__(self):
+        self.threshold_ms = 0
+        self.interval = 0.005
+        self.directory = "profiles"
+        self.max_files = 200
+
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+        self._local = threading.local()
+
+        self.counters = {
+            "requests_profiled": 0,
+            "samples": 0,
+            "profiles_written": 0,
+            "profiles_skipped": 0,
+        }
+
+    def init_app(self, app):
+        self.threshold_ms = app.config.get("PROFILE_SLOW_REQUEST_MS", self.threshold_ms)
+        self.interval = app.config.get("PROFILE_INTERVAL_MS", 5) / 1000.0
+        self.directory = app.config.get("PROFILE_DIR", self.directory)
+        self.max_files = app.config.get("PROFILE_MAX_FILES", self.max_files)
+        app.extensions["profiler"] = self
+        if self.threshold_ms > 0:
+            app.before_request(self._start)
+            app.after_request(self._stop)
+
+    # ---------------- request hooks ----------------
+
+    def _start(self):
+        self._ensure_sampler()
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def _stop(self, response):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        started, self._local.started = getattr(self._local, "started", None), None
+        if samples is None or started is None:
+            return response
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.counters["requests_profiled"] += 1
+            self.counters["samples"] += sum(samples.values())
+        if elapsed_ms >= self.threshold_ms and samples:
+            self._write(request.endpoint or "unmatched", elapsed_ms, samples)
+        return response
+
+    # ---------------- sampling ----------------
+
+    def _ensure_sampler(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._sample_loop, name="slow-request-profiler",
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[self._collapse(frame)] += 1
+                # Don't keep the sampled frames (and their locals) alive
+                del frames, frame
+
+    @staticmethod
+    def _collapse(frame):
+        # "outer;...;leaf", one "function (file:first line)" per frame
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _write(self, endpoint, elapsed_ms, samples):
+        with self._lock:
+            if self.counters["profiles_written"] >= self.max_files:
+                self.counters["profiles_skipped"] += 1
+                return
+            self.counters["profiles_written"] += 1
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{endpoint}-{elapsed_ms:.0f}ms-{threading.get_ident()}.folded"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Could not write profile {name}: {e}")
+
+    # ---------------- stats ----------------
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["active"] = len(self._active)
+        data["threshold_ms"] = self.threshold_ms
+        return data
+
+
+profiler = SlowRequestProfiler()
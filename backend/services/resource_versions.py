@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import threading
+import uuid
+
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity, get_jwt
+
+from extensions import db
+from models.group_member import GroupMember
+
+# Version counters behind the ETags of the polled dashboard endpoints.
+# Scopes are plain strings:
+#   "student:<id>"  -> the student's group list (membership, live lectures)
+#   "faculty:<id>"  -> the faculty's group list
+#   "group:<id>"    -> the group's scheduled / current lectures
+#   "faces:<id>"    -> the enrolled faces of the group's students (face_index)
+# Mutating routes bump() the scopes they change AFTER their commit; polled
+# GETs read the counters BEFORE querying, so a response is never tagged with
+# a version newer than its data. A matching If-None-Match is answered with
+# 304 straight from the counters: no database query, no JSON.
+# The epoch changes whenever the counters start from scratch (new process
+# with the memory backend, flushed Redis), so old ETags can't match again.
+
+
+class MemoryVersionBackend:
+    # Default backend: counters inside this process (single worker only)
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, scopes):
+        with self._lock:
+            return [self._versions.get(scope, 0) for scope in scopes]
+
+    def bump(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+
+class RedisVersionBackend:
+    # Shared counters for multi-worker deployments
+
+    def __init__(self, client, prefix="versions"):
+        self.client = client
+        self.prefix = prefix
+        self._epoch = None
+
+    @property
+    def epoch(self):
+        if self._epoch is None:
+            key = f"{self.prefix}:epoch"
+            self.client.set(key, uuid.uuid4().hex[:8], nx=True)
+            epoch = self.client.get(key)
+            self._epoch = epoch.decode() if isinstance(epoch, bytes) else epoch
+        return self._epoch
+
+    def get(self, scopes):
+        values = self.client.mget([f"{self.prefix}:{scope}" for scope in scopes])
+        return [int(v) if v is not None else 0 for v in values]
+
+    def bump(self, scopes):
+        pipe = self.client.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(f"{self.prefix}:{scope}")
+        pipe.execute()
+
+
+class ResourceVersions:
+
+    def __init__(self):
+        self.backend = MemoryVersionBackend()
+        self.counters = {"not_modified": 0, "full": 0}
+
+    def init_app(self, app):
+        # Same backend choice as the live lecture state
+        if app.config.get("LIVE_STATE_BACKEND", "memory") == "redis":
+            import redis
+            client = redis.Redis.from_url(app.config["LIVE_STATE_REDIS_URL"])
+            self.backend = RedisVersionBackend(client)
+        else:
+            self.backend = MemoryVersionBackend()
+        app.extensions["resource_versions"] = self
+
+    def bump(self, *scopes):
+        if scopes:
+            self.backend.bump(scopes)
+
+    def group_scopes(self, group_id):
+        # The group itself + the group list of each of its students.
+        # Collect them before deleting a group (members go with it).
+        members = db.session.query(GroupMember.student_id).filter(GroupMember.group_id == group_id).all()
+        return [f"group:{group_id}"] + [f"student:{sid}" for (sid,) in members]
+
+    def etag(self, scopes, identity):
+        # Depends on the counters, the endpoint and who is asking
+        versions = self.backend.get(scopes)
+        raw = f"{self.backend.epoch}|{request.path}|{identity}|{versions}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def stats(self):
+        return dict(self.counters)
+
+
+resource_versions = ResourceVersions()
+
+
+def conditional_get(*scope_templates):
+    # Use below @jwt_required(). Templates are formatted with the view
+    # arguments plus {identity}, e.g. "group:{group_id}", "student:{identity}".
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            identity = get_jwt_identity()
+            scopes = [t.format(identity=identity, **kwargs) for t in scope_templates]
+            etag = resource_versions.etag(scopes, f"{get_jwt().get('role')}:{identity}")
+
+            if etag in request.if_none_match:
+                resource_versions.counters["not_modified"] += 1
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                resource_versions.counters["full"] += 1
+
+            response.set_etag(etag)
+            # Browsers revalidate on every poll and turn the 304 back into the cached body
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+from datetime import timezone
+
+from sqlalchemy import SmallInteger, func, select, type_coerce
+
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.emotion_rollup import EmotionRollup
+from services.capture_rate import capture_rate
+
+# Per (lecture, student, emotion) rollup of emotion_logs:
+# log_count, covered_seconds, first_seen, last_seen. Kept up to date by the
+# emotion log buffer on every flush, so end_lecture reads O(students) rows
+# instead of every frame of the lecture.
+
+
+def _upsert(conn, rows):
+    table = EmotionRollup.__table__
+    dialect = conn.dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            log_count=table.c.log_count + stmt.inserted.log_count,
+            covered_seconds=table.c.covered_seconds + stmt.inserted.covered_seconds,
+            first_seen=func.least(table.c.first_seen, stmt.inserted.first_seen),
+            last_seen=func.greatest(table.c.last_seen, stmt.inserted.last_seen),
+        )
+    else:
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            least, greatest = func.min, func.max  # 2-argument scalar min/max
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+            least, greatest = func.least, func.greatest
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["lecture_id", "student_id", "emotion"],
+            set_={
+                "log_count": table.c.log_count + stmt.excluded.log_count,
+                "covered_seconds": table.c.covered_seconds + stmt.excluded.covered_seconds,
+                "first_seen": least(table.c.first_seen, stmt.excluded.first_seen),
+                "last_seen": greatest(table.c.last_seen, stmt.excluded.last_seen),
+            },
+        )
+    conn.execute(stmt)
+
+
+def _fold(deltas, lecture_id, student_id, emotion, timestamp, covered_seconds):
+    key = (lecture_id, int(student_id), int(emotion))
+    delta = deltas.get(key)
+    if delta is None:
+        deltas[key] = {"lecture_id": key[0], "student_id": key[1], "emotion": key[2],
+                       "log_count": 1, "covered_seconds": covered_seconds,
+                       "first_seen": timestamp, "last_seen": timestamp}
+    else:
+        delta["log_count"] += 1
+        delta["covered_seconds"] += covered_seconds
+        delta["first_seen"] = min(delta["first_seen"], timestamp)
+        delta["last_seen"] = max(delta["last_seen"], timestamp)
+
+
+def apply_log_rows(conn, log_rows):
+    # Fold a batch of freshly inserted emotion log rows (with the
+    # covered_seconds computed at ingest) into the rollup, inside the same
+    # transaction as the log INSERT.
+    deltas = {}
+    for row in log_rows:
+        _fold(deltas, row["lecture_id"], row["student_id"], row["emotion"],
+              row["timestamp"], row["covered_seconds"])
+
+    if deltas:
+        _upsert(conn, list(deltas.values()))
+
+
+def get_emotion_counts(lecture_id):
+    # [(student_id, emotion code, count, covered seconds)] for one lecture
+    return db.session.query(EmotionRollup.student_id,
+                            type_coerce(EmotionRollup.emotion, SmallInteger),
+                            EmotionRollup.log_count,
+                            EmotionRollup.covered_seconds)\
+        .filter(EmotionRollup.lecture_id == lecture_id).all()
+
+
+def rebuild_lecture_rollup(conn, lecture_id):
+    # Recompute one lecture's rollup from its raw emotion logs.
+    # The coverage of each frame depends on the student's previous frame, so
+    # the logs are streamed in (student, time) order instead of a GROUP BY.
+    table = EmotionRollup.__table__
+    conn.execute(table.delete().where(table.c.lecture_id == lecture_id))
+
+    logs = select(EmotionLog.student_id, type_coerce(EmotionLog.emotion, SmallInteger), EmotionLog.timestamp)\
+        .where(EmotionLog.lecture_id == lecture_id)\
+        .order_by(EmotionLog.student_id, EmotionLog.timestamp)
+
+    deltas = {}
+    previous_student, previous_ts = None, None
+    for student_id, code, ts in conn.execution_options(yield_per=10000).execute(logs):
+        epoch = ts.replace(tzinfo=timezone.utc).timestamp()
+        if student_id != previous_student:
+            previous_student, previous_ts = student_id, None
+        _fold(deltas, lecture_id, student_id, code, ts, capture_rate.credit(previous_ts, epoch))
+        previous_ts = epoch
+
+    rows = list(deltas.values())
+    for i in range(0, len(rows), 1000):
+        _upsert(conn, rows[i:i + 1000])
@@ -0,0 +1,208 @@
+import csv
+import io
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.group_member import GroupMember
+from models.user import User
+from services.passwords import UNUSABLE_PASSWORD
+from services.face_index import face_index
+from services.resource_versions import resource_versions
+
+# Bulk roster import: a faculty uploads a CSV / JSON list of students and
+# they are created (if needed) and enrolled in one of the faculty's groups.
+# Rows are handled in chunks of ROSTER_IMPORT_CHUNK, each with a handful of
+# set-based statements instead of signup + join per student:
+#   SELECT users by email  -> INSERT missing users  -> SELECT their ids
+#   -> INSERT the memberships not already in the group  -> COMMIT
+# The group's current members are read once, up front. import_roster()
+# yields one result per row (plus a final summary) as each chunk commits, so
+# the route can stream the report while later chunks are still running.
+#
+# Students created here get UNUSABLE_PASSWORD: they can't log in until they
+# sign up with the same email and the claim_token of their report row, which
+# claims the account (see auth_route). Only the faculty who imported them
+# sees the token, so nobody else can take over an imported email address.
+
+FIELDS = ("name", "email", "roll_no", "collage")
+
+
+class RosterError(ValueError):
+    pass
+
+
+def _claim_serializer():
+    return URLSafeTimedSerializer(current_app.config["JWT_SECRET_KEY"], salt="roster-claim")
+
+
+def claim_token(user_id, email):
+    return _claim_serializer().dumps([user_id, email.lower()])
+
+
+def claimed_user_id(token, email):
+    # The user id a claim token was issued for, if it is genuine, not expired
+    # and for this email; None otherwise
+    if not token or not email:
+        return None
+    max_age = current_app.config.get("ROSTER_CLAIM_TOKEN_DAYS", 30) * 86400
+    try:
+        user_id, token_email = _claim_serializer().loads(token, max_age=max_age)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return user_id if token_email == email.lower() else None
+
+
+def parse_csv(text):
+    # Header row with at least an "email" column (any order, any case);
+    # unknown columns are ignored
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if not reader.fieldnames or "email" not in [f.strip().lower() for f in reader.fieldnames if f]:
+        raise RosterError("CSV needs a header row with an 'email' column")
+    return [{k.strip().lower(): v for k, v in row.items() if k} for row in reader]
+
+
+def parse_request(req):
+    # CSV as a multipart "file", a text/csv body, or JSON: a list of
+    # objects or {"students": [...]}
+    if "file" in req.files:
+        try:
+            return parse_csv(req.files["file"].read().decode("utf-8"))
+        except UnicodeDecodeError:
+            raise RosterError("CSV must be UTF-8")
+    if req.mimetype in ("text/csv", "text/plain"):
+        return parse_csv(req.get_data(as_text=True))
+
+    data = req.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("students")
+    if not isinstance(data, list):
+        raise RosterError("Send a CSV file or a JSON list of students")
+    return data
+
+
+def _clean(raw):
+    # -> (row dict, None) or (None, error message)
+    if not isinstance(raw, dict):
+        return None, "Row must be an object"
+    row = {f: str(raw[f]).strip() if raw.get(f) is not None else "" for f in FIELDS}
+    # Stored and looked up lowercased (like signup and login do); the
+    # spelling as typed is looked up too, for older accounts on a case
+    # sensitive database that `flask lowercase-emails` hasn't normalized yet
+    row["typed_email"] = row["email"]
+    row["email"] = row["email"].lower()
+    if "@" not in row["email"] or len(row["email"]) > 255:
+        return None, "Invalid email"
+    return row, None
+
+
+def _import_chunk(group_id, rows, members):
+    # rows: [(report, row)] with distinct emails. Fills in the reports and
+    # returns the ids of the newly enrolled students.
+    by_email = {row["email"]: (report, row) for report, row in rows}
+    found = db.session.query(User.user_id, User.email, User.role,
+                             (User.password == UNUSABLE_PASSWORD).label("unclaimed"))\
+        .filter(User.email.in_(list(by_email) + [row["typed_email"] for _, row in rows])).all()
+    existing = {}
+    for user in found:
+        if user.email.lower() in by_email:
+            existing[user.email.lower()] = user
+
+    now = datetime.utcnow()
+    new_users = []
+    for key, (report, row) in by_email.items():
+        user = existing.get(key)
+        if user is None:
+            if not row["name"]:
+                report.update(status="error", error="Name is required for new students")
+                continue
+            new_users.append({
+                "name": row["name"][:100], "email": row["email"], "password": UNUSABLE_PASSWORD,
+                "role": "student", "roll_no": row["roll_no"][:50] or None,
+                "collage": row["collage"][:100] or None, "created_at": now,
+            })
+        elif user.role != "student":
+            report.update(status="error", error="Email belongs to a non-student account")
+        else:
+            report["user_id"] = user.user_id
+            if user.unclaimed:
+                report["claim_token"] = claim_token(user.user_id, user.email)
+
+    if new_users:
+        db.session.execute(User.__table__.insert(), new_users)
+        created = db.session.query(User.user_id, User.email)\
+            .filter(User.email.in_([u["email"] for u in new_users])).all()
+        for user in created:
+            report = by_email[user.email][0]
+            report.update(user_id=user.user_id, status="created",
+                          claim_token=claim_token(user.user_id, user.email))
+
+    enrolled = []
+    for report, _ in rows:
+        if "user_id" not in report:
+            continue
+        if report["user_id"] in members:
+            report["status"] = "already_member"
+        else:
+            report.setdefault("status", "enrolled")
+            enrolled.append(report["user_id"])
+    if enrolled:
+        db.session.execute(GroupMember.__table__.insert(),
+                           [{"group_id": group_id, "student_id": sid} for sid in enrolled])
+    db.session.commit()
+    return enrolled
+
+
+def import_roster(group_id, rows, chunk_size=1000):
+    # Generator of per-row reports {"row", "email", "status", "user_id"/"error"}
+    # (status: created, enrolled, already_member, error), then {"summary": ...}
+    members = {sid for (sid,) in db.session.query(GroupMember.student_id).filter(GroupMember.group_id == group_id)}
+    seen = set()
+    summary = {"created": 0, "enrolled": 0, "already_member": 0, "error": 0}
+
+    for start in range(0, len(rows), chunk_size):
+        reports, valid = [], []
+        for number, raw in enumerate(rows[start:start + chunk_size], start + 1):
+            row, error = _clean(raw)
+            report = {"row": number, "email": row["email"] if row else None}
+            if error is None and row["email"] in seen:
+                error = "Duplicate email in roster"
+            if error:
+                report.update(status="error", error=error)
+            else:
+                seen.add(row["email"])
+                valid.append((report, row))
+            reports.append(report)
+
+        if valid:
+            for attempt in range(2):
+                try:
+                    enrolled = _import_chunk(group_id, valid, members)
+                    break
+                except IntegrityError:
+                    # Someone signed up with one of these emails in the
+                    # meantime: the second pass finds them as existing users
+                    db.session.rollback()
+                    for report, _ in valid:
+                        for key in ("user_id", "status", "error", "claim_token"):
+                            report.pop(key, None)
+            else:
+                enrolled = []
+                for report, _ in valid:
+                    report.update(status="error", error="Conflicting concurrent change, retry the row")
+            members.update(enrolled)
+            resource_versions.bump(*(f"student:{sid}" for sid in enrolled))
+            if enrolled:
+                face_index.invalidate_groups([group_id])
+
+        for report in reports:
+            if "status" not in report:
+                # Every row gets an outcome (and a summary count)
+                report.update(status="error", error=report.get("error") or "Row could not be imported")
+            summary[report["status"]] += 1
+            yield report
+
+    yield {"summary": dict(summary, rows=len(rows))}
@@ -0,0 +1,42 @@
+from flask import request
+
+# Reading frame uploads (student frames, face enrollment, room camera) with a
+# size limit. The views reject a too large Content-Length up front; chunked
+# uploads don't send one, so the body itself is read with the same limit.
+# FrameTooLarge is answered with 413 by the handler in app.py.
+
+# Room for the multipart boundaries and part headers around the frame
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class FrameTooLarge(Exception):
+    pass
+
+
+def read_body(limit):
+    # The raw body (Content-Type: image/jpeg), at most limit bytes. Returned
+    # as the bytearray it was read into (np.frombuffer / cv2.imdecode and
+    # pickling to the workers take it as is), not copied into bytes
+    data = bytearray()
+    while len(data) <= limit:
+        chunk = request.stream.read(limit + 1 - len(data))
+        if not chunk:
+            break
+        data += chunk
+    if len(data) > limit:
+        raise FrameTooLarge()
+    return data
+
+
+def files(limit):
+    # The multipart/form-data parts, parsed from a bounded body
+    request.max_content_length = limit + MULTIPART_OVERHEAD
+    return request.files
+
+
+def read_part(upload, limit):
+    # One file part (b'' if it is missing), at most limit bytes
+    data = upload.stream.read(limit + 1) if upload else b''
+    if len(data) > limit:
+        raise FrameTooLarge()
+    return data
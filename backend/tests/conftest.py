@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# The backend modules import each other from backend/ (like app.py does)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.group import Group  # noqa: E402
+from models.group_member import GroupMember  # noqa: E402
+from models.lecture import Lecture  # noqa: E402
+from models.user import User  # noqa: E402
+from services.emotion_log_buffer import emotion_log_buffer  # noqa: E402
+from services.inference_engine import inference_engine  # noqa: E402
+
+# The app on a throwaway SQLite database with the stub inference backend
+# run in-process. Tests pass their own settings with
+#   @pytest.mark.config(EMOTION_LOG_FLUSH_ROWS=10)
+APP_CONFIG = {
+    "PRELOAD_MODELS": False,
+    "INFERENCE_BACKEND": "stub",
+    "INFERENCE_WORKERS": 0,
+    "INFERENCE_BATCH_WAIT_MS": 0,
+}
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "config(**settings): app config overrides for the app fixture")
+
+
+@pytest.fixture
+def app(request, tmp_path):
+    marker = request.node.get_closest_marker("config")
+    overrides = dict(APP_CONFIG, SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+                     EMOTION_LOG_ARCHIVE_DIR=str(tmp_path / "archive"), **(marker.kwargs if marker else {}))
+    with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+        app = create_app(overrides)
+    yield app
+    inference_engine.shutdown()
+    # Nothing buffered may reach the next test's database
+    with emotion_log_buffer._lock:
+        emotion_log_buffer._rows.clear()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth(app, user_id, role):
+    with app.app_context():
+        token = create_access_token(identity=str(user_id), additional_claims={"role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def classroom(app):
+    # Faculty 1 teaches group 1 (students 2 and 3) with live lecture 1;
+    # faculty 4 teaches group 2 (student 3) with scheduled lecture 2
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"user_id": 1, "name": "Faculty", "email": "faculty@test", "password": "x", "role": "faculty"},
+            {"user_id": 2, "name": "Student 2", "email": "s2@test", "password": "x", "role": "student"},
+            {"user_id": 3, "name": "Student 3", "email": "s3@test", "password": "x", "role": "student"},
+            {"user_id": 4, "name": "Other faculty", "email": "other@test", "password": "x", "role": "faculty"},
+        ])
+        db.session.execute(Group.__table__.insert(), [
+            {"id": 1, "name": "Group 1", "faculty_id": 1, "join_code": "GROUP1"},
+            {"id": 2, "name": "Group 2", "faculty_id": 4, "join_code": "GROUP2"},
+        ])
+        db.session.execute(GroupMember.__table__.insert(), [
+            {"group_id": 1, "student_id": 2}, {"group_id": 1, "student_id": 3}, {"group_id": 2, "student_id": 3},
+        ])
+        db.session.execute(Lecture.__table__.insert(), [
+            {"id": 1, "group_id": 1, "topic": "Live", "status": "live",
+             "scheduled_start": now, "scheduled_end": now, "actual_start": now},
+            {"id": 2, "group_id": 2, "topic": "Scheduled", "status": "scheduled",
+             "scheduled_start": now, "scheduled_end": now, "actual_start": None},
+        ])
+        db.session.commit()
+    return {
+        "faculty": auth(app, 1, "faculty"),
+        "student": auth(app, 2, "student"),
+        "student3": auth(app, 3, "student"),
+        "other_faculty": auth(app, 4, "faculty"),
+    }
+
+
+def jpeg(value=100, size=(60, 80)):
+    # A flat gray frame; different values give different stub emotions
+    import cv2
+    import numpy as np
+    return cv2.imencode(".jpg", np.full(size + (3,), value, np.uint8))[1].tobytes()
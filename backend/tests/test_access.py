@@ -0,0 +1,108 @@
+import pytest
+
+from conftest import jpeg
+from extensions import db
+from models.group import Group
+from models.lecture import Lecture
+from services.access import AccessCache, access_cache
+from services.resource_versions import resource_versions
+
+# Group 1 / lecture 1 belong to faculty 1, group 2 / lecture 2 to faculty 4
+
+OTHER_GROUP_ROUTES = [
+    ("get", "/api/faculty/groups/2/students"),
+    ("delete", "/api/faculty/groups/2/remove_student/3"),
+    ("delete", "/api/faculty/groups/2"),
+    ("get", "/api/faculty/lectures/group/2"),
+    ("get", "/api/faculty/lectures/group/2/current"),
+]
+OTHER_LECTURE_ROUTES = [
+    ("post", "/api/faculty/lectures/2/start"),
+    ("post", "/api/faculty/lectures/2/end"),
+    ("get", "/api/faculty/lectures/2/live_status"),
+]
+
+
+@pytest.mark.parametrize("method,url", OTHER_GROUP_ROUTES)
+def test_another_faculty_group_is_not_found(client, classroom, method, url):
+    res = getattr(client, method)(url, headers=classroom["faculty"])
+    assert res.status_code == 404
+
+
+@pytest.mark.parametrize("method,url", OTHER_LECTURE_ROUTES)
+def test_another_faculty_lecture_is_forbidden(client, classroom, method, url):
+    res = getattr(client, method)(url, headers=classroom["faculty"])
+    assert res.status_code == 403
+
+
+def test_unknown_lecture_is_not_found(client, classroom):
+    assert client.get("/api/faculty/lectures/99/live_status", headers=classroom["faculty"]).status_code == 404
+
+
+def test_lecture_in_another_faculty_group_cannot_be_scheduled(app, client, classroom):
+    res = client.post("/api/faculty/lectures/create", headers=classroom["faculty"],
+                      json={"group_id": 2, "topic": "Not mine", "scheduled_start": "2030-01-01 10:00:00",
+                            "scheduled_end": "2030-01-01 11:00:00"})
+
+    assert res.status_code == 404
+    with app.app_context():
+        assert db.session.query(Lecture).filter_by(topic="Not mine").count() == 0
+
+
+def test_students_and_faculty_stay_in_their_routes(client, classroom):
+    assert client.get("/api/faculty/groups/1/students", headers=classroom["student"]).status_code == 403
+    assert client.get("/api/student/groups/", headers=classroom["faculty"]).status_code == 403
+
+
+def test_owner_is_served_from_the_cache(app, classroom):
+    cache = AccessCache()
+    with app.app_context():
+        assert cache.owns_group(1, 1)
+        assert cache.owns_group(1, 1)
+        assert not cache.owns_group(4, 1)
+    assert cache.counters == {"hits": 2, "misses": 1}
+
+
+def test_ownership_change_is_seen_after_the_version_bump(app, classroom):
+    cache = AccessCache()
+    with app.app_context():
+        assert cache.owns_group(1, 1)
+        db.session.query(Group).filter_by(id=1).update({"faculty_id": 4})
+        db.session.commit()
+        # Cached until whoever changed it bumps the group's version
+        assert cache.owns_group(1, 1)
+
+        resource_versions.bump("group:1")
+
+        assert not cache.owns_group(1, 1)
+        assert cache.owns_group(4, 1)
+
+
+def test_deleted_group_is_no_longer_owned(client, classroom):
+    assert client.get("/api/faculty/groups/1/students", headers=classroom["faculty"]).status_code == 200
+    assert client.delete("/api/faculty/groups/1", headers=classroom["faculty"]).status_code == 200
+    assert client.get("/api/faculty/groups/1/students", headers=classroom["faculty"]).status_code == 404
+
+
+def test_lecture_status_is_refreshed_when_it_ends(app, client, classroom):
+    headers = dict(classroom["student"], **{"Content-Type": "image/jpeg"})
+    with app.app_context():
+        assert access_cache.lecture(1).status == "live"
+    assert client.post("/api/student/lectures/1/log_emotion_frame", data=jpeg(), headers=headers).status_code == 201
+
+    assert client.post("/api/faculty/lectures/1/end", headers=classroom["faculty"]).status_code == 200
+
+    with app.app_context():
+        assert access_cache.lecture(1).status == "completed"
+    assert client.post("/api/student/lectures/1/log_emotion_frame", data=jpeg(90), headers=headers).status_code == 400
+
+
+def test_least_recently_used_entries_are_dropped(app, classroom):
+    cache = AccessCache()
+    cache.max_entries = 1
+    with app.app_context():
+        cache.owns_group(1, 1)
+        cache.owns_group(4, 2)
+        assert list(cache._groups) == [2]
+        cache.owns_group(1, 1)
+    assert cache.counters["misses"] == 3
@@ -0,0 +1,146 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from emotions import Emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.lecture import Lecture
+from models.lecture_attendance import LectureAttendance
+from services.emotion_log_buffer import EmotionLogBuffer, emotion_log_buffer
+
+
+@pytest.fixture
+def make_buffer(app, classroom):
+    # A buffer of its own per test (own flusher thread and settings)
+    def factory(**config):
+        app.config.update(config)
+        buffer = EmotionLogBuffer()
+        buffer.init_app(app)
+        return buffer
+    return factory
+
+
+def logged(app, lecture_id=1):
+    with app.app_context():
+        return db.session.query(EmotionLog.student_id, EmotionLog.timestamp)\
+            .filter(EmotionLog.lecture_id == lecture_id).order_by(EmotionLog.id).all()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def end(app, lecture_id, actual_end):
+    with app.app_context():
+        lecture = db.session.get(Lecture, lecture_id)
+        lecture.status, lecture.actual_end = "completed", actual_end
+        db.session.commit()
+
+
+def test_flushes_once_max_rows_are_buffered(app, make_buffer):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=5, EMOTION_LOG_FLUSH_MS=60000)
+    for _ in range(4):
+        buffer.add(1, 2, Emotion.FOCUSED)
+    time.sleep(0.2)
+    assert logged(app) == []
+
+    buffer.add(1, 3, Emotion.BORED)
+
+    assert wait_for(lambda: len(logged(app)) == 5)
+    assert buffer.stats()["depth"] == 0
+
+
+def test_flushes_after_the_interval(app, make_buffer):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=50)
+    buffer.add_many([(1, 2, Emotion.FOCUSED, None, None), (1, 3, Emotion.HAPPY, None, None)])
+
+    assert wait_for(lambda: len(logged(app)) == 2)
+    assert buffer.stats()["rows_flushed"] == 2
+
+
+def test_failed_write_is_requeued_in_front(app, make_buffer, monkeypatch):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=60000)
+    start = datetime.utcnow()
+    buffer.add(1, 2, Emotion.FOCUSED, start)
+    buffer.add(1, 3, Emotion.FOCUSED, start + timedelta(seconds=1))
+
+    def unavailable(rows, finalizing=None):
+        raise RuntimeError("database is down")
+    monkeypatch.setattr(buffer, "_write", unavailable)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    # Rows buffered in the meantime go behind the failed ones
+    buffer.add(1, 2, Emotion.BORED, start + timedelta(seconds=2))
+    assert buffer.stats()["flush_failures"] == 1
+    assert buffer.stats()["depth"] == 3
+
+    monkeypatch.undo()
+    assert buffer.flush() == 3
+    assert [sid for sid, _ in logged(app)] == [2, 3, 2]
+
+
+def test_requeue_drops_the_oldest_rows_past_max_pending(app, make_buffer, monkeypatch):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=60000, EMOTION_LOG_BUFFER_MAX=2)
+    start = datetime.utcnow()
+    for i in range(3):
+        buffer.add(1, 2, Emotion.FOCUSED, start + timedelta(seconds=i))
+    monkeypatch.setattr(buffer, "_write", lambda rows, finalizing=None: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        buffer.flush()
+    monkeypatch.undo()
+
+    assert buffer.stats()["rows_dropped"] == 1
+    buffer.flush()
+    assert [ts for _, ts in logged(app)] == [start + timedelta(seconds=1), start + timedelta(seconds=2)]
+
+
+def test_rows_after_actual_end_are_dropped_and_the_lecture_refinalized(app, make_buffer):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=60000)
+    ended_at = datetime.utcnow()
+    end(app, 1, ended_at)
+
+    buffer.add(1, 2, Emotion.FOCUSED, ended_at - timedelta(seconds=10))
+    buffer.add(1, 3, Emotion.FOCUSED, ended_at + timedelta(seconds=5))
+    assert buffer.flush() == 1
+
+    assert [sid for sid, _ in logged(app)] == [2]
+    stats = buffer.stats()
+    assert stats["rows_after_end_dropped"] == 1
+    assert stats["lectures_refinalized"] == 1
+    with app.app_context():
+        attendance = dict(db.session.query(LectureAttendance.student_id, LectureAttendance.total_minutes_detected)
+                          .filter(LectureAttendance.lecture_id == 1))
+    assert attendance[2] > 0 and attendance[3] == 0
+
+
+def test_flush_leaves_the_finalizing_lecture_to_the_caller(app, make_buffer):
+    buffer = make_buffer(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=60000)
+    ended_at = datetime.utcnow()
+    end(app, 1, ended_at)
+    buffer.add(1, 2, Emotion.FOCUSED, ended_at - timedelta(seconds=1))
+
+    assert buffer.flush(finalizing=1) == 1
+    assert buffer.stats()["lectures_refinalized"] == 0
+
+
+@pytest.mark.config(EMOTION_LOG_FLUSH_ROWS=1000, EMOTION_LOG_FLUSH_MS=60000)
+def test_end_lecture_flushes_before_computing_attendance(app, client, classroom):
+    start = datetime.utcnow() - timedelta(seconds=30)
+    for i in range(4):
+        emotion_log_buffer.add(1, 2, Emotion.HAPPY, start + timedelta(seconds=5 * i), 5.0)
+
+    res = client.post("/api/faculty/lectures/1/end", headers=classroom["faculty"])
+
+    assert res.status_code == 200
+    assert emotion_log_buffer.stats()["depth"] == 0
+    with app.app_context():
+        row = db.session.query(LectureAttendance).filter_by(lecture_id=1, student_id=2).one()
+        assert row.total_minutes_detected == pytest.approx(20 / 60, abs=0.01)
+        assert row.dominant_mood == Emotion.HAPPY.label
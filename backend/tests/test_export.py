@@ -0,0 +1,112 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from emotions import Emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.lecture import Lecture
+from services import export
+from services.archive import archive_lecture
+
+EXPORT = "/api/faculty/lectures/1/export"
+START = datetime(2030, 1, 7, 9, 0, 0, 250000)
+
+
+# ---------------- request parsing ----------------
+
+@pytest.mark.parametrize("query", [
+    {"format": "xml"}, {"data": "grades"},
+])
+def test_bad_format_is_rejected(query):
+    with pytest.raises(export.ExportError):
+        export.parse_format(MultiDict(query))
+
+
+@pytest.mark.parametrize("query", [
+    {"from": "last monday"}, {"to": "2030-13-01"},
+    {"from": "2030-01-02", "to": "2030-01-01"},
+    {"student_id": "2,x"}, {"emotion": "Sleepy"},
+])
+def test_bad_filters_are_rejected(query):
+    with pytest.raises(export.ExportError):
+        export.parse_filters(MultiDict(query))
+
+
+def test_filters_are_parsed():
+    filters = export.parse_filters(MultiDict([("student_id", "2,3"), ("student_id", "4"), ("emotion", "bored,Happy"),
+                                              ("from", "2030-01-07"), ("to", "2030-01-08T00:00:00Z")]))
+    assert filters == export.ExportFilters({2, 3, 4}, datetime(2030, 1, 7), datetime(2030, 1, 8),
+                                           {Emotion.BORED, Emotion.HAPPY})
+    assert export.parse_format(MultiDict()) == ("timeline", "csv")
+
+
+@pytest.mark.parametrize("query", [
+    "format=xml", "data=grades", "from=yesterday", "to=2030-01-01T25:00", "from=2030-01-02&to=2030-01-01",
+])
+def test_export_route_answers_400(client, classroom, query):
+    res = client.get(f"{EXPORT}?{query}", headers=classroom["faculty"])
+    assert res.status_code == 400
+    assert res.get_json()["error"]
+
+
+@pytest.mark.skipif(export.parquet_available(), reason="pyarrow is installed")
+def test_parquet_without_pyarrow_answers_501(client, classroom):
+    assert client.get(f"{EXPORT}?format=parquet", headers=classroom["faculty"]).status_code == 501
+
+
+# ---------------- timeline from the archive + emotion_logs ----------------
+
+def log(rows):
+    db.session.execute(EmotionLog.__table__.insert(), [
+        {"lecture_id": 1, "student_id": sid, "timestamp": START + timedelta(seconds=s), "emotion": int(e)}
+        for sid, s, e in rows
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def archived_lecture(app, classroom):
+    # Lecture 1, completed and archived, then more rows logged for it (late
+    # flushes) plus one row left over from an archive run that stopped
+    # before its DELETE
+    with app.app_context():
+        lecture = db.session.get(Lecture, 1)
+        lecture.status, lecture.actual_end = "completed", START + timedelta(minutes=5)
+        db.session.commit()
+        log([(2, 0, Emotion.FOCUSED), (2, 10, Emotion.BORED), (3, 5, Emotion.HAPPY), (3, 20, Emotion.HAPPY)])
+        assert archive_lecture(1, app.config["EMOTION_LOG_ARCHIVE_DIR"]) == 4
+        log([(3, 12, Emotion.CONFUSED), (2, 30, Emotion.FOCUSED), (2, 5, Emotion.CONFUSED),
+             (3, 20, Emotion.HAPPY)])
+
+
+def exported(client, headers, query=""):
+    res = client.get(f"{EXPORT}?{query}", headers=headers)
+    assert res.status_code == 200, res.get_json()
+    return [(int(r["student_id"]), r["timestamp"], r["emotion"]) for r in csv.DictReader(io.StringIO(res.text))]
+
+
+def at(seconds):
+    return str(START + timedelta(seconds=seconds))
+
+
+@pytest.mark.config(EXPORT_CHUNK_ROWS=2)
+def test_timeline_merges_archive_and_live_rows(client, classroom, archived_lecture):
+    assert exported(client, classroom["faculty"]) == [
+        (2, at(0), "Focused"), (2, at(5), "Confused"), (2, at(10), "Bored"), (2, at(30), "Focused"),
+        (3, at(5), "Happy"), (3, at(12), "Confused"), (3, at(20), "Happy"),
+    ]
+
+
+def test_timeline_filters_apply_to_both_sources(client, classroom, archived_lecture):
+    rows = exported(client, classroom["faculty"], f"student_id=3&emotion=Happy,Confused&from={at(10)}")
+    assert rows == [(3, at(12), "Confused"), (3, at(20), "Happy")]
+
+
+def test_lecture_without_archive_streams_emotion_logs(app, client, classroom):
+    with app.app_context():
+        log([(3, 1, Emotion.BORED), (2, 2, Emotion.HAPPY)])
+    assert exported(client, classroom["faculty"]) == [(2, at(2), "Happy"), (3, at(1), "Bored")]
@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from flask import Flask
+
+from conftest import jpeg
+from services import inference_engine as engine_module
+from services.inference_engine import InferenceEngine, InferenceQueueFull, _WorkerSlot, _collect_batch, _run_batch
+
+
+def make_engine(**config):
+    app = Flask(__name__)
+    app.config.update(dict(INFERENCE_BACKEND="stub", INFERENCE_WORKERS=0, INFERENCE_BATCH_WAIT_MS=0), **config)
+    engine = InferenceEngine()
+    engine.init_app(app)
+    return engine
+
+
+@pytest.fixture
+def engines():
+    started = []
+
+    def factory(**config):
+        engine = make_engine(**config)
+        started.append(engine)
+        return engine
+    yield factory
+    for engine in started:
+        engine.shutdown()
+
+
+@pytest.fixture
+def blocked(monkeypatch):
+    # The inline thread holds every batch until release.set()
+    release = threading.Event()
+    analyze = engine_module._analyze
+
+    def slow_analyze(batch):
+        release.wait(10)
+        return analyze(batch)
+    monkeypatch.setattr(engine_module, "_analyze", slow_analyze)
+    yield release
+    release.set()
+
+
+# ---------------- micro-batching ----------------
+
+def queued(*jobs):
+    q = queue.Queue()
+    for job in jobs:
+        q.put(job)
+    return lambda timeout: q.get(timeout=timeout) if timeout is not None else q.get()
+
+
+def test_collect_batch_takes_up_to_batch_size_frames():
+    get_job = queued(1, 2, 3, 4, 5)
+    assert _collect_batch(get_job, 3, 0.05) == ([1, 2, 3], False)
+    assert _collect_batch(get_job, 3, 0.05) == ([4, 5], False)
+
+
+def test_collect_batch_stops_on_none():
+    assert _collect_batch(queued(1, None, 2), 8, 0.05) == ([1], True)
+    assert _collect_batch(queued(None), 8, 0.05) == (None, True)
+
+
+def test_frames_submitted_together_share_a_batch(engines):
+    engine = engines(INFERENCE_BATCH_SIZE=8, INFERENCE_BATCH_WAIT_MS=200)
+    futures = [engine.submit(jpeg(value)) for value in range(40, 100, 10)]
+
+    results = [future.result(timeout=10) for future in futures]
+
+    assert all(result and result["emotion"] for result in results)
+    stats = engine.stats()
+    assert stats["completed"] == 6
+    assert stats["batches"] < 6
+    assert stats["avg_batch_size"] > 1
+
+
+# ---------------- failures ----------------
+
+def test_a_failing_frame_is_retried_alone(monkeypatch):
+    from services import emotion_model
+
+    def analyze_batch(frames, options):
+        if b"bad" in frames:
+            raise ValueError("cannot analyze")
+        return [{"emotion": frame.decode()} for frame in frames]
+    monkeypatch.setattr(emotion_model, "analyze_batch", analyze_batch)
+
+    results, _, retried = _run_batch([(1, b"good", {}), (2, b"bad", {}), (3, b"fine", {})])
+
+    assert retried
+    assert results == [(1, {"emotion": "good"}, None), (2, None, "cannot analyze"), (3, {"emotion": "fine"}, None)]
+
+
+def test_unreadable_frame_resolves_to_none(engines):
+    engine = engines()
+    assert engine.submit(b"not an image").result(timeout=10) is None
+    assert engine.submit(jpeg()).result(timeout=10)["emotion"]
+
+
+def test_full_queue_rejects_frames(engines, blocked):
+    engine = engines(INFERENCE_QUEUE_SIZE=2)
+    first, second = engine.submit(jpeg(50)), engine.submit(jpeg(60))
+
+    with pytest.raises(InferenceQueueFull):
+        engine.submit(jpeg(70))
+    assert engine.stats()["rejected_queue_full"] == 1
+
+    blocked.set()
+    assert first.result(timeout=10) and second.result(timeout=10)
+    assert engine.submit(jpeg(70)).result(timeout=10)
+
+
+@pytest.mark.config(INFERENCE_QUEUE_SIZE=0)
+def test_full_queue_answers_503(client, classroom):
+    res = client.post("/api/student/lectures/1/log_emotion_frame", data=jpeg(),
+                      headers=dict(classroom["student"], **{"Content-Type": "image/jpeg"}))
+
+    assert res.status_code == 503
+    assert res.get_json()["next_capture_ms"] > 0
+
+
+# ---------------- lifecycle ----------------
+
+def test_drain_waits_for_submitted_frames(engines, blocked):
+    engine = engines()
+    future = engine.submit(jpeg())
+
+    assert engine.drain(0.1) == 1
+    blocked.set()
+    assert engine.drain(10) == 0
+    assert future.done()
+
+
+def test_shutdown_stops_the_inference_thread(engines):
+    engine = engines()
+    engine.submit(jpeg()).result(timeout=10)
+    threads = list(engine._threads)
+
+    engine.shutdown()
+
+    assert not engine._started
+    assert not any(t.is_alive() for t in threads)
+
+
+# ---------------- worker supervision ----------------
+
+class FakeProcess:
+    exitcode = -9
+
+    def join(self, timeout=None):
+        pass
+
+
+class FakeConnection:
+    def poll(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeQueue:
+    def cancel_join_thread(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def dead_worker(engine, slot):
+    slot.process, slot.results, slot.jobs = FakeProcess(), FakeConnection(), FakeQueue()
+    engine._worker_exited(slot)
+    return slot.respawn_at - time.monotonic()
+
+
+def test_exited_worker_fails_its_frames_and_backs_off():
+    engine = make_engine()
+    slot = _WorkerSlot(0)
+    engine._slots = [slot]
+    future = Future()
+    engine._pending[1], engine._assigned[1] = future, slot
+    slot.outstanding = 1
+
+    delays = [dead_worker(engine, slot) for _ in range(8)]
+
+    with pytest.raises(RuntimeError, match="exited with code -9"):
+        future.result(timeout=0)
+    assert slot.outstanding == 0
+    assert engine.stats()["worker_restarts"] == 8
+    # 1, 2, 4, ... seconds, capped
+    assert delays[0] == pytest.approx(engine_module.RESPAWN_DELAY, abs=0.1)
+    assert delays[1] == pytest.approx(2 * engine_module.RESPAWN_DELAY, abs=0.1)
+    assert delays[-1] == pytest.approx(engine_module.RESPAWN_MAX_DELAY, abs=0.1)
+
+
+def wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_killed_worker_is_respawned(engines, monkeypatch):
+    monkeypatch.setattr(engine_module, "RESPAWN_DELAY", 0.1)
+    engine = engines(INFERENCE_WORKERS=1)
+    engine.start()
+    assert wait_for(engine.is_ready), engine.stats()
+    assert engine.submit(jpeg()).result(timeout=30)["emotion"]
+
+    pending = engine.submit(jpeg(120))
+    engine._slots[0].process.kill()
+
+    # The frame it held is answered or failed, never left hanging
+    try:
+        pending.result(timeout=30)
+    except RuntimeError:
+        pass
+    assert wait_for(lambda: engine.stats()["worker_restarts"] == 1 and engine.is_ready()), engine.stats()
+    assert engine.stats()["live_workers"] == 1
+    assert engine.submit(jpeg(140)).result(timeout=30)["emotion"]
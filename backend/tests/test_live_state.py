@@ -0,0 +1,75 @@
+import fakeredis
+import pytest
+
+from services.live_state import LiveStateStore, MemoryLiveStateBackend, RedisLiveStateBackend
+
+FOCUSED, CONFUSED, BORED = 1, 2, 3
+NOW = 1_000_000.0
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    store = LiveStateStore()
+    store.window_seconds = 30
+    if request.param == "redis":
+        store.backend = RedisLiveStateBackend(fakeredis.FakeRedis())
+    else:
+        store.backend = MemoryLiveStateBackend()
+    return store
+
+
+def test_record_returns_previous_emotion_and_timestamp(store):
+    assert store.record(1, 10, FOCUSED, NOW) is None
+    assert store.record(1, 10, BORED, NOW + 5) == (FOCUSED, NOW)
+    assert store.record(1, 10, BORED, NOW + 9) == (BORED, NOW + 5)
+
+
+def test_snapshot_counts_the_latest_emotion_of_each_active_student(store):
+    store.record(1, 10, FOCUSED, NOW)
+    store.record(1, 11, FOCUSED, NOW + 1)
+    store.record(1, 12, CONFUSED, NOW + 2)
+    store.record(1, 10, CONFUSED, NOW + 3)
+
+    latest, counts, active = store.snapshot(1, now=NOW + 4)
+
+    assert latest == {10: (CONFUSED, NOW + 3), 11: (FOCUSED, NOW + 1), 12: (CONFUSED, NOW + 2)}
+    assert counts == {FOCUSED: 1, CONFUSED: 2}
+    assert active == {10, 11, 12}
+
+
+def test_students_outside_the_window_age_out(store):
+    store.record(1, 10, FOCUSED, NOW)
+    store.record(1, 11, BORED, NOW + 20)
+
+    latest, counts, active = store.snapshot(1, now=NOW + 31)
+
+    # Still listed with their last emotion, but no longer counted
+    assert set(latest) == {10, 11}
+    assert counts == {BORED: 1}
+    assert active == {11}
+
+    # Back inside the window: counted once again
+    store.record(1, 10, CONFUSED, NOW + 32)
+    _, counts, active = store.snapshot(1, now=NOW + 33)
+    assert counts == {BORED: 1, CONFUSED: 1}
+    assert active == {10, 11}
+
+
+def test_lectures_are_independent_and_clear_drops_one(store):
+    store.record(1, 10, FOCUSED, NOW)
+    store.record(2, 10, BORED, NOW)
+
+    store.clear(1)
+
+    assert store.snapshot(1, now=NOW + 1) == ({}, {}, set())
+    assert store.snapshot(2, now=NOW + 1)[1] == {BORED: 1}
+
+
+def test_snapshot_of_an_unknown_lecture_is_empty(store):
+    assert store.snapshot(99, now=NOW) == ({}, {}, set())
+
+
+def test_memory_snapshot_does_not_create_state():
+    backend = MemoryLiveStateBackend()
+    backend.snapshot(99, NOW)
+    assert backend._lectures == {}
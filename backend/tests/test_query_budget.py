@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.check_query_budget import ENDPOINTS, run
+
+# benchmarks/check_query_budget.py: the dashboard endpoints stay within their
+# statement budgets (cold and warm caches) from one group of 5 students to
+# 20 groups of 200, i.e. no query per group or per student
+
+SIZES = [(1, 5), (20, 200)]
+
+
+@pytest.fixture(scope="module")
+def counts():
+    return {size: run(*size) for size in SIZES}
+
+
+@pytest.mark.parametrize("size", SIZES, ids=[f"{g}g-{s}s" for g, s in SIZES])
+@pytest.mark.parametrize("name,role,url,cold_budget,warm_budget", ENDPOINTS, ids=[e[0] for e in ENDPOINTS])
+def test_statement_budget(counts, size, name, role, url, cold_budget, warm_budget):
+    cold, warm = counts[size][name]
+    assert cold <= cold_budget, f"{url}: {cold} statements cold (budget {cold_budget})"
+    assert warm <= warm_budget, f"{url}: {warm} statements warm (budget {warm_budget})"
@@ -0,0 +1,29 @@
+import contextlib
+import io
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from benchmarks.check_query_plans import CHECKS, explain
+from extensions import db
+
+# benchmarks/check_query_plans.py against a throwaway SQLite database: every
+# hot query has to be served by its index
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    with contextlib.redirect_stdout(io.StringIO()):  # create_app() prints the url map
+        app = create_app({"SQLALCHEMY_DATABASE_URI": url, "PRELOAD_MODELS": False})
+    with app.app_context(), db.engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        yield conn
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize("description,statement,indexes", CHECKS, ids=[check[0] for check in CHECKS])
+def test_query_uses_index(conn, description, statement, indexes):
+    plan = explain(conn, statement)
+    assert any(name in line for line in plan for name in indexes), plan
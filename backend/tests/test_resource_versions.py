@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from services.resource_versions import MemoryVersionBackend, resource_versions
+
+STUDENT_GROUPS = "/api/student/groups/"
+GROUP_LECTURES = "/api/faculty/lectures/group/1"
+CURRENT_LECTURE = "/api/faculty/lectures/group/1/current"
+
+
+def get(client, url, headers, etag=None):
+    if etag:
+        headers = dict(headers, **{"If-None-Match": etag})
+    return client.get(url, headers=headers)
+
+
+@pytest.mark.parametrize("url,role", [
+    (STUDENT_GROUPS, "student"), (GROUP_LECTURES, "faculty"), (CURRENT_LECTURE, "faculty"),
+    ("/api/faculty/groups/", "faculty"),
+])
+def test_matching_etag_gets_304(client, classroom, url, role):
+    first = get(client, url, classroom[role])
+    assert first.status_code == 200 and first.headers.get("ETag")
+
+    again = get(client, url, classroom[role], first.headers["ETag"])
+
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_304_runs_no_query(app, client, classroom):
+    etag = get(client, STUDENT_GROUPS, classroom["student"]).headers["ETag"]
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert get(client, STUDENT_GROUPS, classroom["student"], etag).status_code == 304
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert statements == []
+
+
+def test_etag_depends_on_who_asks(client, classroom):
+    mine = get(client, STUDENT_GROUPS, classroom["student"]).headers["ETag"]
+    other = get(client, STUDENT_GROUPS, classroom["student3"], mine)
+    assert other.status_code == 200
+
+
+def test_join_and_leave_change_the_student_group_list(client, classroom):
+    headers = classroom["student"]
+    etag = get(client, STUDENT_GROUPS, headers).headers["ETag"]
+
+    assert client.post("/api/student/groups/join", json={"join_code": "GROUP2"}, headers=headers).status_code == 200
+    joined = get(client, STUDENT_GROUPS, headers, etag)
+    assert joined.status_code == 200
+    assert {g["id"] for g in joined.get_json()["enrolled_groups"]} == {1, 2}
+    assert joined.headers["ETag"] != etag
+
+    assert client.delete("/api/student/groups/2/leave", headers=headers).status_code == 200
+    left = get(client, STUDENT_GROUPS, headers, joined.headers["ETag"])
+    assert left.status_code == 200
+    assert {g["id"] for g in left.get_json()["enrolled_groups"]} == {1}
+
+
+def test_end_and_start_change_the_group_views(client, classroom):
+    faculty, student = classroom["faculty"], classroom["student"]
+    etags = {url: get(client, url, faculty).headers["ETag"] for url in (GROUP_LECTURES, CURRENT_LECTURE)}
+    student_etag = get(client, STUDENT_GROUPS, student).headers["ETag"]
+
+    assert client.post("/api/faculty/lectures/1/end", headers=faculty).status_code == 200
+
+    for url, etag in etags.items():
+        assert get(client, url, faculty, etag).status_code == 200
+    ended = get(client, STUDENT_GROUPS, student, student_etag)
+    assert ended.status_code == 200
+    assert ended.get_json()["enrolled_groups"][0]["live_lecture_id"] is None
+
+    # Group 2 belongs to faculty 4; its student 3 sees the lecture go live
+    student3_etag = get(client, STUDENT_GROUPS, classroom["student3"]).headers["ETag"]
+    assert client.post("/api/faculty/lectures/2/start", headers=classroom["other_faculty"]).status_code == 200
+    started = get(client, STUDENT_GROUPS, classroom["student3"], student3_etag)
+    assert started.status_code == 200
+    assert {g["id"]: g["live_lecture_id"] for g in started.get_json()["enrolled_groups"]}[2] == 2
+
+
+def test_creating_a_group_changes_the_faculty_group_list(client, classroom):
+    faculty = classroom["faculty"]
+    etag = get(client, "/api/faculty/groups/", faculty).headers["ETag"]
+
+    assert client.post("/api/faculty/groups/create", json={"name": "New"}, headers=faculty).status_code == 201
+
+    assert get(client, "/api/faculty/groups/", faculty, etag).status_code == 200
+
+
+def test_new_epoch_invalidates_old_etags(client, classroom, monkeypatch):
+    etag = get(client, STUDENT_GROUPS, classroom["student"]).headers["ETag"]
+    # e.g. the process restarted with the memory backend
+    monkeypatch.setattr(resource_versions, "backend", MemoryVersionBackend())
+    assert get(client, STUDENT_GROUPS, classroom["student"], etag).status_code == 200
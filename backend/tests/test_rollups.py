@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import SmallInteger, type_coerce
+
+from emotions import Emotion
+from extensions import db
+from models.emotion_log import EmotionLog
+from models.emotion_rollup import EmotionRollup
+from models.lecture import Lecture
+from models.lecture_attendance import LectureAttendance
+from services.capture_rate import CaptureRateController, capture_rate
+from services.emotion_log_buffer import LOG_COLUMNS
+from services.lecture_stats import finalize_lecture_statistics
+from services.rollups import apply_log_rows, rebuild_lecture_rollup
+
+START = 1_800_000_000.0  # epoch seconds
+
+# (student, seconds after START, emotion): a regular capture, a student who
+# left for a minute (gap capped), emotions alternating so several rollup
+# rows per student are touched, and a student with a single frame
+FRAMES = [
+    (2, 0, Emotion.FOCUSED), (2, 5, Emotion.FOCUSED), (2, 10, Emotion.BORED), (2, 16, Emotion.FOCUSED),
+    (2, 76, Emotion.FOCUSED), (2, 81, Emotion.BORED), (2, 90, Emotion.BORED),
+    (3, 3, Emotion.HAPPY), (3, 15, Emotion.HAPPY), (3, 60, Emotion.CONFUSED), (3, 62, Emotion.HAPPY),
+    (4, 40, Emotion.DISTRACTED),
+]
+
+
+# ---------------- capture_rate.credit ----------------
+
+def test_first_frame_covers_one_minimum_interval():
+    rate = CaptureRateController()
+    rate.min_interval_ms = 4000
+    assert rate.credit(None, START) == 4.0
+
+
+def test_frame_covers_the_gap_since_the_previous_one():
+    rate = CaptureRateController()
+    assert rate.credit(START, START + 7.5) == 7.5
+
+
+def test_gap_is_capped():
+    rate = CaptureRateController()
+    rate.max_gap_seconds = 25.0
+    assert rate.credit(START, START + 300) == 25.0
+    assert rate.credit(START, START - 1) == 0.0
+
+
+# ---------------- incremental rollup vs rebuild ----------------
+
+def ingest(frames):
+    # What the frame endpoints + the buffer flush do: credit each frame from
+    # the student's previous one, INSERT the logs, fold them into the rollup
+    previous, rows = {}, []
+    for student_id, offset, emotion in sorted(frames, key=lambda f: f[1]):
+        ts = START + offset
+        rows.append({"lecture_id": 1, "student_id": student_id, "emotion": int(emotion),
+                     "timestamp": datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None),
+                     "covered_seconds": capture_rate.credit(previous.get(student_id), ts)})
+        previous[student_id] = ts
+    return rows
+
+
+def write(rows, chunk):
+    # Several flushes, so the upsert has to merge into existing rows
+    for i in range(0, len(rows), chunk):
+        with db.engine.begin() as conn:
+            part = rows[i:i + chunk]
+            conn.execute(EmotionLog.__table__.insert().values([{k: row[k] for k in LOG_COLUMNS} for row in part]))
+            apply_log_rows(conn, part)
+
+
+def rollup():
+    return {
+        (sid, code): (count, round(seconds, 6), first, last)
+        for sid, code, count, seconds, first, last in db.session.query(
+            EmotionRollup.student_id, type_coerce(EmotionRollup.emotion, SmallInteger), EmotionRollup.log_count,
+            EmotionRollup.covered_seconds, EmotionRollup.first_seen, EmotionRollup.last_seen)
+        .filter(EmotionRollup.lecture_id == 1)
+    }
+
+
+@pytest.mark.parametrize("chunk", [1, 4, len(FRAMES)])
+def test_incremental_rollup_matches_a_rebuild(app, classroom, chunk):
+    with app.app_context():
+        write(ingest(FRAMES), chunk)
+        incremental = rollup()
+        with db.engine.begin() as conn:
+            rebuild_lecture_rollup(conn, 1)
+        db.session.expire_all()
+        assert rollup() == incremental
+
+
+def test_rollup_counts_and_coverage(app, classroom):
+    min_seconds, max_gap = capture_rate.min_interval_ms / 1000, capture_rate.max_gap_seconds
+    with app.app_context():
+        write(ingest(FRAMES), 5)
+        counts = rollup()
+
+    focused, bored = counts[(2, Emotion.FOCUSED)], counts[(2, Emotion.BORED)]
+    assert focused[0] == 4 and bored[0] == 3
+    # first frame + 5 + 6 + the 60 s absence capped
+    assert focused[1] == pytest.approx(min_seconds + 5 + 6 + max_gap)
+    assert bored[1] == pytest.approx(5 + 5 + 9)
+    assert counts[(3, Emotion.HAPPY)][1] == pytest.approx(min_seconds + 12 + 2)
+    assert counts[(3, Emotion.CONFUSED)][1] == pytest.approx(max_gap)
+    assert counts[(4, Emotion.DISTRACTED)][:2] == (1, min_seconds)
+    assert focused[2] == datetime.fromtimestamp(START, timezone.utc).replace(tzinfo=None)
+    assert focused[3] == datetime.fromtimestamp(START + 76, timezone.utc).replace(tzinfo=None)
+
+
+def test_attendance_is_the_covered_time(app, classroom):
+    with app.app_context():
+        write(ingest(FRAMES), 5)
+        covered = {}
+        for (sid, _), (_, seconds, _, _) in rollup().items():
+            covered[sid] = covered.get(sid, 0) + seconds
+        finalize_lecture_statistics(db.session.get(Lecture, 1), 10)
+        db.session.commit()
+        minutes = dict(db.session.query(LectureAttendance.student_id, LectureAttendance.total_minutes_detected)
+                       .filter(LectureAttendance.lecture_id == 1))
+
+    # Students 2 and 3 are the group's members; user 4 isn't in it
+    assert minutes == {2: pytest.approx(round(covered[2] / 60, 2)), 3: pytest.approx(round(covered[3] / 60, 2))}
@@ -108,7 +108,9 @@ const Login = ({ onLogin }) => {
           password: regPassword,
           role: activeRole,
           collage: institution, // Note: Using 'collage' to match your backend spelling
-          roll_no: idToSubmit
+          roll_no: idToSubmit,
+          // Invite link from a roster import (?claim=...): claims the imported account
+          claim_token: new URLSearchParams(window.location.search).get('claim')
         }),
       });
 
@@ -41,6 +41,8 @@ const LiveLecture = () => {
   const [timer, setTimer] = useState(0);
   const [isConnected, setIsConnected] = useState(true); 
   const [lectureId, setLectureId] = useState(null);
+  // Bumped to retry the live stream after falling back to polling
+  const [streamRetry, setStreamRetry] = useState(0);
   const [topic, setTopic] = useState("Ready to Start");
   
   // --- Live Metrics State ---
@@ -127,40 +129,72 @@ const LiveLecture = () => {
     return () => clearInterval(interval);
   }, [isActive]);
 
-  // 4. REAL Live Data Polling Logic
+  // 4. REAL Live Data (pushed by the server over SSE)
   useEffect(() => {
     if (!isActive || !lectureId) return;
 
-    const fetchLiveStats = async () => {
+    const applyStats = (data) => {
+        setStudentCount(data.total_active);
+        setEngagementScore(data.engagement_score);
+        setMoodData([
+            { name: 'Focused', value: data.mood_distribution.Focused || 0, color: '#10B981' },
+            { name: 'Confused', value: data.mood_distribution.Confused || 0, color: '#F59E0B' },
+            { name: 'Bored', value: data.mood_distribution.Bored || 0, color: '#94A3B8' },
+            { name: 'Distracted', value: data.mood_distribution.Distracted || 0, color: '#EF4444' },
+        ]);
+        setIsConnected(true);
+    };
+
+    const token = localStorage.getItem('token');
+    const source = new EventSource(`${LECTURES_URL}/${lectureId}/stream?jwt=${encodeURIComponent(token)}`);
+
+    // Full snapshot once on connect
+    source.addEventListener('status', (e) => {
+        const data = JSON.parse(e.data);
+        setStudents(data.students);
+        applyStats(data);
+    });
+
+    // Afterwards only the students whose state changed
+    source.addEventListener('delta', (e) => {
+        const data = JSON.parse(e.data);
+        const changed = new Map(data.students.map(s => [s.studentId, s]));
+        setStudents(prev => prev.map(s => changed.get(s.studentId) || s));
+        applyStats(data);
+    });
+
+    source.addEventListener('ended', () => source.close());
+
+    // EventSource reconnects by itself after a dropped connection, but a refused
+    // stream (503 when the server is at its stream limit) closes it for good:
+    // poll live_status instead and retry the stream later
+    let poll, retry;
+    const fetchStatus = async () => {
         try {
-            const res = await fetch(`${LECTURES_URL}/${lectureId}/live_status`, {
-                headers: getAuthHeaders()
-            });
-            
+            const res = await fetch(`${LECTURES_URL}/${lectureId}/live_status`, { headers: getAuthHeaders() });
             if (res.ok) {
                 const data = await res.json();
                 setStudents(data.students);
-                setStudentCount(data.total_active);
-                setEngagementScore(data.engagement_score);
-                setMoodData([
-                    { name: 'Focused', value: data.mood_distribution.Focused || 0, color: '#10B981' },
-                    { name: 'Confused', value: data.mood_distribution.Confused || 0, color: '#F59E0B' },
-                    { name: 'Bored', value: data.mood_distribution.Bored || 0, color: '#94A3B8' },
-                    { name: 'Distracted', value: data.mood_distribution.Distracted || 0, color: '#EF4444' },
-                ]);
-                setIsConnected(true);
-            } else {
-                setIsConnected(false);
+                applyStats(data);
             }
         } catch (error) {
             setIsConnected(false);
         }
     };
+    source.onerror = () => {
+        setIsConnected(false);
+        if (source.readyState !== EventSource.CLOSED || poll) return;
+        fetchStatus();
+        poll = setInterval(fetchStatus, 3000);
+        retry = setTimeout(() => setStreamRetry(n => n + 1), 30000);
+    };
 
-    fetchLiveStats();
-    const dataInterval = setInterval(fetchLiveStats, 3000); // here to change the time of live stats
-    return () => clearInterval(dataInterval);
-  }, [isActive, lectureId]);
+    return () => {
+        source.close();
+        clearInterval(poll);
+        clearTimeout(retry);
+    };
+  }, [isActive, lectureId, streamRetry]);
 
 
   // ================= HANDLERS =================
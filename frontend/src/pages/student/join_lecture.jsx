@@ -2,6 +2,9 @@ import React, { useState, useEffect, useRef } from 'react';
 import { ShieldCheck, Video, Wifi, Play, LogOut, Activity, Radio } from 'lucide-react';
 import { useParams, useNavigate } from 'react-router-dom';
 
+// Used until the server answers with its own next_capture_ms
+const DEFAULT_CAPTURE_MS = 5000;
+
 const StudentLiveLecture = () => {
   const { lectureId } = useParams();
   const navigate = useNavigate();
@@ -23,7 +26,8 @@ const StudentLiveLecture = () => {
   const videoRef = useRef(null);
   const canvasRef = useRef(null);
   const streamRef = useRef(null);
-  const intervalRef = useRef(null);
+  const timeoutRef = useRef(null);
+  const trackingRef = useRef(false);
 
   // Cleanup on unmount
   useEffect(() => {
@@ -61,45 +65,57 @@ const StudentLiveLecture = () => {
   // 2. Start Sending Data
   const startSilentTracking = () => {
     setIsTracking(true);
+    trackingRef.current = true;
     setStatusMessage("Connected. Analyzing engagement...");
     
-    // Capture frame every 5 seconds
-    if (intervalRef.current) clearInterval(intervalRef.current);
-    intervalRef.current = setInterval(captureFrame, 5000);
+    // First frame after the default interval; the server picks every delay after that
+    if (timeoutRef.current) clearTimeout(timeoutRef.current);
+    timeoutRef.current = setTimeout(captureLoop, DEFAULT_CAPTURE_MS);
+  };
+
+  const captureLoop = async () => {
+    const nextCaptureMs = await captureFrame();
+    if (!trackingRef.current) return;
+    timeoutRef.current = setTimeout(captureLoop, nextCaptureMs || DEFAULT_CAPTURE_MS);
   };
 
   // 3. Stop Everything
   const stopTracking = () => {
+    trackingRef.current = false;
     if (streamRef.current) {
       streamRef.current.getTracks().forEach(track => track.stop());
     }
-    if (intervalRef.current) {
-      clearInterval(intervalRef.current);
+    if (timeoutRef.current) {
+      clearTimeout(timeoutRef.current);
     }
     setIsTracking(false);
   };
 
   // 4. Capture & Send to Backend (WITH AUTO-STOP)
+  // Resolves to the server's next_capture_ms (undefined -> default interval)
   const captureFrame = async () => {
     if (!videoRef.current || !canvasRef.current || !streamRef.current) return;
 
     const ctx = canvasRef.current.getContext('2d');
     if (ctx) {
       ctx.drawImage(videoRef.current, 0, 0, 320, 240);
-      const imageSrc = canvasRef.current.toDataURL('image/jpeg', 0.7);
+      // Send the raw JPEG bytes (no base64 / JSON wrapping)
+      const frameBlob = await new Promise(resolve => canvasRef.current.toBlob(resolve, 'image/jpeg', 0.7));
+      if (!frameBlob) return;
 
       try {
-        const res = await fetch(`http://localhost:5000/api/student/lectures/${lectureId}/log_emotion`, {
+        const res = await fetch(`http://localhost:5000/api/student/lectures/${lectureId}/log_emotion_frame`, {
           method: 'POST',
-          headers: getAuthHeaders(),
-          body: JSON.stringify({ image: imageSrc })
+          headers: { ...getAuthHeaders(), 'Content-Type': 'image/jpeg' },
+          body: frameBlob
         });
 
         // ✅ CASE 1: Success (Class is Live)
         if (res.ok) {
             const data = await res.json();
-            setLastEmotion(data.emotion);
+            if (data.emotion) setLastEmotion(data.emotion);
             setCaptureCount(prev => prev + 1);
+            return data.next_capture_ms;
         } 
         // ✅ CASE 2: Class Ended (400 Error)
         else if (res.status === 400) {
@@ -111,6 +127,11 @@ const StudentLiveLecture = () => {
                 navigate('/student/dashboard'); // Send them home
             }
         }
+        // ✅ CASE 3: Server busy (503) -> it tells us how long to back off
+        else if (res.status === 503) {
+            const data = await res.json();
+            return data.next_capture_ms;
+        }
       } catch (err) {
         console.error("Failed to log emotion", err);
       }
@@ -9,6 +9,8 @@ const StudentDashboard = () => {
   const [groups, setGroups] = useState([]);
   const [joinCode, setJoinCode] = useState("");
   const [showJoinModal, setShowJoinModal] = useState(false);
+  // Bumped after joining a group so the event stream re-subscribes
+  const [streamVersion, setStreamVersion] = useState(0);
 
   // Auth Headers
   const getAuthHeaders = () => ({
@@ -32,11 +34,41 @@ const StudentDashboard = () => {
   };
 
   useEffect(() => {
-      fetchGroups();
-      // Poll every 5 seconds to check if a class has started!
-      const interval = setInterval(fetchGroups, 5000);
-      return () => clearInterval(interval);
-  }, []);
+      // The server pushes "lecture_live" / "lecture_ended" for our groups,
+      // so there's no need to poll the group list to see if a class started.
+      const token = localStorage.getItem('token');
+      const source = new EventSource(`${API_BASE_URL}/stream?jwt=${encodeURIComponent(token)}`);
+      const setLive = (groupId, lectureId) => setGroups(prev => prev.map(g =>
+          g.id === groupId ? { ...g, live_lecture_id: lectureId } : g
+      ));
+
+      // Sent on every (re)connect: resync the list in case we missed something
+      source.addEventListener('subscribed', fetchGroups);
+      source.addEventListener('lecture_live', (e) => {
+          const data = JSON.parse(e.data);
+          setLive(data.group_id, data.lecture_id);
+      });
+      source.addEventListener('lecture_ended', (e) => {
+          const data = JSON.parse(e.data);
+          setLive(data.group_id, null);
+      });
+
+      // A refused stream (503 when the server is at its stream limit) closes the
+      // EventSource for good: poll the group list instead, retry the stream later
+      let poll, retry;
+      source.onerror = () => {
+          if (source.readyState !== EventSource.CLOSED || poll) return;
+          fetchGroups();
+          poll = setInterval(fetchGroups, 5000);
+          retry = setTimeout(() => setStreamVersion(v => v + 1), 30000);
+      };
+
+      return () => {
+          source.close();
+          clearInterval(poll);
+          clearTimeout(retry);
+      };
+  }, [streamVersion]);
 
   // 2. Join a New Group
   const handleJoinGroup = async () => {
@@ -52,7 +84,7 @@ const StudentDashboard = () => {
               alert("Joined successfully!");
               setJoinCode("");
               setShowJoinModal(false);
-              fetchGroups();
+              setStreamVersion(v => v + 1);
           } else {
               alert(data.error);
           }